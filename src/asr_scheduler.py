@@ -0,0 +1,83 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from logger import LOG
+
+# 动态批处理调度器：把多个并发请求的音频合并为一次批量推理
+class AsrBatchScheduler:
+    """
+    ASR 动态批处理调度器。
+
+    每个请求的完整音频作为一项放入队列；后台线程取出第一项后，最多再等待 max_wait 秒收集更多请求，
+    凑满 max_batch_size 或超时即按任务类型分组调用 batch_fn。
+    batch_fn(audios, task) 接收 float32 数组列表，返回同样顺序的文本列表。长音频的切分由 batch_fn 负责
+    （transformers 的语音识别管道按 chunk_length_s 切成带重叠的窗口，并按 stride 合并窗口边界处的文字），
+    调度器不在固定位置截断音频，避免切断窗口边界上的词语。
+    """
+    def __init__(self, batch_fn, max_batch_size=8, max_wait=0.05):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, audio, task="transcribe"):
+        """
+        提交一段音频，返回最终结果为识别文本的 Future。
+        """
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((future, audio, task))
+        return future
+
+    def transcribe(self, audio, task="transcribe"):
+        """
+        提交音频并阻塞等待识别结果。
+        """
+        return self.submit(audio, task).result()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="asr-batch-scheduler", daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self):
+        """
+        阻塞等待第一个请求，然后在 max_wait 时间窗口内尽量凑满一批。
+        """
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+
+            # 不同任务类型（转录 / 翻译）的生成参数不同，分组分别推理
+            groups = {}
+            for item in batch:
+                groups.setdefault(item[2], []).append(item)
+
+            for task, items in groups.items():
+                LOG.debug(f"[ASR 批处理] 任务 {task}，请求数 {len(items)}")
+                try:
+                    texts = self.batch_fn([audio for _, audio, _ in items], task)
+                except Exception as e:
+                    LOG.error(f"[ASR 批处理] 批量推理失败: {e}")
+                    for future, _, _ in items:
+                        future.set_exception(e)
+                    continue
+                for (future, _, _), text in zip(items, texts):
+                    future.set_result(text.strip())
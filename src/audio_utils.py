@@ -0,0 +1,146 @@
+import os
+import struct
+import hashlib
+import subprocess
+
+import numpy as np
+
+from logger import LOG
+
+# Whisper 模型要求的采样率
+SAMPLE_RATE = 16000
+
+# WAV 格式标识：PCM 整数、IEEE 浮点与扩展格式
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+def load_audio(input_path):
+    """
+    将音频文件解码为 16 kHz 单声道 float32 的 NumPy 数组，全程不写临时文件。
+
+    已经是 16 kHz 单声道的 WAV（16 位 PCM 或 32 位浮点）以内存映射方式直接读取，
+    16 kHz 单声道的 FLAC 在进程内解码，其余格式交给 ffmpeg 解码并从标准输出管道读取。
+
+    参数:
+    - input_path: 输入的音频文件路径
+
+    返回:
+    - audio: 一维 float32 数组，采样率为 SAMPLE_RATE
+    """
+    file_ext = os.path.splitext(input_path)[1].lower()
+
+    audio = None
+    if file_ext == ".wav":
+        audio = read_wav_memmap(input_path)
+    elif file_ext == ".flac":
+        audio = read_flac(input_path)
+
+    if audio is None:
+        audio = decode_with_ffmpeg(input_path)
+    else:
+        LOG.debug(f"音频已是 {SAMPLE_RATE} Hz 单声道，跳过 ffmpeg 转换: {input_path}")
+    return audio
+
+def _parse_wav_header(f):
+    """
+    解析 RIFF/WAVE 文件头，返回 (格式标识, 声道数, 采样率, 位深, 数据偏移, 数据字节数)，无法解析时返回 None。
+    """
+    riff = f.read(12)
+    if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+        return None
+
+    fmt = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        chunk_id, chunk_size = struct.unpack("<4sI", header)
+        if chunk_id == b"fmt ":
+            chunk = f.read(chunk_size)
+            audio_format, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", chunk[:16])
+            if audio_format == WAVE_FORMAT_EXTENSIBLE and len(chunk) >= 26:
+                audio_format = struct.unpack("<H", chunk[24:26])[0]  # 子格式 GUID 的前两个字节
+            fmt = (audio_format, channels, sample_rate, bits)
+            if chunk_size % 2:
+                f.seek(1, os.SEEK_CUR)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            return fmt + (f.tell(), chunk_size)
+        else:
+            f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)  # 跳过其他块（块大小为奇数时有填充字节）
+
+def read_wav_memmap(input_path):
+    """
+    以内存映射方式读取 16 kHz 单声道 WAV。文件不是该格式或文件头损坏时返回 None，由调用方改用 ffmpeg 解码。
+
+    流式写入的 WAV 常把数据块大小写为 0xFFFFFFFF 等占位值，数据块大小超出文件实际长度时按文件末尾截断。
+    """
+    with open(input_path, "rb") as f:
+        try:
+            header = _parse_wav_header(f)
+        except struct.error as e:
+            LOG.debug(f"WAV 文件头损坏，改用 ffmpeg 解码 {input_path}: {e}")
+            return None
+        file_size = os.fstat(f.fileno()).st_size
+    if header is None:
+        return None
+
+    audio_format, channels, sample_rate, bits, offset, size = header
+    if channels != 1 or sample_rate != SAMPLE_RATE:
+        return None
+    size = min(size, max(file_size - offset, 0))
+    if size == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    if audio_format == WAVE_FORMAT_PCM and bits == 16:
+        samples = np.memmap(input_path, dtype="<i2", mode="r", offset=offset, shape=(size // 2,))
+        return samples.astype(np.float32) / 32768.0
+    if audio_format == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        # 直接返回内存映射，数据按需分页读入，不产生额外拷贝
+        return np.memmap(input_path, dtype="<f4", mode="r", offset=offset, shape=(size // 4,))
+    return None
+
+def read_flac(input_path):
+    """
+    在进程内解码 16 kHz 单声道 FLAC。文件不是该格式、无法解码或 soundfile 不可用时返回 None。
+    """
+    try:
+        import soundfile
+    except ImportError:
+        return None
+
+    try:
+        info = soundfile.info(input_path)
+        if info.channels != 1 or info.samplerate != SAMPLE_RATE:
+            return None
+        audio, _ = soundfile.read(input_path, dtype="float32")
+    except RuntimeError as e:
+        # libsndfile 无法解码的文件（例如损坏的 FLAC）交给 ffmpeg 处理
+        LOG.debug(f"soundfile 解码失败，改用 ffmpeg 解码 {input_path}: {e}")
+        return None
+    return audio
+
+def decode_with_ffmpeg(input_path):
+    """
+    使用 ffmpeg 将任意音频解码为 16 kHz 单声道 float32 PCM，并直接从标准输出管道读取。
+
+    异常:
+    - subprocess.CalledProcessError: ffmpeg 解码失败
+    - FileNotFoundError: 未找到 ffmpeg 可执行文件
+    """
+    result = subprocess.run(
+        ["ffmpeg", "-nostdin", "-i", input_path, "-f", "f32le", "-acodec", "pcm_f32le",
+         "-ac", "1", "-ar", str(SAMPLE_RATE), "-"],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+def pcm_digest(audio):
+    """
+    计算解码后 PCM 数据的 SHA-256 摘要。相同内容的音频无论原始文件格式如何，摘要都相同。
+    """
+    return hashlib.sha256(np.ascontiguousarray(audio, dtype=np.float32)).hexdigest()
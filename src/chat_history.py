@@ -1,22 +1,275 @@
-from langchain_core.chat_history import (
-    BaseChatMessageHistory,  # 基础聊天消息历史类
-    InMemoryChatMessageHistory,  # 内存中的聊天消息历史类
-)
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence
 
-# 用于存储会话历史的字典
-store = {}
+from langchain_core.chat_history import BaseChatMessageHistory  # 基础聊天消息历史类
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from logger import LOG  # 导入日志工具
+from markdown_chunker import estimate_tokens
+
+# 每条消息在对话格式中的额外开销（角色标记等）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+def count_message_tokens(message: BaseMessage) -> int:
+    """
+    估计单条消息占用的 token 数。
+    """
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+def trim_to_budget(messages: List[BaseMessage], max_tokens: int,
+                   token_counts: Optional[List[int]] = None) -> List[BaseMessage]:
+    """
+    只保留不超过 max_tokens 的最近若干完整对话轮次（从用户消息开始），最新一轮始终保留。
+    token_counts 为各条消息已计算的 token 数，省略时按 count_message_tokens 估计。
+    """
+    tokens = 0
+    start = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        tokens += token_counts[i] if token_counts is not None else count_message_tokens(messages[i])
+        if isinstance(messages[i], HumanMessage):
+            if tokens > max_tokens and start < len(messages):
+                break
+            start = i
+    return messages[start:] if start < len(messages) else messages
+
+# 按 token 预算裁剪的会话历史：超出预算时丢弃最早的完整对话轮次，可选地把丢弃的内容压缩为摘要
+class BoundedChatMessageHistory(BaseChatMessageHistory):
+    """
+    有 token 预算的内存聊天历史。
+
+    添加消息后若总 token 数超过 max_tokens，则从最早的用户消息开始整轮丢弃（用户消息及其后的回复），
+    最新一轮始终保留。提供 summarizer(previous_summary, dropped_messages) -> str 时，
+    被丢弃的轮次会合并为一条摘要 SystemMessage，放在历史的最前面。
+
+    摘要生成可能较慢（调用 LLM）：提供 summary_executor 时在其中后台生成，add_messages 立即返回，
+    摘要就绪后替换原有摘要；使用单线程执行器时同一历史的摘要按提交顺序依次生成。
+    未提供时在 add_messages 中同步生成。生成期间历史被清空时丢弃该摘要。
+    """
+    def __init__(self, max_tokens: int = 3000, summarizer: Optional[Callable] = None,
+                 summary_executor: Optional[Executor] = None):
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.summary_executor = summary_executor
+        self.pending_summary: Optional[Future] = None  # 最近一次提交的后台摘要任务
+        self.summary = ""
+        self.dropped_messages = 0
+        self._messages: List[BaseMessage] = []
+        self._token_counts: List[int] = []
+        self._tokens = 0
+        self._generation = 0  # 每次 clear 加一，用于丢弃清空前开始生成的摘要
+        self._lock = threading.Lock()
+        self._summary_lock = threading.Lock()
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        with self._lock:
+            messages, summary = list(self._messages), self.summary
+        if summary:
+            messages.insert(0, SystemMessage(content=f"此前对话的摘要: {summary}"))
+        return messages
+
+    @property
+    def token_count(self) -> int:
+        with self._lock:
+            tokens, summary = self._tokens, self.summary
+        return tokens + (estimate_tokens(summary) if summary else 0)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        with self._lock:
+            for message in messages:
+                tokens = count_message_tokens(message)
+                self._messages.append(message)
+                self._token_counts.append(tokens)
+                self._tokens += tokens
+            dropped = self._trim()
+
+        if dropped and self.summarizer is not None:
+            if self.summary_executor is None:
+                self._summarize(dropped)
+            else:
+                self.pending_summary = self.summary_executor.submit(self._summarize, dropped)
+
+    def _summarize(self, dropped: List[BaseMessage]) -> None:
+        """
+        把被丢弃的消息合并进摘要。生成期间不持有 _lock，避免阻塞读取。
+        """
+        with self._summary_lock:
+            with self._lock:
+                previous, generation = self.summary, self._generation
+            try:
+                summary = self.summarizer(previous, dropped)
+            except Exception as e:
+                LOG.warning(f"[会话历史] 生成摘要失败: {e}")
+                return
+            with self._lock:
+                if self._generation == generation:
+                    self.summary = summary
+
+    def _trim(self) -> List[BaseMessage]:
+        """
+        按 trim_to_budget 整轮丢弃最早的对话，返回被丢弃的消息。调用方需持有锁。
+        """
+        if self._tokens <= self.max_tokens:
+            return []
+        count = len(self._messages) - len(trim_to_budget(self._messages, self.max_tokens, self._token_counts))
+        dropped = self._messages[:count]
+        self._tokens -= sum(self._token_counts[:count])
+        del self._messages[:count]
+        del self._token_counts[:count]
+        self.dropped_messages += count
+        return dropped
+
+    def clear(self) -> None:
+        with self._lock:
+            self._messages, self._token_counts, self._tokens = [], [], 0
+            self.summary = ""
+            self._generation += 1
+
+# 会话历史管理器：空闲会话 TTL 淘汰、全局 token 上限与按会话统计
+class ChatHistoryManager:
+    """
+    管理所有会话的聊天历史。
+
+    每个会话使用独立的 BoundedChatMessageHistory（单会话 token 预算为 max_tokens_per_session）。
+    获取会话时先淘汰空闲超过 ttl 秒的会话，再在所有会话的 token 总数超过 max_total_tokens 时
+    按最近访问顺序淘汰最久未使用的其他会话。
+    """
+    def __init__(self, max_tokens_per_session: int = 3000, ttl: Optional[float] = 3600,
+                 max_total_tokens: int = 2_000_000, summarizer: Optional[Callable] = None):
+        self.max_tokens_per_session = max_tokens_per_session
+        self.ttl = ttl
+        self.max_total_tokens = max_total_tokens
+        self.summarizer = summarizer
+        # 所有会话的摘要在同一个后台线程中依次生成，不占用请求路径
+        self._summary_executor = (ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-summary")
+                                  if summarizer is not None else None)
+        self.expired_sessions = 0
+        self.evicted_sessions = 0
+        self._sessions = OrderedDict()  # 会话 ID -> (历史, 最近访问时间)，按最近访问时间从旧到新排列
+        self._lock = threading.Lock()
+
+    def get_session_history(self, session_id: str) -> BaseChatMessageHistory:
+        """
+        获取指定会话ID的聊天历史。如果该会话ID不存在，则创建一个新的聊天历史实例。
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if session_id in self._sessions:
+                history = self._sessions.pop(session_id)[0]
+            else:
+                history = BoundedChatMessageHistory(self.max_tokens_per_session, self.summarizer,
+                                                    self._summary_executor)
+            self._sessions[session_id] = (history, now)
+            self._enforce_capacity(session_id)
+        return history
+
+    def has_session(self, session_id: str) -> bool:
+        """
+        会话是否存在，不创建会话也不更新其访问时间。
+        """
+        with self._lock:
+            return session_id in self._sessions
+
+    def _expire(self, now):
+        if self.ttl is None:
+            return
+        while self._sessions:
+            session_id, (_, last_access) = next(iter(self._sessions.items()))
+            if now - last_access <= self.ttl:
+                break
+            del self._sessions[session_id]
+            self.expired_sessions += 1
+            LOG.debug(f"[会话历史] 会话 {session_id} 空闲超时，已淘汰")
+
+    def _enforce_capacity(self, current_session_id):
+        total = sum(history.token_count for history, _ in self._sessions.values())
+        for session_id in list(self._sessions):
+            if total <= self.max_total_tokens:
+                break
+            if session_id == current_session_id:
+                continue
+            history, _ = self._sessions.pop(session_id)
+            total -= history.token_count
+            self.evicted_sessions += 1
+            LOG.debug(f"[会话历史] 超出全局上限，淘汰会话 {session_id}")
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self):
+        """
+        返回会话历史的统计信息，包括每个会话的消息数、token 数与已裁剪的消息数。
+        """
+        with self._lock:
+            sessions = {
+                session_id: {
+                    "messages": len(history.messages),
+                    "tokens": history.token_count,
+                    "dropped_messages": history.dropped_messages,
+                }
+                for session_id, (history, _) in self._sessions.items()
+            }
+        return {
+            "sessions": len(sessions),
+            "total_tokens": sum(session["tokens"] for session in sessions.values()),
+            "expired_sessions": self.expired_sessions,
+            "evicted_sessions": self.evicted_sessions,
+            "per_session": sessions,
+        }
+
+# 进程内共享的会话历史管理器
+history_manager = ChatHistoryManager()
+
+def set_history_manager(manager) -> None:
+    """
+    替换进程内使用的会话历史管理器，例如改用 sqlite_chat_history.SQLiteHistoryManager 持久化会话。
+    """
+    global history_manager
+    history_manager = manager
 
 def get_session_history(session_id: str) -> BaseChatMessageHistory:
     """
     获取指定会话ID的聊天历史。如果该会话ID不存在，则创建一个新的聊天历史实例。
-    
+
     参数:
         session_id (str): 会话的唯一标识符
-    
+
     返回:
         BaseChatMessageHistory: 对应会话的聊天历史对象
     """
-    if session_id not in store:
-        # 如果会话ID不存在于存储中，创建一个新的内存聊天历史实例
-        store[session_id] = InMemoryChatMessageHistory()
-    return store[session_id]
\ No newline at end of file
+    return history_manager.get_session_history(session_id)
+
+def has_session_history(session_id: str) -> bool:
+    """
+    指定会话是否已有聊天历史。
+    """
+    return history_manager.has_session(session_id)
+
+def log_history_stats() -> None:
+    """
+    记录当前会话历史管理器的汇总统计信息（不含每个会话的明细）。
+    """
+    stats = {key: value for key, value in history_manager.stats().items() if key != "per_session"}
+    LOG.info(f"[会话历史] {stats}")
+
+def start_stats_logger(interval: float = 300) -> threading.Thread:
+    """
+    在后台守护线程中每隔 interval 秒记录一次会话历史的统计信息，返回该线程。
+    """
+    def _run():
+        while True:
+            time.sleep(interval)
+            try:
+                log_history_stats()
+            except Exception as e:
+                LOG.warning(f"[会话历史] 统计信息获取失败: {e}")
+
+    thread = threading.Thread(target=_run, name="chat-history-stats", daemon=True)
+    thread.start()
+    return thread
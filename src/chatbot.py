@@ -1,5 +1,9 @@
 # chatbot.py
 
+import asyncio
+import threading
+import weakref
+import contextlib
 from abc import ABC, abstractmethod
 
 from langchain_openai import ChatOpenAI
@@ -8,7 +12,7 @@ from langchain_core.messages import HumanMessage  # 导入消息类
 from langchain_core.runnables.history import RunnableWithMessageHistory  # 导入带有消息历史的可运行类
 
 from logger import LOG  # 导入日志工具
-from chat_history import get_session_history
+from chat_history import get_session_history, has_session_history
 
 
 class ChatBot(ABC):
@@ -18,6 +22,10 @@ class ChatBot(ABC):
     def __init__(self, prompt_file="./prompts/chatbot.txt", session_id=None):
         self.prompt_file = prompt_file
         self.session_id = session_id if session_id else "default_session_id"
+        # 每个会话一把锁，同步与异步接口共用：同一会话的请求依次执行，保证历史按轮次追加；
+        # 不同会话之间互不阻塞。锁只被正在执行的请求引用，会话空闲后自动回收
+        self._locks = weakref.WeakValueDictionary()
+        self._locks_guard = threading.Lock()
         self.prompt = self.load_prompt()
         # LOG.debug(f"[ChatBot Prompt]{self.prompt}")
         self.create_chatbot()
@@ -54,6 +62,40 @@ class ChatBot(ABC):
         self.chatbot_with_history = RunnableWithMessageHistory(self.chatbot, get_session_history)
 
 
+    def _session_lock(self, session_id):
+        with self._locks_guard:
+            lock = self._locks.get(session_id)
+            if lock is None:
+                lock = self._locks[session_id] = threading.Lock()
+            return lock
+
+    @contextlib.asynccontextmanager
+    async def _async_session_lock(self, session_id):
+        """
+        在异步接口中持有会话锁（与同步接口是同一把锁），等待期间不阻塞事件循环。
+        """
+        lock = self._session_lock(session_id)
+        # 锁被其他请求持有时让出事件循环后重试。不在线程池中阻塞等待：持有锁的请求读写历史时
+        # 也要用到线程池，等待者占满线程池会造成死锁
+        delay = 0.001
+        while not lock.acquire(blocking=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def clear_session(self, session_id):
+        """
+        清空指定会话的聊天历史，例如用户关闭页面时。会话没有历史时不做任何操作。
+        """
+        if not has_session_history(session_id):
+            return
+        with self._session_lock(session_id):
+            get_session_history(session_id).clear()
+        LOG.debug(f"[ChatBot] 已清空会话 {session_id}")
+
     def chat_with_history(self, user_input, session_id=None):
         """
         处理用户输入，生成包含聊天历史的回复。
@@ -68,10 +110,81 @@ class ChatBot(ABC):
         if session_id is None:
             session_id = self.session_id
     
-        response = self.chatbot_with_history.invoke(
-            [HumanMessage(content=user_input)],  # 将用户输入封装为 HumanMessage
-            {"configurable": {"session_id": session_id}},  # 传入配置，包括会话ID
-        )
+        with self._session_lock(session_id):
+            response = self.chatbot_with_history.invoke(
+                [HumanMessage(content=user_input)],  # 将用户输入封装为 HumanMessage
+                {"configurable": {"session_id": session_id}},  # 传入配置，包括会话ID
+            )
 
         LOG.debug(f"[ChatBot] {response.content}")  # 记录调试日志
-        return response.content  # 返回生成的回复内容
\ No newline at end of file
+        return response.content  # 返回生成的回复内容
+
+    async def achat_with_history(self, user_input, session_id=None):
+        """
+        chat_with_history 的异步版本，使用 ainvoke 调用模型，不阻塞事件循环。
+
+        参数:
+            user_input (str): 用户输入的消息
+            session_id (str, optional): 会话的唯一标识符
+
+        返回:
+            str: AI 生成的回复
+        """
+        if session_id is None:
+            session_id = self.session_id
+
+        async with self._async_session_lock(session_id):
+            response = await self.chatbot_with_history.ainvoke(
+                [HumanMessage(content=user_input)],
+                {"configurable": {"session_id": session_id}},
+            )
+
+        LOG.debug(f"[ChatBot] {response.content}")  # 记录调试日志
+        return response.content
+
+    def stream_with_history(self, user_input, session_id=None):
+        """
+        流式版本的 chat_with_history，逐段产出模型生成的文本片段。
+
+        完整回复在生成结束后由 RunnableWithMessageHistory 作为一轮对话写入历史；
+        生成期间持有会话锁，同一会话的下一次请求会等待本轮结束。
+
+        参数:
+            user_input (str): 用户输入的消息
+            session_id (str, optional): 会话的唯一标识符
+
+        返回:
+            Iterator[str]: 回复文本片段
+        """
+        if session_id is None:
+            session_id = self.session_id
+
+        with self._session_lock(session_id):
+            for chunk in self.chatbot_with_history.stream(
+                [HumanMessage(content=user_input)],
+                {"configurable": {"session_id": session_id}},
+            ):
+                if chunk.content:
+                    yield chunk.content
+
+    async def astream_with_history(self, user_input, session_id=None):
+        """
+        stream_with_history 的异步版本，使用 astream 调用模型，不阻塞事件循环。
+
+        参数:
+            user_input (str): 用户输入的消息
+            session_id (str, optional): 会话的唯一标识符
+
+        返回:
+            AsyncIterator[str]: 回复文本片段
+        """
+        if session_id is None:
+            session_id = self.session_id
+
+        async with self._async_session_lock(session_id):
+            async for chunk in self.chatbot_with_history.astream(
+                [HumanMessage(content=user_input)],
+                {"configurable": {"session_id": session_id}},
+            ):
+                if chunk.content:
+                    yield chunk.content
@@ -32,4 +32,22 @@ class Config:
             # 加载内容格式化提示和助手提示
             self.content_formatter_prompt = config.get('content_formatter_prompt', '')
             self.content_assistant_prompt = config.get('content_assistant_prompt', '')
-            self.image_advisor_prompt = config.get('image_advisor_prompt', '')
\ No newline at end of file
+            self.image_advisor_prompt = config.get('image_advisor_prompt', '')
+
+            # docx 融合模式：一次 LLM 调用完成格式化与每页一图调整，默认关闭
+            self.docx_fused_mode = config.get('docx_fused_mode', False)
+            self.deck_builder_prompt = config.get('deck_builder_prompt', 'prompts/deck_builder.txt')
+
+            # 会话历史存储："memory" 保存在进程内存中；"sqlite" 保存在 chat_history_db 中，可在多个进程间共享
+            self.chat_history_backend = config.get('chat_history_backend', 'memory')
+            self.chat_history_db = config.get('chat_history_db', 'cache/chat_history.db')
+            # 内存会话历史超出 token 预算时，用该提示词把被裁剪的早期轮次压缩为摘要；为空时直接丢弃
+            self.history_summarizer_prompt = config.get('history_summarizer_prompt', '')
+            # 每隔多少秒在日志中记录一次会话历史统计信息，为 0 时不记录
+            self.history_stats_interval = config.get('history_stats_interval', 300)
+
+            # 服务启动后是否在后台预热语音识别模型，默认开启；关闭时在首次识别音频时加载
+            self.asr_warm_up = config.get('asr_warm_up', True)
+            # 服务启动后是否立即启动图像理解工作进程并在其中加载模型（CPU 上约占 16GB 内存），
+            # 默认关闭，在首次描述图像时启动
+            self.image_warm_up = config.get('image_warm_up', False)
\ No newline at end of file
@@ -6,13 +6,21 @@ from langchain_core.prompts import ChatPromptTemplate  # 导入提示模板相
 from langchain_core.messages import HumanMessage  # 导入消息类
 
 from logger import LOG  # 导入日志工具
+from llm_cache import llm_cache  # 导入共享的 LLM 响应缓存
+from markdown_chunker import stitch_formatted_chunks
 
 class ContentAssistant(ABC):
     """
     聊天机器人基类，提供聊天功能。
     """
-    def __init__(self, prompt_file="./prompts/content_assistant.txt"):
+    def __init__(self, prompt_file="./prompts/content_assistant.txt", max_concurrency=8):
+        """
+        参数:
+            prompt_file (str): 系统提示词文件
+            max_concurrency (int): 逐块调整时的最大并发请求数
+        """
         self.prompt_file = prompt_file
+        self.max_concurrency = max_concurrency
         self.prompt = self.load_prompt()
         # LOG.debug(f"[Formatter Prompt]{self.prompt}")
         self.create_assistant()
@@ -56,9 +64,63 @@ class ContentAssistant(ABC):
         返回:
             str: 格式化后的 markdown 内容
         """
-        response = self.assistant.invoke({
+        # 相同提示词、模型参数与输入直接返回缓存结果
+        content = llm_cache.cached_invoke(self.assistant, self.model, self.prompt, markdown_content, {
             "input": markdown_content,
         })
 
-        LOG.debug(f"[Assistant 内容重构后]\n{response.content}")  # 记录调试日志
-        return response.content  # 返回生成的回复内容
\ No newline at end of file
+        LOG.debug(f"[Assistant 内容重构后]\n{content}")  # 记录调试日志
+        return content  # 返回生成的回复内容
+
+    async def aadjust_single_picture(self, markdown_content):
+        """
+        adjust_single_picture 的异步版本，使用 ainvoke 调用模型，不阻塞事件循环。
+
+        参数:
+            markdown_content (str): PowerPoint markdown 原始格式
+
+        返回:
+            str: 格式化后的 markdown 内容
+        """
+        content = await llm_cache.acached_invoke(self.assistant, self.model, self.prompt, markdown_content, {
+            "input": markdown_content,
+        })
+
+        LOG.debug(f"[Assistant 内容重构后]\n{content}")  # 记录调试日志
+        return content
+
+    def adjust_chunks(self, formatted_chunks, title=None):
+        """
+        逐块调整 ContentFormatter.format_chunks 的结果：只有一块时与 adjust_single_picture 相同，
+        多块时通过 batch 并发调整后拼接，长文档不会因为 max_tokens 截断结尾，也不必等待一次完整长度的生成。
+
+        参数:
+            formatted_chunks (List[str]): 各块的格式化结果
+            title (str, optional): 原文标题，拼接时作为演示文稿的主标题
+
+        返回:
+            str: 调整后的 markdown 内容
+        """
+        if len(formatted_chunks) == 1:
+            return self.adjust_single_picture(formatted_chunks[0])
+
+        LOG.info(f"[Assistant 分块] 共 {len(formatted_chunks)} 块，最大并发 {self.max_concurrency}")
+        contents = llm_cache.cached_batch(self.assistant, self.model, self.prompt, formatted_chunks,
+                                          [{"input": chunk} for chunk in formatted_chunks], self.max_concurrency)
+        content = stitch_formatted_chunks(contents, title)
+        LOG.debug(f"[Assistant 分块重构后]\n{content}")
+        return content
+
+    async def aadjust_chunks(self, formatted_chunks, title=None):
+        """
+        adjust_chunks 的异步版本，使用 abatch 并发调用模型。
+        """
+        if len(formatted_chunks) == 1:
+            return await self.aadjust_single_picture(formatted_chunks[0])
+
+        LOG.info(f"[Assistant 分块] 共 {len(formatted_chunks)} 块，最大并发 {self.max_concurrency}")
+        contents = await llm_cache.acached_batch(self.assistant, self.model, self.prompt, formatted_chunks,
+                                                 [{"input": chunk} for chunk in formatted_chunks], self.max_concurrency)
+        content = stitch_formatted_chunks(contents, title)
+        LOG.debug(f"[Assistant 分块重构后]\n{content}")
+        return content
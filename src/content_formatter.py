@@ -7,13 +7,23 @@ from langchain_core.messages import HumanMessage  # 导入消息类
 from langchain_core.runnables.history import RunnableWithMessageHistory  # 导入带有消息历史的可运行类
 
 from logger import LOG  # 导入日志工具
+from llm_cache import llm_cache  # 导入共享的 LLM 响应缓存
+from markdown_chunker import estimate_tokens, extract_title, split_markdown_sections, stitch_formatted_chunks
 
 class ContentFormatter(ABC):
     """
     聊天机器人基类，提供聊天功能。
     """
-    def __init__(self, prompt_file="./prompts/content_formatter.txt"):
+    def __init__(self, prompt_file="./prompts/content_formatter.txt", max_chunk_tokens=3000, max_concurrency=8):
+        """
+        参数:
+            prompt_file (str): 系统提示词文件
+            max_chunk_tokens (int): 单次请求的输入 token 预算，超出时按标题分块并发格式化
+            max_concurrency (int): 分块模式下的最大并发请求数
+        """
         self.prompt_file = prompt_file
+        self.max_chunk_tokens = max_chunk_tokens
+        self.max_concurrency = max_concurrency
         self.prompt = self.load_prompt()
         # LOG.debug(f"[Formatter Prompt]{self.prompt}")
         self.create_formatter()
@@ -48,19 +58,127 @@ class ContentFormatter(ABC):
         self.formatter = system_prompt | self.model  # 使用的模型名称)
 
 
+    @staticmethod
+    def _join_blocks(raw_content):
+        """
+        将 markdown 内容块拼接为字符串，已是字符串时原样返回。
+        """
+        return raw_content if isinstance(raw_content, str) else ''.join(raw_content)
+
     def format(self, raw_content):
         """
         
 
         参数:
-            raw_content (str): 解析后的 markdown 原始格式
+            raw_content (str | Iterable[str]): 解析后的 markdown 原始格式，
+                也可以是 docx_parser.iter_markdown_blocks 产出的内容块，在此处才拼接为完整字符串
 
         返回:
             str: 格式化后的 markdown 内容
         """
-        response = self.formatter.invoke({
+        raw_content = self._join_blocks(raw_content)
+        if estimate_tokens(raw_content) > self.max_chunk_tokens:
+            return self.format_chunked(raw_content)
+
+        # 相同提示词、模型参数与输入直接返回缓存结果
+        content = llm_cache.cached_invoke(self.formatter, self.model, self.prompt, raw_content, {
             "input": raw_content,
         })
 
-        LOG.debug(f"[Formmater 格式化后]\n{response.content}")  # 记录调试日志
-        return response.content  # 返回生成的回复内容
\ No newline at end of file
+        LOG.debug(f"[Formmater 格式化后]\n{content}")  # 记录调试日志
+        return content  # 返回生成的回复内容
+
+    async def aformat(self, raw_content):
+        """
+        format 的异步版本，使用 ainvoke 调用模型，不阻塞事件循环。
+
+        参数:
+            raw_content (str | Iterable[str]): 解析后的 markdown 原始格式或内容块
+
+        返回:
+            str: 格式化后的 markdown 内容
+        """
+        raw_content = self._join_blocks(raw_content)
+        if estimate_tokens(raw_content) > self.max_chunk_tokens:
+            return await self.aformat_chunked(raw_content)
+
+        content = await llm_cache.acached_invoke(self.formatter, self.model, self.prompt, raw_content, {
+            "input": raw_content,
+        })
+
+        LOG.debug(f"[Formmater 格式化后]\n{content}")  # 记录调试日志
+        return content
+
+    def _chunk_inputs(self, raw_content):
+        """
+        按标题边界切分原始内容，返回 (原文标题, 各块输入文本)。
+
+        第一块之后的块以原文标题开头，为模型提供文档主题的上下文；拼接时统一去掉各块的主标题。
+        """
+        title = extract_title(raw_content)
+        chunks = split_markdown_sections(raw_content, self.max_chunk_tokens)
+        if title:
+            chunks = chunks[:1] + [f"# {title}\n\n{chunk}" for chunk in chunks[1:]]
+        return title, chunks
+
+    def _format_batch(self, chunks):
+        LOG.info(f"[Formatter 分块] 共 {len(chunks)} 块，最大并发 {self.max_concurrency}")
+        return llm_cache.cached_batch(self.formatter, self.model, self.prompt, chunks,
+                                      [{"input": chunk} for chunk in chunks], self.max_concurrency)
+
+    async def _aformat_batch(self, chunks):
+        LOG.info(f"[Formatter 分块] 共 {len(chunks)} 块，最大并发 {self.max_concurrency}")
+        return await llm_cache.acached_batch(self.formatter, self.model, self.prompt, chunks,
+                                             [{"input": chunk} for chunk in chunks], self.max_concurrency)
+
+    def format_chunked(self, raw_content):
+        """
+        分块格式化长文档：按标题切分为不超过 max_chunk_tokens 的块，通过 batch 并发格式化后拼接为一份幻灯片内容。
+        总耗时取决于最长的一块，而不是整篇文档，也不会因为 max_tokens 截断输出。
+
+        参数:
+            raw_content (str | Iterable[str]): 解析后的 markdown 原始格式或内容块
+
+        返回:
+            str: 格式化后的 markdown 内容
+        """
+        title, chunks = self._chunk_inputs(self._join_blocks(raw_content))
+        content = stitch_formatted_chunks(self._format_batch(chunks), title)
+        LOG.debug(f"[Formmater 分块格式化后]\n{content}")
+        return content
+
+    async def aformat_chunked(self, raw_content):
+        """
+        format_chunked 的异步版本，使用 abatch 并发调用模型。
+        """
+        title, chunks = self._chunk_inputs(self._join_blocks(raw_content))
+        content = stitch_formatted_chunks(await self._aformat_batch(chunks), title)
+        LOG.debug(f"[Formmater 分块格式化后]\n{content}")
+        return content
+
+    def format_chunks(self, raw_content):
+        """
+        格式化内容但不拼接，供后续步骤逐块处理（例如 ContentAssistant.adjust_chunks）。
+
+        参数:
+            raw_content (str | Iterable[str]): 解析后的 markdown 原始格式或内容块
+
+        返回:
+            Tuple[Optional[str], List[str]]: (原文标题, 各块的格式化结果)。未超出 max_chunk_tokens 的内容
+                只有一块，标题为 None
+        """
+        raw_content = self._join_blocks(raw_content)
+        if estimate_tokens(raw_content) <= self.max_chunk_tokens:
+            return None, [self.format(raw_content)]
+        title, chunks = self._chunk_inputs(raw_content)
+        return title, self._format_batch(chunks)
+
+    async def aformat_chunks(self, raw_content):
+        """
+        format_chunks 的异步版本。
+        """
+        raw_content = self._join_blocks(raw_content)
+        if estimate_tokens(raw_content) <= self.max_chunk_tokens:
+            return None, [await self.aformat(raw_content)]
+        title, chunks = self._chunk_inputs(raw_content)
+        return title, await self._aformat_batch(chunks)
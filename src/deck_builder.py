@@ -0,0 +1,135 @@
+# deck_builder.py
+from langchain_openai import ChatOpenAI
+from langchain_core.prompts import ChatPromptTemplate  # 导入提示模板相关类
+
+from logger import LOG  # 导入日志工具
+from llm_cache import llm_cache  # 导入共享的 LLM 响应缓存
+from markdown_chunker import estimate_tokens
+from input_parser import image_pattern, strip_code_fence, validate_slides_markdown
+
+class DeckBuilder:
+    """
+    融合模式：一次 LLM 调用把 docx 解析出的原始 markdown 直接生成最终的幻灯片内容，
+    同时完成 ContentFormatter 的格式化与 ContentAssistant 的每页一图调整。
+
+    生成结果先按解析器语法做本地校验，校验失败或输出被截断时调用 fallback
+    （通常是格式化 + 配图调整两步流程）。输入超过 max_input_tokens 时输出几乎必然被截断，
+    不再尝试融合调用，直接使用 fallback。最终结果（包括 fallback 的结果）都写入缓存，
+    同一份文档不会再次为失败的融合调用付费。
+    """
+    def __init__(self, prompt_file="./prompts/deck_builder.txt", max_input_tokens=3000):
+        """
+        参数:
+            prompt_file (str): 系统提示词文件
+            max_input_tokens (int): 尝试融合调用的最大输入 token 数，通常与 ContentFormatter 的 max_chunk_tokens 一致
+        """
+        self.prompt_file = prompt_file
+        self.max_input_tokens = max_input_tokens
+        self.prompt = self.load_prompt()
+        self.create_builder()
+
+    def load_prompt(self):
+        """
+        从文件加载系统提示语。
+        """
+        try:
+            with open(self.prompt_file, "r", encoding="utf-8") as file:
+                return file.read().strip()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"找不到提示文件 {self.prompt_file}!")
+
+    def create_builder(self):
+        """
+        初始化提示模板与模型。
+        """
+        system_prompt = ChatPromptTemplate.from_messages([
+            ("system", self.prompt),  # 系统提示部分
+            ("human", "{input}"),  # 原始 markdown
+        ])
+
+        self.model = ChatOpenAI(
+            model="gpt-4o-mini",
+            temperature=0.5,
+            max_tokens=4096,
+        )
+
+        self.builder = system_prompt | self.model
+
+    def _check(self, raw_content, response):
+        """
+        校验模型输出，返回 (去掉代码块围栏后的内容, 问题列表)。
+        """
+        content = strip_code_fence(response.content)
+        metadata = getattr(response, "response_metadata", None) or {}
+        if metadata.get("finish_reason") == "length":
+            return content, ["输出达到 max_tokens 被截断"]
+
+        image_paths = [match.group(1).strip() for match in image_pattern.finditer(raw_content)]
+        return content, validate_slides_markdown(content, image_paths)
+
+    def build(self, raw_content, fallback=None):
+        """
+        一次调用生成最终的幻灯片 markdown。
+
+        参数:
+            raw_content (str | Iterable[str]): docx 解析出的 markdown 原始格式或内容块
+            fallback (callable, optional): 校验失败时调用 fallback(raw_content) 生成结果
+
+        返回:
+            str: 幻灯片 markdown 内容
+
+        异常:
+            ValueError: 校验失败且没有提供 fallback
+        """
+        raw_content = raw_content if isinstance(raw_content, str) else ''.join(raw_content)
+        key = llm_cache.make_key(self.prompt, self.model, raw_content)
+        content = llm_cache.get(key)
+        if content is not None:
+            return content
+
+        problems = self._check_input(raw_content)
+        if not problems:
+            content, problems = self._check(raw_content, self.builder.invoke({"input": raw_content}))
+        if problems:
+            self._require_fallback(problems, fallback)
+            content = fallback(raw_content)
+        return self._store(key, content)
+
+    async def abuild(self, raw_content, fallback=None):
+        """
+        build 的异步版本，使用 ainvoke 调用模型；fallback 为返回可等待对象的函数。
+        """
+        raw_content = raw_content if isinstance(raw_content, str) else ''.join(raw_content)
+        key = llm_cache.make_key(self.prompt, self.model, raw_content)
+        content = llm_cache.get(key)
+        if content is not None:
+            return content
+
+        problems = self._check_input(raw_content)
+        if not problems:
+            content, problems = self._check(raw_content, await self.builder.ainvoke({"input": raw_content}))
+        if problems:
+            self._require_fallback(problems, fallback)
+            content = await fallback(raw_content)
+        return self._store(key, content)
+
+    def _check_input(self, raw_content):
+        """
+        输入过长时返回问题列表，不再尝试融合调用。
+        """
+        tokens = estimate_tokens(raw_content)
+        if tokens > self.max_input_tokens:
+            return [f"输入约 {tokens} tokens，超过融合模式上限 {self.max_input_tokens}"]
+        return []
+
+    @staticmethod
+    def _require_fallback(problems, fallback):
+        LOG.warning(f"[DeckBuilder] 改用两步流程: {problems[:5]}")
+        if fallback is None:
+            raise ValueError(f"生成的幻灯片内容未通过校验: {problems}")
+
+    @staticmethod
+    def _store(key, content):
+        llm_cache.set(key, content)
+        LOG.debug(f"[DeckBuilder 生成]\n{content}")
+        return content
@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from logger import LOG  # 导入日志工具
+
+# 孤立的元数据文件与临时文件超过该时间（秒）才清理，避免删除其他进程正在写入的条目
+ORPHAN_GRACE_SECONDS = 60
+
+# 通用的磁盘缓存：原始字节 + 元数据，支持 TTL、总字节配额与 LRU 淘汰
+class DiskCache:
+    """
+    基于磁盘的键值缓存。
+
+    每个条目由两个文件组成：<sha256(key)>.bin 保存原始字节，<sha256(key)>.json 保存元数据
+    （写入时间及调用方附带的信息）。.bin 文件的修改时间即最近访问时间，因此重启后仍能恢复 LRU 顺序。
+    两个文件的字节数之和超过 max_bytes 时淘汰最久未使用的条目；设置 ttl（秒）后，过期条目在读取时视为未命中并删除。
+
+    多个进程可以共享同一个缓存目录：读取时直接查找磁盘上的文件，其他进程写入的条目同样可以命中；
+    每隔 rescan_interval 秒重新扫描目录，按所有进程写入的总字节数执行配额。
+    """
+    def __init__(self, cache_dir, max_bytes=100 * 1024 * 1024, ttl=None, rescan_interval=10):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.rescan_interval = rescan_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # 文件名 -> 数据与元数据字节数，按最近访问时间从旧到新排列
+        self._total_bytes = 0
+        self._last_scan = 0.0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def _name(key):
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def _data_path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.bin")
+
+    def _meta_path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def _load_index(self):
+        """
+        扫描缓存目录并用结果替换内存索引。扫描在锁外进行，只在替换索引时持有锁。
+        """
+        entries = self._scan()
+        with self._lock:
+            self._entries = entries
+            self._total_bytes = sum(entries.values())
+            self._last_scan = time.monotonic()
+
+    def _scan(self):
+        """
+        按文件修改时间构建 LRU 索引，并清理超过宽限期的孤立元数据与临时文件。
+        """
+        now = time.time()
+        data_files, meta_files = {}, {}
+        for entry in os.scandir(self.cache_dir):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # 扫描期间被其他进程删除
+            name, extension = os.path.splitext(entry.name)
+            if extension == ".bin":
+                data_files[name] = (stat.st_mtime, stat.st_size)
+            elif extension == ".json":
+                meta_files[name] = (stat.st_mtime, stat.st_size)
+            elif extension == ".tmp" and now - stat.st_mtime > ORPHAN_GRACE_SECONDS:
+                self._unlink(entry.path)
+
+        for name, (mtime, _) in meta_files.items():
+            if name not in data_files and now - mtime > ORPHAN_GRACE_SECONDS:
+                self._unlink(self._meta_path(name))
+
+        # 元数据尚未写出的条目可能正在被其他进程写入，暂不计入索引
+        entries = sorted((mtime, name, size + meta_files[name][1])
+                         for name, (mtime, size) in data_files.items() if name in meta_files)
+        return OrderedDict((name, size) for _, name, size in entries)
+
+    def get_with_meta(self, key):
+        """
+        读取缓存的原始字节与元数据，未命中或已过期时返回 (None, None)。
+
+        文件读取不持有锁，多个线程可以并行读取不同的条目；锁只保护内存索引与统计信息。
+        """
+        name = self._name(key)
+        data_path = self._data_path(name)
+        try:
+            with open(self._meta_path(name), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            expired = self.ttl is not None and time.time() - meta["created_at"] > self.ttl
+            if not expired:
+                with open(data_path, "rb") as f:
+                    data = f.read()
+                os.utime(data_path)  # 更新访问时间，用于重启后恢复 LRU 顺序
+        except FileNotFoundError:
+            # 条目不存在，或已被其他进程淘汰：只从本进程的索引中移除
+            with self._lock:
+                self._total_bytes -= self._entries.pop(name, 0)
+                self.misses += 1
+            return None, None
+        except (OSError, ValueError, KeyError) as e:
+            LOG.warning(f"[磁盘缓存] 读取缓存文件失败 {data_path}: {e}")
+            self._remove(name)
+            with self._lock:
+                self.misses += 1
+            return None, None
+
+        if expired:
+            self._remove(name)
+            with self._lock:
+                self.expirations += 1
+                self.misses += 1
+            return None, None
+
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+            else:
+                # 其他进程写入的条目不在本进程的索引中
+                self._entries[name] = len(data) + self._meta_size(name)
+                self._total_bytes += self._entries[name]
+            self.hits += 1
+        return data, meta
+
+    def _meta_size(self, name):
+        try:
+            return os.path.getsize(self._meta_path(name))
+        except FileNotFoundError:
+            return 0
+
+    def get(self, key):
+        """
+        读取缓存的原始字节，未命中或已过期时返回 None。
+        """
+        data, _ = self.get_with_meta(key)
+        return data
+
+    def set(self, key, data, **meta):
+        """
+        写入原始字节及附加元数据，并在超出容量时淘汰最久未使用的条目。
+
+        文件先写入临时文件再原子替换，写入不持有锁；锁只在更新索引与挑选淘汰条目时持有。
+        本进程的索引超出配额时直接按索引淘汰；每隔 rescan_interval 秒才重新扫描目录，
+        计入其他进程写入的条目，而不是每次写入都扫描。
+        """
+        name = self._name(key)
+        meta_bytes = json.dumps(dict(meta, created_at=time.time()), ensure_ascii=False).encode("utf-8")
+        # 先原子替换数据文件再写元数据：读取方与索引扫描都以元数据文件为准，看到元数据时数据已经完整
+        self._write_atomic(self._data_path(name), data)
+        self._write_atomic(self._meta_path(name), meta_bytes)
+
+        with self._lock:
+            self._total_bytes -= self._entries.pop(name, 0)
+            self._entries[name] = len(data) + len(meta_bytes)
+            self._total_bytes += self._entries[name]
+            rescan = time.monotonic() - self._last_scan > self.rescan_interval
+        if rescan:
+            self._load_index()
+
+        with self._lock:
+            victims = []
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                oldest_name = next(iter(self._entries))
+                self._total_bytes -= self._entries.pop(oldest_name)
+                victims.append(oldest_name)
+            self.evictions += len(victims)
+        for victim in victims:
+            self._unlink_entry(victim)
+
+    @staticmethod
+    def _write_atomic(path, data):
+        # 临时文件名包含进程号与线程号，多个进程同时写入同一个键时互不干扰
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _unlink_entry(self, name):
+        for path in (self._data_path(name), self._meta_path(name)):
+            self._unlink(path)
+
+    def _remove(self, name):
+        with self._lock:
+            self._total_bytes -= self._entries.pop(name, 0)
+        self._unlink_entry(name)
+
+    def stats(self):
+        """
+        返回缓存统计信息。
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
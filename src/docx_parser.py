@@ -1,43 +1,222 @@
 import os
+import hashlib
+import posixpath
+import zipfile
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from lxml import etree
 from docx import Document
 from docx.oxml.ns import qn
+from docx.styles import BabelFish
 from PIL import Image
 from io import BytesIO
 
 from logger import LOG  # 引入日志模块，用于记录调试信息
 
-def is_paragraph_list_item(paragraph):
+# PowerPoint 可直接插入的图像格式：原始字节原样写出，不再解码和重新编码
+PASSTHROUGH_EXTENSIONS = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/gif': '.gif',
+}
+
+# 流式解析使用的 XML 标签
+W_BODY = qn('w:body')
+W_P = qn('w:p')
+W_PPR = qn('w:pPr')
+W_PSTYLE = qn('w:pStyle')
+W_R = qn('w:r')
+W_HYPERLINK = qn('w:hyperlink')
+W_T = qn('w:t')
+W_TAB = qn('w:tab')
+W_PTAB = qn('w:ptab')
+W_BR = qn('w:br')
+W_CR = qn('w:cr')
+W_NO_BREAK_HYPHEN = qn('w:noBreakHyphen')
+W_DRAWING = qn('w:drawing')
+W_STYLE = qn('w:style')
+W_NAME = qn('w:name')
+W_VAL = qn('w:val')
+W_TYPE = qn('w:type')
+W_STYLE_ID = qn('w:styleId')
+W_DEFAULT = qn('w:default')
+A_BLIP = qn('a:blip')
+R_EMBED = qn('r:embed')
+
+# OPC 包中的关系与内容类型
+PKG_RELATIONSHIP = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+CT_DEFAULT = '{http://schemas.openxmlformats.org/package/2006/content-types}Default'
+CT_OVERRIDE = '{http://schemas.openxmlformats.org/package/2006/content-types}Override'
+RT_OFFICE_DOCUMENT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+RT_STYLES = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles'
+
+def _is_list_style(style_name):
     """
-    检查段落是否为列表项。
-    判断依据是段落的样式名称是否包含 'list bullet' 或 'list number'，
-    分别对应项目符号列表和编号列表。
+    样式名称是否为项目符号列表或编号列表。
     """
-    style_name = paragraph.style.name.lower()
+    style_name = style_name.lower()
     return 'list bullet' in style_name or 'list number' in style_name
 
-def get_paragraph_list_level(paragraph):
+def _list_level(p, style_name):
     """
-    获取段落的列表级别（缩进层级）。
-    首先尝试通过 XML 结构判断，如果无法获取，则通过样式名称中的数字判断。
+    根据段落元素与样式名称获取列表级别，供 python-docx 与流式两种解析路径共用。
     """
-    p = paragraph._p
     numPr = p.find(qn('w:numPr'))
     if numPr is not None:
         ilvl = numPr.find(qn('w:ilvl'))
         if ilvl is not None:
             return int(ilvl.get(qn('w:val')))
-    
-    style_name = paragraph.style.name.lower()
-    if 'list bullet' in style_name or 'list number' in style_name:
-        for word in style_name.split():
+
+    if _is_list_style(style_name):
+        for word in style_name.lower().split():
             if word.isdigit():
                 return int(word) - 1
     return 0
 
-def generate_markdown_from_docx(docx_filename):
+def is_paragraph_list_item(paragraph):
+    """
+    检查段落是否为列表项。
+    判断依据是段落的样式名称是否包含 'list bullet' 或 'list number'，
+    分别对应项目符号列表和编号列表。
+    """
+    return _is_list_style(paragraph.style.name)
+
+def get_paragraph_list_level(paragraph):
+    """
+    获取段落的列表级别（缩进层级）。
+    首先尝试通过 XML 结构判断，如果无法获取，则通过样式名称中的数字判断。
+    """
+    return _list_level(paragraph._p, paragraph.style.name)
+
+def _reencode_to_png(image_bytes, image_path):
+    """
+    将图像重新编码为 PNG 并保存，在当前线程或文档的重新编码进程池中执行。
+    """
+    image = Image.open(BytesIO(image_bytes))
+    if image.mode in ('RGBA', 'P', 'LA'):
+        image = image.convert('RGB')  # 将图像转换为 RGB 模式，以兼容 PNG 格式
+    image.save(image_path, 'PNG')
+
+# 小于该字节数的图像在当前线程中直接重新编码，较大的图像提交到进程池
+INLINE_REENCODE_BYTES = 512 * 1024
+# 每个文档的重新编码进程池的最大进程数
+REENCODE_WORKERS = min(4, os.cpu_count() or 1)
+
+class _PendingImage:
+    """
+    尚在进程池中重新编码的图像链接，编码成功后才输出。
+    """
+    def __init__(self, block, image_path, future):
+        self.block = block
+        self.image_path = image_path
+        self.future = future
+
+class _ImageExtractor:
+    """
+    保存 docx 中嵌入的图像。
+
+    同一图像部件或内容相同的图像只保存一次，之后的引用复用同一个文件；
+    PowerPoint 支持的格式直接写出原始字节，其余格式重新编码为 PNG：小于 inline_bytes 的图像在当前线程中编码，
+    较大的图像提交到本文档的进程池。重新编码失败的图像不产生链接。
+
+    进程池在第一张较大的图像出现时才创建，close() 时关闭，子进程不会在文档处理完后继续驻留。
+    docx 解析通常在多线程服务的线程池中执行，fork 多线程进程可能在子进程中死锁，因此使用 spawn 启动子进程；
+    spawn 进程池只在没有空闲进程时才启动新进程，进程数不超过同时等待编码的图像数与 max_workers 中的较小者。
     """
-    从指定的 docx 文件生成 Markdown 格式的内容，并将所有图像另存为文件并插入 Markdown 内容中。
+    def __init__(self, images_dir, inline_bytes=INLINE_REENCODE_BYTES, max_workers=REENCODE_WORKERS):
+        self.images_dir = images_dir
+        self.inline_bytes = inline_bytes
+        self.max_workers = max_workers
+        self._pool = None
+        self._paths_by_part = {}  # 图像部件名 -> (编号, 文件路径, Future)，编码失败时为 None
+        self._paths_by_digest = {}  # 内容哈希 -> (编号, 文件路径, Future)，编码失败时为 None
+
+    def save(self, image_part):
+        """
+        保存图像部件，返回 (图像编号, 文件路径, Future)。Future 仅在图像提交到进程池时不为 None；
+        在当前线程中重新编码失败时返回 None。
+        """
+        if image_part.partname in self._paths_by_part:
+            return self._paths_by_part[image_part.partname]
+
+        image_bytes = image_part.blob  # 获取图像数据
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        if digest in self._paths_by_digest:
+            saved = self._paths_by_digest[digest]
+        else:
+            image_number = len(self._paths_by_digest) + 1
+            extension = PASSTHROUGH_EXTENSIONS.get(image_part.content_type)
+            future = None
+            if extension is not None:
+                image_path = os.path.join(self.images_dir, f'{image_number}{extension}')
+                with open(image_path, 'wb') as f:
+                    f.write(image_bytes)
+            else:
+                image_path = os.path.join(self.images_dir, f'{image_number}.png')
+                if len(image_bytes) < self.inline_bytes:
+                    try:
+                        _reencode_to_png(image_bytes, image_path)
+                    except Exception as e:
+                        LOG.error(f"图像重新编码失败，已忽略 {image_path}: {e}")
+                        image_path = None
+                else:
+                    if self._pool is None:
+                        self._pool = ProcessPoolExecutor(
+                            max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')
+                        )
+                    future = self._pool.submit(_reencode_to_png, image_bytes, image_path)
+            saved = (image_number, image_path, future) if image_path is not None else None
+            self._paths_by_digest[digest] = saved
+
+        self._paths_by_part[image_part.partname] = saved
+        return saved
+
+    def close(self):
+        """
+        关闭进程池：取消尚未开始的重新编码任务（调用方提前结束遍历时），等待子进程退出。
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+def _resolve_pending_images(blocks):
+    """
+    按原顺序产出内容块。进程池中的图像编码完成前，其链接及之后的内容块暂存在队列中，
+    编码成功输出链接，失败则丢弃该链接，避免 Markdown 引用不存在的文件。
+    """
+    queue = deque()
+    for block in blocks:
+        queue.append(block)
+        while queue and (isinstance(queue[0], str) or queue[0].future.done()):
+            resolved = _resolve_block(queue.popleft())
+            if resolved:
+                yield resolved
+    while queue:
+        resolved = _resolve_block(queue.popleft())
+        if resolved:
+            yield resolved
+
+def _resolve_block(block):
+    if isinstance(block, str):
+        return block
+    try:
+        block.future.result()
+    except Exception as e:
+        LOG.error(f"图像重新编码失败，已忽略 {block.image_path}: {e}")
+        return None
+    return block.block
+
+def iter_markdown_blocks(docx_filename, streaming=True):
+    """
+    从指定的 docx 文件逐段生成 Markdown 内容块，并将所有图像另存为文件并插入 Markdown 内容中。
     支持标题、列表项、图像和普通段落的转换。
+
+    每个段落产出一个或多个字符串块，调用方可以边解析边写入文件或交给格式化器，
+    不需要在内存中拼接整篇文档。较大的需要重新编码的图像在本文档的进程池中并行处理，
+    其链接在编码完成后按原顺序产出。
+
+    默认使用基于 iterparse 的流式解析，适合非常大的文档；streaming=False 时使用 python-docx 的文档对象模型。
     """
     # 获取 docx 文件的基本名称，用于创建图像文件夹
     docx_basename = os.path.splitext(os.path.basename(docx_filename))[0]
@@ -45,10 +224,55 @@ def generate_markdown_from_docx(docx_filename):
     if not os.path.exists(images_dir):
         os.makedirs(images_dir)  # 如果目录不存在，则创建
 
-    document = Document(docx_filename)  # 打开 docx 文件
-    markdown_content = ''
-    image_counter = 1  # 图像编号计数器
+    extractor = _ImageExtractor(images_dir)
+    try:
+        if streaming:
+            blocks = _iter_paragraph_blocks_streaming(docx_filename, extractor)
+        else:
+            document = Document(docx_filename)  # 打开 docx 文件
+            blocks = _iter_paragraph_blocks(document, extractor)
+        yield from _resolve_pending_images(blocks)
+    finally:
+        extractor.close()
+
+def _paragraph_blocks(style, text, list_level, images):
+    """
+    将一个段落转换为 Markdown 内容块。
+
+    参数:
+        style: 段落样式名称
+        text: 去除首尾空格后的段落文本
+        list_level: 列表级别，不是列表项时为 None
+        images: 段落中图像的 (编号, 文件路径, Future) 序列，重新编码失败的图像为 None
+    """
+    # 确定标题级别
+    if style == 'Title':
+        heading_level = 1
+    elif 'Heading' in style:
+        heading_level = int(style.replace('Heading ', '')) + 1
+    else:
+        heading_level = None
+
+    # 在 Markdown 中添加图像链接
+    for image in images:
+        if image is None:
+            continue
+        image_number, image_path, future = image
+        block = f'![图片{image_number}]({image_path})\n\n'
+        yield block if future is None else _PendingImage(block, image_path, future)
+
+    # 根据段落类型格式化文本内容
+    if heading_level:
+        yield f'{"#" * heading_level} {text}\n\n'  # 使用 Markdown 语法表示标题
+    elif list_level is not None:
+        yield f'{"  " * list_level}- {text}\n'  # 使用缩进和 “-” 表示列表项
+    elif text:
+        yield f'{text}\n\n'  # 普通段落直接添加文本
 
+def _iter_paragraph_blocks(document, extractor):
+    """
+    通过 python-docx 的文档对象模型逐段产出 Markdown 内容块，图像交给 extractor 保存。
+    """
     for para in document.paragraphs:
         style = para.style.name  # 获取段落样式名称
         text = para.text.strip()  # 获取段落文本并去除首尾空格
@@ -57,21 +281,11 @@ def generate_markdown_from_docx(docx_filename):
         if not text and not para.runs:
             continue
 
-        # 检查段落类型：标题、列表项、普通段落
-        is_heading = 'Heading' in style
-        is_title = style == 'Title'
-        is_list = is_paragraph_list_item(para)
-        list_level = get_paragraph_list_level(para) if is_list else 0
-
-        # 确定标题级别
-        if is_title:
-            heading_level = 1
-        elif is_heading:
-            heading_level = int(style.replace('Heading ', '')) + 1
-        else:
-            heading_level = None
+        # 检查段落类型：列表项及其级别
+        list_level = _list_level(para._p, style) if _is_list_style(style) else None
 
         # 检查段落中的每个运行，寻找并保存图像
+        images = []
         for run in para.runs:
             # 查找 w:drawing 标签中的图像
             drawings = run.element.findall('.//w:drawing', namespaces={'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'})
@@ -81,30 +295,194 @@ def generate_markdown_from_docx(docx_filename):
                 for blip in blips:
                     rId = blip.get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed')
                     image_part = document.part.related_parts[rId]
-                    image_bytes = image_part.blob  # 获取图像数据
-                    image_filename = f'{image_counter}.png'
-                    image_path = os.path.join(images_dir, image_filename)
-                    
-                    # 使用 PIL 保存图像为 PNG 格式
-                    image = Image.open(BytesIO(image_bytes))
-                    if image.mode in ('RGBA', 'P', 'LA'):
-                        image = image.convert('RGB')  # 将图像转换为 RGB 模式，以兼容 PNG 格式
-                    image.save(image_path, 'PNG')
-
-                    # 在 Markdown 中添加图像链接
-                    markdown_content += f'![图片{image_counter}]({image_path})\n\n'
-                    image_counter += 1
-
-        # 根据段落类型格式化文本内容
-        if heading_level:
-            markdown_content += f'{"#" * heading_level} {text}\n\n'  # 使用 Markdown 语法表示标题
-        elif is_list:
-            markdown_content += f'{"  " * list_level}- {text}\n'  # 使用缩进和 “-” 表示列表项
-        elif text:
-            markdown_content += f'{text}\n\n'  # 普通段落直接添加文本
-
-     # 记录调试信息
-    LOG.debug(f"从 docx 文件解析的 markdown 内容:\n{markdown_content}")
+                    # 重复引用的图像复用已保存的文件
+                    images.append(extractor.save(image_part))
+
+        yield from _paragraph_blocks(style, text, list_level, images)
+
+class _ZipImagePart:
+    """
+    流式解析时使用的图像部件，接口与 python-docx 的 ImagePart 一致（partname、content_type、blob），
+    图像数据在保存时才从 zip 中读取。
+    """
+    def __init__(self, package, partname, content_type):
+        self._package = package
+        self.partname = partname
+        self.content_type = content_type
+
+    @property
+    def blob(self):
+        return self._package.read(self.partname.lstrip('/'))
+
+def _read_relationships(package, partname):
+    """
+    读取部件的关系文件，返回 关系 ID -> (关系类型, 目标部件名)，不包含外部链接。
+    """
+    directory, file_name = posixpath.split(partname.lstrip('/'))
+    rels_name = posixpath.join(directory, '_rels', f'{file_name}.rels')
+    if rels_name not in package.namelist():
+        return {}
+    relationships = {}
+    for rel in etree.fromstring(package.read(rels_name)).iter(PKG_RELATIONSHIP):
+        if rel.get('TargetMode') == 'External':
+            continue
+        target = posixpath.normpath(posixpath.join('/' + directory, rel.get('Target')))
+        relationships[rel.get('Id')] = (rel.get('Type'), target)
+    return relationships
+
+def _read_content_types(package):
+    """
+    读取 [Content_Types].xml，返回 (部件名 -> 内容类型, 扩展名 -> 内容类型)。
+    """
+    root = etree.fromstring(package.read('[Content_Types].xml'))
+    overrides = {el.get('PartName'): el.get('ContentType') for el in root.iter(CT_OVERRIDE)}
+    defaults = {el.get('Extension').lower(): el.get('ContentType') for el in root.iter(CT_DEFAULT)}
+    return overrides, defaults
+
+def _read_style_table(package, styles_partname):
+    """
+    预先读取段落样式表，返回 (样式 ID -> 样式名称, 默认段落样式名称)。
+    样式名称与 python-docx 的 style.name 一致（例如 'heading 1' 转换为 'Heading 1'）。
+    """
+    style_table, default_style = {}, 'Normal'
+    if styles_partname is None:
+        return style_table, default_style
+    for style in etree.fromstring(package.read(styles_partname.lstrip('/'))).iter(W_STYLE):
+        if style.get(W_TYPE) != 'paragraph':
+            continue
+        name_element = style.find(W_NAME)
+        name = BabelFish.internal2ui(name_element.get(W_VAL)) if name_element is not None else ''
+        style_table[style.get(W_STYLE_ID)] = name
+        if style.get(W_DEFAULT) in ('1', 'true', 'on'):
+            default_style = name
+    return style_table, default_style
+
+def _run_text(run):
+    """
+    运行的文本，与 python-docx 的 run.text 规则一致：制表符、换行与不间断连字符转换为对应字符。
+    """
+    parts = []
+    for child in run:
+        tag = child.tag
+        if tag == W_T:
+            parts.append(child.text or '')
+        elif tag in (W_TAB, W_PTAB):
+            parts.append('\t')
+        elif tag == W_BR:
+            parts.append('\n' if child.get(W_TYPE) in (None, 'textWrapping') else '')
+        elif tag == W_CR:
+            parts.append('\n')
+        elif tag == W_NO_BREAK_HYPHEN:
+            parts.append('-')
+    return ''.join(parts)
+
+def _paragraph_text(p):
+    """
+    段落的文本，包含直接子运行与超链接中的运行。
+    """
+    parts = []
+    for child in p:
+        if child.tag == W_R:
+            parts.append(_run_text(child))
+        elif child.tag == W_HYPERLINK:
+            parts.extend(_run_text(run) for run in child.iterchildren(W_R))
+    return ''.join(parts)
+
+def _iter_paragraph_blocks_streaming(docx_filename, extractor):
+    """
+    流式解析 docx 并逐段产出 Markdown 内容块，与 _iter_paragraph_blocks 的输出一致。
+
+    直接从 zip 中以 iterparse 读取主文档 XML，样式 ID 通过预先读取的样式表解析为名称，
+    正文中每个顶层元素处理完后即清除，内存占用不随文档长度增长。
+    与 python-docx 的 document.paragraphs 一致，只处理正文中的顶层段落。
+    """
+    with zipfile.ZipFile(docx_filename) as package:
+        package_rels = _read_relationships(package, '/')
+        document_partname = next(
+            target for rel_type, target in package_rels.values() if rel_type == RT_OFFICE_DOCUMENT
+        )
+        document_rels = _read_relationships(package, document_partname)
+        styles_partname = next(
+            (target for rel_type, target in document_rels.values() if rel_type == RT_STYLES), None
+        )
+        style_table, default_style = _read_style_table(package, styles_partname)
+        overrides, defaults = _read_content_types(package)
+
+        def image_part(rId):
+            partname = document_rels[rId][1]
+            content_type = overrides.get(partname) or defaults.get(posixpath.splitext(partname)[1][1:].lower())
+            return _ZipImagePart(package, partname, content_type)
+
+        with package.open(document_partname.lstrip('/')) as document_xml:
+            for _, element in etree.iterparse(document_xml, events=('end',)):
+                parent = element.getparent()
+                if parent is None or parent.tag != W_BODY:
+                    continue  # 只在正文的顶层元素结束时处理，嵌套元素随其父元素一起清除
+
+                if element.tag == W_P:
+                    yield from _streaming_paragraph_blocks(element, style_table, default_style, image_part, extractor)
+
+                # 清除已处理的元素及其之前的兄弟节点，释放内存
+                element.clear()
+                while element.getprevious() is not None:
+                    del parent[0]
+
+def _streaming_paragraph_blocks(p, style_table, default_style, image_part, extractor):
+    """
+    将流式解析得到的段落元素转换为 Markdown 内容块。
+    """
+    style = default_style
+    p_pr = p.find(W_PPR)
+    if p_pr is not None:
+        p_style = p_pr.find(W_PSTYLE)
+        if p_style is not None:
+            style = style_table.get(p_style.get(W_VAL), default_style)
+
+    text = _paragraph_text(p).strip()
+    runs = p.findall(W_R)
+    # 如果段落为空且没有任何运行对象，则跳过
+    if not text and not runs:
+        return
+
+    list_level = _list_level(p, style) if _is_list_style(style) else None
+
+    images = []
+    for run in runs:
+        for drawing in run.iter(W_DRAWING):
+            for blip in drawing.iter(A_BLIP):
+                images.append(extractor.save(image_part(blip.get(R_EMBED))))
+
+    yield from _paragraph_blocks(style, text, list_level, images)
+
+def write_markdown_from_docx(docx_filename, output):
+    """
+    将 docx 文件转换为 Markdown 并逐块写入 output，内存占用与文档大小无关。
+
+    参数:
+        docx_filename: docx 文件路径
+        output: 输出文件路径，或具有 write 方法的文本文件对象
+
+    返回:
+        写入的字符数
+    """
+    if isinstance(output, str):
+        with open(output, 'w', encoding='utf-8') as f:
+            return write_markdown_from_docx(docx_filename, f)
+
+    written = 0
+    for block in iter_markdown_blocks(docx_filename):
+        written += output.write(block)
+    LOG.debug(f"从 docx 文件 {docx_filename} 写出 markdown 内容 {written} 个字符")
+    return written
+
+def generate_markdown_from_docx(docx_filename):
+    """
+    从指定的 docx 文件生成完整的 Markdown 字符串。需要整篇内容时使用，否则优先使用 iter_markdown_blocks。
+    """
+    markdown_content = ''.join(iter_markdown_blocks(docx_filename))
+
+    # 只记录长度，避免大文档的全文日志占用双倍内存
+    LOG.debug(f"从 docx 文件 {docx_filename} 解析的 markdown 内容共 {len(markdown_content)} 个字符")
 
     return markdown_content
 
@@ -113,9 +491,5 @@ if __name__ == "__main__":
     docx_filename = 'inputs/docx/multimodal_llm_overview.docx'
     docx_basename = os.path.splitext(os.path.basename(docx_filename))[0]
 
-    # 生成 Markdown 内容
-    markdown_content = generate_markdown_from_docx(docx_filename)
-
-    # 保存 Markdown 内容到文件
-    with open(f'{docx_basename}.md', 'w', encoding='utf-8') as f:
-        f.write(markdown_content)
+    # 边解析边保存 Markdown 内容到文件
+    write_markdown_from_docx(docx_filename, f'{docx_basename}.md')
@@ -1,42 +1,113 @@
 import gradio as gr
 import os
+import asyncio
+import threading
 
 from gradio.data_classes import FileData
 
 from config import Config
 from chatbot import ChatBot
+from chat_history import ChatHistoryManager, set_history_manager, start_stats_logger
+from history_summarizer import HistorySummarizer
+from sqlite_chat_history import SQLiteChatStore, SQLiteHistoryManager
 from content_formatter import ContentFormatter
 from content_assistant import ContentAssistant
+from deck_builder import DeckBuilder
 from image_advisor import ImageAdvisor
 from input_parser import parse_input_text
-from ppt_generator import generate_presentation
+from ppt_generator import generate_presentation, StreamingPresentation
 from template_manager import load_template, get_layout_mapping
 from layout_manager import LayoutManager
 from logger import LOG
-from openai_whisper import asr, transcribe
-# from minicpm_v_model import chat_with_image
+from openai_whisper import asr, transcribe, whisper_model
+from image_worker import ImageDescriptionWorker
+from model_loader import LazyModel
 from docx_parser import generate_markdown_from_docx
 
 
 os.environ["LANGCHAIN_TRACING_V2"] = "true"
 os.environ["LANGCHAIN_PROJECT"] = "ChatPPT"
 
-# 实例化 Config，加载配置文件
-config = Config()
-chatbot = ChatBot(config.chatbot_prompt)
-content_formatter = ContentFormatter(config.content_formatter_prompt)
-content_assistant = ContentAssistant(config.content_assistant_prompt)
-image_advisor = ImageAdvisor(config.image_advisor_prompt)
+# 服务组件在 setup() 中创建，界面在 build_demo() 中创建，两者都只在 __main__ 中调用：
+# 图像理解工作进程以 spawn 方式启动时会把本脚本作为 __mp_main__ 重新导入，
+# 模块级代码只定义函数，子进程不会重复加载配置、创建 LLM 客户端、加载模板或构建界面
+config = None
+chatbot = None
+content_formatter = None
+content_assistant = None
+deck_builder = None
+image_advisor = None
+layout_manager = None
+_image_worker = None
+_image_worker_lock = threading.Lock()
+# 会话 ID -> (回复内容, 演示文稿路径)：对话回复流式生成期间同步构建的演示文稿
+_streamed_decks = {}
 
-# 加载 PowerPoint 模板，并获取可用布局
-ppt_template = load_template(config.ppt_template)
+def setup():
+    """
+    加载配置并创建聊天机器人、格式化器、配图顾问与布局管理器等服务组件。
+    """
+    global config, chatbot, content_formatter, content_assistant, deck_builder, image_advisor, layout_manager
+
+    # 实例化 Config，加载配置文件
+    config = Config()
+    if config.chat_history_backend == "sqlite":
+        # 多个服务进程共享同一个 SQLite 会话库，重启后会话不丢失
+        set_history_manager(SQLiteHistoryManager(SQLiteChatStore(config.chat_history_db)))
+    elif config.history_summarizer_prompt:
+        # 被裁剪的早期轮次压缩为摘要保留在会话历史中
+        set_history_manager(ChatHistoryManager(summarizer=HistorySummarizer(config.history_summarizer_prompt)))
+    chatbot = ChatBot(config.chatbot_prompt)
+    content_formatter = ContentFormatter(config.content_formatter_prompt)
+    content_assistant = ContentAssistant(config.content_assistant_prompt)
+    deck_builder = (DeckBuilder(config.deck_builder_prompt, content_formatter.max_chunk_tokens)
+                    if config.docx_fused_mode else None)
+    image_advisor = ImageAdvisor(config.image_advisor_prompt)
+
+    # 加载 PowerPoint 模板，并获取可用布局
+    ppt_template = load_template(config.ppt_template)
 
-# 初始化 LayoutManager，管理幻灯片布局
-layout_manager = LayoutManager(get_layout_mapping(ppt_template))
+    # 初始化 LayoutManager，管理幻灯片布局
+    layout_manager = LayoutManager(get_layout_mapping(ppt_template))
+
+def get_image_worker():
+    """
+    返回图像理解工作进程的客户端，首次使用时创建。
+    图像理解模型运行在独立的工作进程中，推理期间不阻塞其他用户的请求。
+    """
+    global _image_worker
+    with _image_worker_lock:
+        if _image_worker is None:
+            _image_worker = ImageDescriptionWorker()
+        return _image_worker
 
 
+async def format_and_adjust(raw_content):
+    """
+    两步流程：先格式化 docx 解析出的 markdown，再调整为每页一张图片。长文档逐块格式化、逐块调整后再拼接。
+    """
+    title, chunks = await content_formatter.aformat_chunks(raw_content)
+    return await content_assistant.aadjust_chunks(chunks, title)
+
+def get_session_id(request: gr.Request):
+    """
+    返回 Gradio 浏览器会话对应的聊天会话 ID，无法获取时使用 ChatBot 的默认会话。
+    """
+    session_hash = getattr(request, "session_hash", None)
+    return f"gradio-{session_hash}" if session_hash else chatbot.session_id
+
+def end_session(request: gr.Request):
+    """
+    浏览器会话结束（页面关闭或刷新）时清空对应的聊天历史。
+    """
+    if getattr(request, "session_hash", None):
+        _streamed_decks.pop(get_session_id(request), None)
+        chatbot.clear_session(get_session_id(request))
+
 # 定义生成幻灯片内容的函数
-def generate_contents(message, history):
+# 处理函数均为异步函数：LLM 调用使用 ainvoke，ASR、docx 解析与 pptx 渲染等阻塞操作放到线程池中执行，
+# 不再长时间占用 Gradio 的工作线程。generate_contents 是异步生成器，对话回复边生成边显示
+async def generate_contents(message, history, request: gr.Request):
     try:
         # 初始化一个列表，用于收集用户输入的文本和音频转录
         texts = []
@@ -53,21 +124,25 @@ def generate_contents(message, history):
             file_ext = os.path.splitext(uploaded_file)[1].lower()
             if file_ext in ('.wav', '.flac', '.mp3'):
                 # 使用 OpenAI Whisper 模型进行语音识别
-                audio_text = asr(uploaded_file)
+                audio_text = await asyncio.to_thread(asr, uploaded_file)
                 texts.append(audio_text)
             # 解释说明图像文件
-            # elif file_ext in ('.jpg', '.png', '.jpeg'):
-            #     if text_input:
-            #         image_desc = chat_with_image(uploaded_file, text_input)
-            #     else:
-            #         image_desc = chat_with_image(uploaded_file)
-            #     return image_desc
+            elif file_ext in ('.jpg', '.png', '.jpeg'):
+                if text_input:
+                    yield await get_image_worker().describe(uploaded_file, text_input)
+                else:
+                    yield await get_image_worker().describe(uploaded_file)
+                return
             # 使用 Docx 文件作为素材创建 PowerPoint
             elif file_ext in ('.docx', '.doc'):
                 # 调用 generate_markdown_from_docx 函数，获取 markdown 内容
-                raw_content = generate_markdown_from_docx(uploaded_file)
-                markdown_content = content_formatter.format(raw_content)
-                return content_assistant.adjust_single_picture(markdown_content)
+                raw_content = await asyncio.to_thread(generate_markdown_from_docx, uploaded_file)
+                if deck_builder is not None:
+                    # 融合模式一次生成，未通过校验时回退到两步流程
+                    yield await deck_builder.abuild(raw_content, fallback=format_and_adjust)
+                else:
+                    yield await format_and_adjust(raw_content)
+                return
             else:
                 LOG.debug(f"[格式不支持]: {uploaded_file}")
 
@@ -75,22 +150,31 @@ def generate_contents(message, history):
         user_requirement = "需求如下:\n" + "\n".join(texts)
         LOG.info(user_requirement)
 
-        # 与聊天机器人进行对话，生成幻灯片内容
-        slides_content = chatbot.chat_with_history(user_requirement)
-
-        return slides_content
+        # 与聊天机器人进行对话，流式生成幻灯片内容，每收到一段文本就刷新聊天气泡
+        # 每个浏览器会话使用独立的聊天历史，提示长度只取决于当前用户自己的对话
+        session_id = get_session_id(request)
+        _streamed_decks.pop(session_id, None)
+        deck = StreamingDeck()
+        slides_content = ""
+        async for token in chatbot.astream_with_history(user_requirement, session_id=session_id):
+            slides_content += token
+            yield slides_content
+            await deck.feed(token)
+        output_pptx = await deck.save()
+        if output_pptx:
+            _streamed_decks[session_id] = (slides_content, output_pptx)
     except Exception as e:
         LOG.error(f"[内容生成错误]: {e}")
         # 抛出 Gradio 错误，以便在界面上显示友好的错误信息
         raise gr.Error(f"网络问题，请重试:)")
         
 
-def handle_image_generate(history):
+async def handle_image_generate(history):
     try:
         # 获取聊天记录中的最新内容
         slides_content = history[-1]["content"]
 
-        content_with_images, image_pair = image_advisor.generate_images(slides_content)
+        content_with_images, image_pair = await image_advisor.agenerate_images(slides_content)
         
         # for k, v in image_pair.items():
         #     history.append(
@@ -108,83 +192,180 @@ def handle_image_generate(history):
         # 提示用户先输入主题内容或上传文件
         raise gr.Error(f"【提示】未找到合适配图，请重试！")
 
+class StreamingDeck:
+    """
+    在对话回复流式生成期间同步构建演示文稿：每收到完整的一行就交给 StreamingPresentation 解析，
+    章节结束的幻灯片在线程池中渲染。构建失败只记录日志，生成按钮会重新解析完整回复。
+    """
+    def __init__(self):
+        self._presentation = None
+        self._pending = ""
+        self._failed = False
+
+    async def feed(self, token):
+        self._pending += token
+        if "\n" not in token or self._failed:
+            return
+        text, self._pending = self._pending, ""
+        await self._run(self._feed, text)
+
+    def _feed(self, text):
+        if self._presentation is None:
+            self._presentation = StreamingPresentation(layout_manager, config.ppt_template)
+        self._presentation.feed(text)
+
+    async def save(self):
+        """
+        渲染剩余内容并保存，返回演示文稿路径；构建失败时返回 None。
+        """
+        if self._pending:
+            await self._run(self._feed, self._pending)
+        if self._presentation is None:
+            return None
+        result = await self._run(self._presentation.save)
+        return result[0] if result else None
+
+    async def _run(self, func, *args):
+        if self._failed:
+            return None
+        try:
+            return await asyncio.to_thread(func, *args)
+        except Exception as e:
+            self._failed = True
+            LOG.warning(f"[PPT 流式生成] 构建失败，将在生成时重新解析: {e}")
+            return None
+
+def render_pptx(slides_content):
+    """
+    解析幻灯片内容并生成 PowerPoint 文件，返回输出文件路径。
+    """
+    # 解析输入文本，生成幻灯片数据和演示文稿标题
+    powerpoint_data, presentation_title = parse_input_text(slides_content, layout_manager)
+    # 定义输出的 PowerPoint 文件路径
+    output_pptx = f"outputs/{presentation_title}.pptx"
+    
+    # 生成 PowerPoint 演示文稿
+    generate_presentation(powerpoint_data, config.ppt_template, output_pptx)
+    return output_pptx
+
+def get_model_status():
+    """
+    返回语音识别模型与图像理解工作进程的加载状态，用于界面展示。
+    """
+    return (
+        f"语音识别模型（{whisper_model.name}）：{whisper_model.status}  \n"
+        f"图像理解模型（MiniCPM-V）：{get_image_worker().status}"
+    )
+
+def refresh_model_status():
+    """
+    定时刷新模型状态，没有模型正在加载时（均已就绪、加载失败或未预热）停用定时器。
+    """
+    loading = LazyModel.LOADING in (whisper_model.status, get_image_worker().status)
+    return get_model_status(), gr.Timer(active=loading)
+
 # 定义处理生成按钮点击事件的函数
-def handle_generate(history):
+async def handle_generate(history, request: gr.Request):
     try:
         # 获取聊天记录中的最新内容
         slides_content = history[-1]["content"]
-        # 解析输入文本，生成幻灯片数据和演示文稿标题
-        powerpoint_data, presentation_title = parse_input_text(slides_content, layout_manager)
-        # 定义输出的 PowerPoint 文件路径
-        output_pptx = f"outputs/{presentation_title}.pptx"
-        
-        # 生成 PowerPoint 演示文稿
-        generate_presentation(powerpoint_data, config.ppt_template, output_pptx)
-        return output_pptx
+        # 最新内容就是流式生成时已构建的演示文稿，直接返回
+        streamed = _streamed_decks.get(get_session_id(request))
+        if streamed and streamed[0] == slides_content and os.path.exists(streamed[1]):
+            return streamed[1]
+        # 解析与渲染均为 CPU 密集操作，放到线程池中执行
+        return await asyncio.to_thread(render_pptx, slides_content)
     except Exception as e:
         LOG.error(f"[PPT 生成错误]: {e}")
         # 提示用户先输入主题内容或上传文件
         raise gr.Error(f"【提示】请先输入你的主题内容或上传文件")
 
-# 创建 Gradio 界面
-with gr.Blocks(
-    title="ChatPPT",
-    css="""
-    body { animation: fadeIn 2s; }
-    @keyframes fadeIn { from { opacity: 0; } to { opacity: 1; } }
-    """
-) as demo:
-
-    # 添加标题
-    gr.Markdown("## ChatPPT")
-
-    # 定义语音（mic）转文本的接口
-    # gr.Interface(
-    #     fn=transcribe,  # 执行转录的函数
-    #     inputs=[
-    #         gr.Audio(sources="microphone", type="filepath"),  # 使用麦克风录制的音频输入
-    #     ],
-    #     outputs="text",  # 输出为文本
-    #     flagging_mode="never",  # 禁用标记功能
-    # )
-
-    # 创建聊天机器人界面，提示用户输入
-    contents_chatbot = gr.Chatbot(
-        placeholder="<strong>AI 一键生成 PPT</strong><br><br>输入你的主题内容或上传音频文件",
-        height=800,
-        type="messages",
-    )
+def build_demo():
+    """
+    创建 Gradio 界面。
+    """
+    with gr.Blocks(
+        title="ChatPPT",
+        css="""
+        body { animation: fadeIn 2s; }
+        @keyframes fadeIn { from { opacity: 0; } to { opacity: 1; } }
+        """
+    ) as demo:
 
-    # 定义 ChatBot 和生成内容的接口
-    gr.ChatInterface(
-        fn=generate_contents,  # 处理用户输入的函数
-        chatbot=contents_chatbot,  # 绑定的聊天机器人
-        type="messages",
-        multimodal=True  # 支持多模态输入（文本和文件）
-    )
+        # 添加标题
+        gr.Markdown("## ChatPPT")
 
-    image_generate_btn = gr.Button("一键为 PowerPoint 配图")
+        # 展示语音识别与图像理解模型的加载状态，文本生成不依赖这两个模型，可立即使用
+        model_status = gr.Markdown(get_model_status)
+        status_timer = gr.Timer(5)
+        status_timer.tick(fn=refresh_model_status, outputs=[model_status, status_timer])
 
-    image_generate_btn.click(
-        fn=handle_image_generate,
-        inputs=contents_chatbot,
-        outputs=contents_chatbot,
-    )
+        # 定义语音（mic）转文本的接口
+        # gr.Interface(
+        #     fn=transcribe,  # 执行转录的函数
+        #     inputs=[
+        #         gr.Audio(sources="microphone", type="filepath"),  # 使用麦克风录制的音频输入
+        #     ],
+        #     outputs="text",  # 输出为文本
+        #     flagging_mode="never",  # 禁用标记功能
+        # )
 
-    # 创建生成 PowerPoint 的按钮
-    generate_btn = gr.Button("一键生成 PowerPoint")
+        # 创建聊天机器人界面，提示用户输入
+        contents_chatbot = gr.Chatbot(
+            placeholder="<strong>AI 一键生成 PPT</strong><br><br>输入你的主题内容或上传音频文件",
+            height=800,
+            type="messages",
+        )
 
-    # 监听生成按钮的点击事件
-    generate_btn.click(
-        fn=handle_generate,  # 点击时执行的函数
-        inputs=contents_chatbot,  # 输入为聊天记录
-        outputs=gr.File()  # 输出为文件下载链接
-    )
+        # 定义 ChatBot 和生成内容的接口
+        gr.ChatInterface(
+            fn=generate_contents,  # 处理用户输入的函数
+            chatbot=contents_chatbot,  # 绑定的聊天机器人
+            type="messages",
+            multimodal=True  # 支持多模态输入（文本和文件）
+        )
+
+        # 页面关闭时释放该用户的聊天历史
+        demo.unload(end_session)
+
+        image_generate_btn = gr.Button("一键为 PowerPoint 配图")
+
+        image_generate_btn.click(
+            fn=handle_image_generate,
+            inputs=contents_chatbot,
+            outputs=contents_chatbot,
+        )
+
+        # 创建生成 PowerPoint 的按钮
+        generate_btn = gr.Button("一键生成 PowerPoint")
+
+        # 监听生成按钮的点击事件
+        generate_btn.click(
+            fn=handle_generate,  # 点击时执行的函数
+            inputs=contents_chatbot,  # 输入为聊天记录
+            outputs=gr.File()  # 输出为文件下载链接
+        )
+
+    return demo
 
 # 主程序入口
 if __name__ == "__main__":
+    setup()
+    demo = build_demo()
+
+    # 在后台线程中预热语音识别模型，不阻塞服务启动
+    if config.asr_warm_up:
+        whisper_model.warm_up()
+    # 启动图像理解工作进程，模型在工作进程中加载
+    if config.image_warm_up:
+        get_image_worker().start()
+    # 定期在日志中记录会话数、token 总数与淘汰次数
+    if config.history_stats_interval:
+        start_stats_logger(config.history_stats_interval)
+
     # 启动Gradio应用，允许队列功能，并通过 HTTPS 访问
-    demo.queue().launch(
+    # 处理函数均为异步函数，取消每个事件默认只允许 1 个并发的限制
+    demo.queue(default_concurrency_limit=None).launch(
         share=False,
         server_name="0.0.0.0",
         # auth=("django", "qaz!@#$") # ⚠️注意：记住修改密码
@@ -0,0 +1,85 @@
+# history_summarizer.py
+from langchain_openai import ChatOpenAI
+from langchain_core.prompts import ChatPromptTemplate  # 导入提示模板相关类
+from langchain_core.messages import AIMessage, HumanMessage
+
+from logger import LOG  # 导入日志工具
+
+class HistorySummarizer:
+    """
+    用 LLM 把会话历史中被裁剪的早期轮次压缩为摘要，作为 BoundedChatMessageHistory 的 summarizer。
+    """
+    def __init__(self, prompt_file="./prompts/history_summarizer.txt", max_summary_tokens=512):
+        """
+        参数:
+            prompt_file (str): 系统提示词文件
+            max_summary_tokens (int): 摘要的最大输出 token 数
+        """
+        self.prompt_file = prompt_file
+        self.max_summary_tokens = max_summary_tokens
+        self.prompt = self.load_prompt()
+        self.create_summarizer()
+
+    def load_prompt(self):
+        """
+        从文件加载系统提示语。
+        """
+        try:
+            with open(self.prompt_file, "r", encoding="utf-8") as file:
+                return file.read().strip()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"找不到提示文件 {self.prompt_file}!")
+
+    def create_summarizer(self):
+        """
+        初始化摘要模型。
+        """
+        system_prompt = ChatPromptTemplate.from_messages([
+            ("system", self.prompt),  # 系统提示部分
+            ("human", "{input}"),
+        ])
+
+        self.model = ChatOpenAI(
+            model="gpt-4o-mini",
+            temperature=0,
+            max_tokens=self.max_summary_tokens,
+        )
+
+        self.summarizer = system_prompt | self.model
+
+    @staticmethod
+    def _render(previous_summary, dropped_messages):
+        """
+        把已有摘要与被丢弃的消息拼接为摘要模型的输入。
+        """
+        lines = []
+        if previous_summary:
+            lines.append(f"[已有摘要]\n{previous_summary}\n")
+        lines.append("[新增对话]")
+        for message in dropped_messages:
+            if isinstance(message, HumanMessage):
+                role = "用户"
+            elif isinstance(message, AIMessage):
+                role = "助手"
+            else:
+                continue
+            content = message.content if isinstance(message.content, str) else str(message.content)
+            lines.append(f"{role}: {content}")
+        return "\n".join(lines)
+
+    def __call__(self, previous_summary, dropped_messages):
+        """
+        参数:
+            previous_summary (str): 已有摘要，可以为空
+            dropped_messages (List[BaseMessage]): 本次被裁剪的消息
+
+        返回:
+            str: 合并后的摘要；调用失败时返回已有摘要
+        """
+        try:
+            response = self.summarizer.invoke({"input": self._render(previous_summary, dropped_messages)})
+        except Exception as e:
+            LOG.warning(f"[会话摘要] 生成摘要失败，保留已有摘要: {e}")
+            return previous_summary
+        LOG.debug(f"[会话摘要] 已合并 {len(dropped_messages)} 条消息")
+        return response.content.strip()
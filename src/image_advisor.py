@@ -1,25 +1,55 @@
 import re
+import json
+import time
 import requests
 import os
+import asyncio
 
 from abc import ABC
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
-from PIL import Image
+from PIL import Image, ImageFile
 from io import BytesIO
 
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 
 from logger import LOG  # 导入日志工具
+from llm_cache import llm_cache  # 导入共享的 LLM 响应缓存
+from disk_cache import DiskCache
+
+# 图像检索结果与候选图像的磁盘缓存：搜索页按关键词缓存，图像按 URL 缓存，默认保留 7 天
+image_cache = DiskCache("cache/images", max_bytes=500 * 1024 * 1024, ttl=7 * 24 * 3600)
 
 class ImageAdvisor(ABC):
     """
     聊天机器人基类，提供建议配图的功能。
     """
-    def __init__(self, prompt_file="./prompts/image_advisor.txt"):
+    # 图像搜索页面地址，测试时可替换为本地 HTTP 服务
+    search_url = "https://www.bing.com/images/search"
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36"
+    }
+
+    # 探测候选图像尺寸时最多读取的字节数
+    probe_bytes = 64 * 1024
+
+    def __init__(self, prompt_file="./prompts/image_advisor.txt", max_workers=8, deadline=20, cache=None):
+        """
+        参数:
+            prompt_file (str): 提示文件路径
+            max_workers (int): 并发检索幻灯片配图的最大线程数
+            deadline (float): 一次配图请求的全局截止时间（秒），超时未完成的幻灯片不再配图
+            cache (DiskCache, optional): 搜索结果与图像的磁盘缓存，默认使用共享的 image_cache
+        """
         self.prompt_file = prompt_file
+        self.max_workers = max_workers
+        self.deadline = deadline
+        self.cache = cache if cache is not None else image_cache
         self.prompt = self.load_prompt()
         self.create_advisor()
+        self.create_session()
 
     def load_prompt(self):
         """
@@ -48,6 +78,16 @@ class ImageAdvisor(ABC):
         )
         self.advisor = chat_prompt | self.model
 
+    def create_session(self):
+        """
+        创建复用 keep-alive 连接的 HTTP 会话，连接池大小覆盖所有并发请求。
+        """
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers * 4)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
     def generate_images(self, markdown_content, image_directory="tmps", num_images=3):
         """
         生成图片并嵌入到指定的 PowerPoint 内容中。
@@ -61,27 +101,68 @@ class ImageAdvisor(ABC):
             content_with_images (str): 嵌入图片后的内容
             image_pair (dict): 每个幻灯片标题对应的图像路径
         """
-        response = self.advisor.invoke({
+        advice = llm_cache.cached_invoke(self.advisor, self.model, self.prompt, markdown_content, {
+            "input": markdown_content,
+        })
+
+        LOG.debug(f"[Advisor 建议配图]\n{advice}")
+
+        return self.collect_images(markdown_content, advice, image_directory, num_images)
+
+    async def agenerate_images(self, markdown_content, image_directory="tmps", num_images=3):
+        """
+        generate_images 的异步版本：使用 ainvoke 获取配图建议，图像检索与下载在线程池中执行。
+        """
+        advice = await llm_cache.acached_invoke(self.advisor, self.model, self.prompt, markdown_content, {
             "input": markdown_content,
         })
 
-        LOG.debug(f"[Advisor 建议配图]\n{response.content}")
+        LOG.debug(f"[Advisor 建议配图]\n{advice}")
+
+        return await asyncio.to_thread(self.collect_images, markdown_content, advice, image_directory, num_images)
 
-        keywords = self.get_keywords(response.content)
+    def collect_images(self, markdown_content, advice, image_directory="tmps", num_images=3):
+        """
+        根据配图建议检索、保存图像并嵌入到 PowerPoint 内容中。
+
+        参数:
+            markdown_content (str): PowerPoint markdown 原始格式
+            advice (str): 模型给出的配图建议
+            image_directory (str): 本地保存图片的文件夹名称
+            num_images (int): 每个幻灯片搜索的图像数量
+
+        返回:
+            content_with_images (str): 嵌入图片后的内容
+            image_pair (dict): 每个幻灯片标题对应的图像路径
+        """
+        keywords = self.get_keywords(advice)
         image_pair = {}
+        deadline = time.monotonic() + self.deadline
 
-        for slide_title, query in keywords.items():
-            # 检索图像
-            images = self.get_bing_images(slide_title, query, num_images, timeout=1, retries=3)
-            if images:
-                for image in images:
-                    LOG.debug(f"Name: {image['slide_title']}, Query: {image['query']} 分辨率：{image['width']}x{image['height']}")
-            else:
+        # 各幻灯片的图像检索并发执行，超过全局截止时间仍未完成的幻灯片直接跳过
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {
+            executor.submit(self.find_best_image, slide_title, query, num_images, 1, 3, deadline): slide_title
+            for slide_title, query in keywords.items()
+        }
+        done, not_done = wait(futures, timeout=max(deadline - time.monotonic(), 0))
+        executor.shutdown(wait=False, cancel_futures=True)
+        for future in not_done:
+            LOG.warning(f"配图检索超时，跳过幻灯片: {futures[future]}")
+
+        for future in done:
+            slide_title = futures[future]
+            try:
+                img = future.result()
+            except Exception as e:
+                LOG.error(f"配图检索失败 {slide_title}: {e}")
+                continue
+
+            if img is None:
                 LOG.warning(f"No images found for {slide_title}.")
                 continue
 
-            # 仅处理分辨率最高的图像
-            img = images[0]
+            # 仅保存分辨率最高的图像
             save_directory = f"images/{image_directory}"
             os.makedirs(save_directory, exist_ok=True)
             save_path = os.path.join(save_directory, f"{img['slide_title']}_1.jpeg")
@@ -105,9 +186,26 @@ class ImageAdvisor(ABC):
         LOG.debug(f"[检索关键词 正则提取结果]{keywords}")
         return keywords
 
-    def get_bing_images(self, slide_title, query, num_images=5, timeout=1, retries=3):
+    def find_best_image(self, slide_title, query, num_images=5, timeout=1, retries=3, deadline=None):
         """
-        从 Bing 检索图像，最多重试3次。
+        按文件头探测的分辨率排序候选图像，只完整下载分辨率最高的一张；下载失败时依次尝试下一张。
+
+        返回:
+            dict: 图像数据（包含 obj 图像对象），没有可用图像时返回 None
+        """
+        images = self.get_bing_images(slide_title, query, num_images, timeout, retries, deadline)
+        for image in images:
+            LOG.debug(f"Name: {image['slide_title']}, Query: {image['query']} 分辨率：{image['width']}x{image['height']}")
+
+        for image in images:
+            img = self.fetch_image(image["url"], timeout, retries, deadline)
+            if img is not None:
+                return dict(image, obj=img)
+        return None
+
+    def get_bing_images(self, slide_title, query, num_images=5, timeout=1, retries=3, deadline=None):
+        """
+        从 Bing 检索图像，最多重试3次。并发读取各候选图像的文件头以获取尺寸，不下载完整图像。
 
         参数:
             slide_title (str): 幻灯片标题
@@ -115,27 +213,60 @@ class ImageAdvisor(ABC):
             num_images (int): 搜索的图像数量
             timeout (int): 每次请求超时时间（秒），默认1秒
             retries (int): 最大重试次数，默认3次
+            deadline (float, optional): time.monotonic() 表示的截止时间，超过后不再发起请求
 
         返回:
-            sorted_images (list): 符合条件的图像数据列表
+            sorted_images (list): 符合条件的图像数据列表（按分辨率从高到低，包含图像 url，不含图像对象）
         """
-        url = f"https://www.bing.com/images/search?q={query}"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36"
-        }
+        image_links = self.search_image_links(query, num_images, timeout, retries, deadline)
+        if not image_links:
+            return []
+
+        with ThreadPoolExecutor(max_workers=len(image_links)) as executor:
+            results = executor.map(
+                lambda link: self.probe_image(slide_title, query, link, timeout, retries, deadline),
+                image_links,
+            )
+            image_data = [image_info for image_info in results if image_info]
+
+        sorted_images = sorted(image_data, key=lambda x: x["resolution"], reverse=True)
+        return sorted_images
 
-        # 尝试请求并设置重试逻辑
+    def _request(self, url, timeout, retries, deadline, description, **kwargs):
+        """
+        通过共享会话发起 GET 请求，带重试；请求超时不超过剩余的截止时间。失败时返回 None。
+        """
         for attempt in range(retries):
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    LOG.warning(f"已超过截止时间，放弃请求 {description}。")
+                    return None
+                request_timeout = min(timeout, remaining)
+            else:
+                request_timeout = timeout
             try:
-                response = requests.get(url, headers=headers, timeout=timeout)
+                response = self.session.get(url, timeout=request_timeout, **kwargs)
                 response.raise_for_status()
-                break  # 请求成功，跳出重试循环
+                return response  # 请求成功，跳出重试循环
             except requests.RequestException as e:
-                LOG.warning(f"Attempt {attempt + 1}/{retries} failed for query '{query}': {e}")
-                if attempt == retries - 1:
-                    LOG.error(f"Max retries reached for query '{query}'.")
-                    return []
-        
+                LOG.warning(f"Attempt {attempt + 1}/{retries} failed for {description}: {e}")
+        LOG.error(f"Max retries reached for {description}.")
+        return None
+
+    def search_image_links(self, query, num_images=5, timeout=1, retries=3, deadline=None):
+        """
+        请求搜索结果页面，解析出候选图像的原始链接。页面中的全部链接按关键词缓存。
+        """
+        cache_key = f"search:{self.search_url}:{query}"
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return json.loads(cached)[:num_images]
+
+        response = self._request(self.search_url, timeout, retries, deadline, f"query '{query}'", params={"q": query})
+        if response is None:
+            return []
+
         soup = BeautifulSoup(response.text, "html.parser")
         image_elements = soup.select("a.iusc")
 
@@ -143,35 +274,91 @@ class ImageAdvisor(ABC):
         for img in image_elements:
             m_data = img.get("m")
             if m_data:
-                m_json = eval(m_data)
+                try:
+                    m_json = json.loads(m_data)
+                except ValueError:
+                    continue
                 if "murl" in m_json:
                     image_links.append(m_json["murl"])
-            if len(image_links) >= num_images:
-                break
 
-        image_data = []
-        for link in image_links:
-            for attempt in range(retries):
-                try:
-                    img_data = requests.get(link, headers=headers, timeout=timeout)
-                    img = Image.open(BytesIO(img_data.content))
-                    image_info = {
-                        "slide_title": slide_title,
-                        "query": query,
-                        "width": img.width,
-                        "height": img.height,
-                        "resolution": img.width * img.height,
-                        "obj": img,
-                    }
-                    image_data.append(image_info)
-                    break  # 成功下载图像，跳出重试循环
-                except Exception as e:
-                    LOG.warning(f"Attempt {attempt + 1}/{retries} failed for image '{link}': {e}")
-                    if attempt == retries - 1:
-                        LOG.error(f"Max retries reached for image '{link}'. Skipping.")
-        
-        sorted_images = sorted(image_data, key=lambda x: x["resolution"], reverse=True)
-        return sorted_images
+        if image_links:
+            self.cache.set(cache_key, json.dumps(image_links).encode("utf-8"))
+        return image_links[:num_images]
+
+    def probe_image(self, slide_title, query, link, timeout=1, retries=3, deadline=None):
+        """
+        只读取候选图像开头的少量字节，解析文件头得到尺寸，失败时返回 None。尺寸按 URL 缓存。
+        """
+        data, meta = self.cache.get_with_meta(f"image:{link}")
+        if data is None:
+            data, meta = self.cache.get_with_meta(f"probe:{link}")
+
+        if meta is not None:
+            width, height = meta["width"], meta["height"]  # 命中缓存，完全跳过网络请求
+        else:
+            size = self._probe_size(link, timeout, retries, deadline)
+            if size is None:
+                return None
+            width, height = size
+            self.cache.set(f"probe:{link}", b"", width=width, height=height)
+
+        return {
+            "slide_title": slide_title,
+            "query": query,
+            "url": link,
+            "width": width,
+            "height": height,
+            "resolution": width * height,
+        }
+
+    def _probe_size(self, link, timeout, retries, deadline):
+        """
+        以 Range 请求流式读取图像开头，PIL 增量解析出文件头后立即关闭连接。
+        """
+        response = self._request(link, timeout, retries, deadline, f"image '{link}'",
+                                 stream=True, headers={"Range": f"bytes=0-{self.probe_bytes - 1}"})
+        if response is None:
+            return None
+
+        parser = ImageFile.Parser()
+        received = 0
+        try:
+            for chunk in response.iter_content(chunk_size=4096):
+                parser.feed(chunk)
+                if parser.image is not None:
+                    return parser.image.size
+                received += len(chunk)
+                if received >= self.probe_bytes:
+                    break
+        except Exception as e:
+            LOG.warning(f"无法解析图像文件头 '{link}': {e}")
+            return None
+        finally:
+            response.close()
+
+        LOG.warning(f"在前 {self.probe_bytes} 字节内未能解析图像文件头 '{link}'。")
+        return None
+
+    def fetch_image(self, link, timeout=1, retries=3, deadline=None):
+        """
+        完整下载图像并返回 PIL 图像对象，失败时返回 None。原始字节与尺寸按 URL 缓存。
+        """
+        cache_key = f"image:{link}"
+        data = self.cache.get(cache_key)
+        if data is not None:
+            return Image.open(BytesIO(data))  # 命中缓存，完全跳过网络请求
+
+        response = self._request(link, timeout, retries, deadline, f"image '{link}'")
+        if response is None:
+            return None
+        try:
+            img = Image.open(BytesIO(response.content))
+        except Exception as e:
+            LOG.warning(f"无法解析图像 '{link}': {e}")
+            return None
+
+        self.cache.set(cache_key, response.content, width=img.width, height=img.height)
+        return img
 
     def save_image(self, img, save_path, format="JPEG", quality=85, max_size=1080):
         """
@@ -0,0 +1,152 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from logger import LOG  # 导入日志工具
+
+# 差异哈希的边长：图像缩放为 (HASH_SIZE + 1) x HASH_SIZE 的灰度图，得到 HASH_SIZE * HASH_SIZE 位哈希
+HASH_SIZE = 16
+
+def content_hash(image_file):
+    """
+    计算图像文件内容的 sha256，用于精确匹配同一个文件。
+
+    参数:
+        image_file: 图像文件路径或文件对象（读取后恢复原来的位置）
+
+    返回:
+        十六进制摘要字符串
+    """
+    digest = hashlib.sha256()
+    if hasattr(image_file, "read"):
+        position = image_file.tell()
+        for block in iter(lambda: image_file.read(1 << 20), b""):
+            digest.update(block)
+        image_file.seek(position)
+    else:
+        with open(image_file, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+def perceptual_hash(image_file, hash_size=HASH_SIZE):
+    """
+    计算图像的差异哈希（dHash）。
+
+    图像转为灰度并缩放到 (hash_size + 1) x hash_size，比较每行相邻像素的亮度得到各个比特。
+    重新编码、缩放或轻微压缩后的同一张图像哈希相同或只有少数比特不同。
+
+    参数:
+        image_file: 图像文件路径或文件对象
+        hash_size: 哈希边长，默认 16（256 位）
+
+    返回:
+        int 类型的哈希值
+    """
+    with Image.open(image_file) as image:
+        image.draft("L", (hash_size * 4, hash_size * 4))  # JPEG 在解码时直接缩小，避免解码全尺寸图像
+        pixels = np.asarray(image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+def image_fingerprint(image_file):
+    """
+    返回图像的 (内容哈希, 感知哈希)，作为图像描述缓存的键。
+    """
+    image_hash = perceptual_hash(image_file)
+    return content_hash(image_file), image_hash
+
+def hamming_distance(a, b):
+    """
+    两个哈希值不同的比特数。
+    """
+    return bin(a ^ b).count("1")
+
+# 图像描述的内存缓存：键为 图像指纹 + 问题 + 采样参数，按最近使用顺序做 LRU 淘汰
+class ImageDescriptionCache:
+    """
+    缓存视觉模型对图像的回答，图像以 image_fingerprint 返回的 (内容哈希, 感知哈希) 标识。
+
+    先按内容哈希精确匹配；未命中时在问题与采样参数相同的条目中查找感知哈希汉明距离不超过 max_distance 的条目，
+    因此重新编码或缩放后再次上传的图像也能命中。置位比特数少于 min_bits（或多于 位数 - min_bits）的
+    感知哈希信息量太低（例如大片空白、只有几行文字的截图），不同图像也会得到相近的哈希，只做精确匹配。
+    条目数超过 max_entries 时淘汰最久未使用的条目。
+    """
+    def __init__(self, max_entries=1024, max_distance=6, hash_bits=HASH_SIZE * HASH_SIZE, min_bits=None):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.hash_bits = hash_bits
+        self.min_bits = hash_bits // 8 if min_bits is None else min_bits
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (内容哈希, 问题, sampling, temperature) -> (感知哈希, 回答)
+        self._lock = threading.Lock()
+
+    def _is_distinctive(self, image_hash):
+        """
+        感知哈希是否有足够的信息量参与近似匹配。
+        """
+        ones = bin(image_hash).count("1")
+        return self.min_bits <= ones <= self.hash_bits - self.min_bits
+
+    def get(self, fingerprint, question, sampling, temperature):
+        """
+        查找缓存的回答，未命中时返回 None。
+        """
+        digest, image_hash = fingerprint
+        params = (question, sampling, temperature)
+        with self._lock:
+            key = (digest,) + params
+            near = False
+            if key not in self._entries and self.max_distance > 0 and self._is_distinctive(image_hash):
+                key = next((candidate for candidate, (candidate_hash, _) in reversed(self._entries.items())
+                            if candidate[1:] == params
+                            and hamming_distance(candidate_hash, image_hash) <= self.max_distance), None)
+                near = key is not None
+            if key is None or key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.near_hits += near
+            return self._entries[key][1]
+
+    def set(self, fingerprint, question, sampling, temperature, answer):
+        """
+        写入回答，并在超出容量时淘汰最久未使用的条目。
+        """
+        digest, image_hash = fingerprint
+        key = (digest, question, sampling, temperature)
+        with self._lock:
+            self._entries[key] = (image_hash, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def cached_describe(self, describe, image_file, question, sampling, temperature):
+        """
+        先查缓存，未命中时调用 describe(image_file, question, sampling, temperature) 并缓存回答。
+        """
+        fingerprint = image_fingerprint(image_file)
+        answer = self.get(fingerprint, question, sampling, temperature)
+        if answer is not None:
+            LOG.debug(f"[图像描述缓存] 命中: {image_file}")
+            return answer
+        answer = describe(image_file, question, sampling, temperature)
+        self.set(fingerprint, question, sampling, temperature, answer)
+        return answer
+
+    def stats(self):
+        """
+        返回缓存统计信息。
+        """
+        with self._lock:
+            return {"hits": self.hits, "near_hits": self.near_hits, "misses": self.misses,
+                    "entries": len(self._entries)}
+
+# 进程内共享的图像描述缓存
+image_description_cache = ImageDescriptionCache()
@@ -0,0 +1,287 @@
+import time
+import queue
+import asyncio
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import Future
+
+from logger import LOG
+from model_loader import LazyModel
+from image_description_cache import image_description_cache, image_fingerprint
+
+def _default_batch_fn(requests):
+    """
+    默认的批量推理函数：在工作进程中调用 MiniCPM-V 模型。
+    """
+    from minicpm_v_model import chat_with_images
+    return chat_with_images(requests)
+
+def _default_load_fn():
+    """
+    默认的模型加载函数：在工作进程中加载 MiniCPM-V 模型。
+    """
+    from minicpm_v_model import minicpm_model
+    minicpm_model.get()
+
+def _collect_batch(request_queue, max_batch_size, max_wait):
+    """
+    阻塞等待第一个请求，然后在 max_wait 时间窗口内尽量凑满一批。收到停止信号（None）时返回 None。
+    """
+    first = request_queue.get()
+    if first is None:
+        return None
+    batch = [first]
+    deadline = time.monotonic() + max_wait
+    while len(batch) < max_batch_size:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            item = request_queue.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if item is None:
+            request_queue.put(None)  # 先处理完当前批次，下一轮再退出
+            break
+        batch.append(item)
+    return batch
+
+def _worker_main(request_queue, response_queue, batch_fn, load_fn, max_batch_size, max_wait):
+    """
+    工作进程主循环：先调用 load_fn 加载模型并报告加载结果，然后按批取出请求，调用 batch_fn，
+    并把结果或错误写回响应队列。加载结果以请求编号为 None 的响应发送。
+
+    同一批次内 sampling 与 temperature 不同的请求分组推理，保证生成参数一致。
+    """
+    batch_fn = batch_fn or _default_batch_fn
+    error = None
+    if load_fn is not None:
+        try:
+            load_fn()
+        except Exception as e:
+            # 加载失败时仍然处理请求，由 batch_fn 在下次调用时重试加载
+            error = f"{type(e).__name__}: {e}"
+    response_queue.put((None, None, error))
+
+    while True:
+        batch = _collect_batch(request_queue, max_batch_size, max_wait)
+        if batch is None:
+            break
+
+        groups = {}
+        for request_id, request in batch:
+            key = (request.get("sampling"), request.get("temperature", 0.7))
+            groups.setdefault(key, []).append((request_id, request))
+
+        for items in groups.values():
+            request_ids = [request_id for request_id, _ in items]
+            try:
+                answers = batch_fn([request for _, request in items])
+                response_queue.put((request_ids, list(answers), None))
+            except Exception as e:
+                response_queue.put((request_ids, None, f"{type(e).__name__}: {e}"))
+
+# describe() 等待结果的默认超时时间（秒），包括首次请求时在工作进程中加载模型的时间
+DESCRIBE_TIMEOUT = 600
+
+# 独立进程中的图像理解服务：模型加载与推理不占用 Web 进程的 GIL 和内存
+class ImageDescriptionWorker:
+    """
+    图像描述工作进程的客户端。
+
+    首次提交请求时启动工作进程（默认使用 spawn，子进程中才导入 torch 与模型）。spawn 子进程会把启动脚本
+    作为 __mp_main__ 重新导入，启动脚本的配置加载、客户端创建等初始化代码应放在 __main__ 保护之后。
+    请求通过队列发送给工作进程，工作进程最多等待 max_wait 秒把至多 max_batch_size 张图像合并为一次前向计算。
+    每个工作进程有自己的监听线程，读取响应并设置对应的 Future；工作进程意外退出时，发给该进程的未完成请求
+    以 RuntimeError 结束（即使此时已有新提交重新启动了进程），describe() 超过 timeout 秒未完成时抛出 TimeoutError。
+
+    batch_fn(requests) 接收请求字典列表（image_file、question、sampling、temperature），
+    返回同样顺序的回答列表，必须可被 pickle（模块级函数）。工作进程启动后先调用 load_fn() 加载模型
+    （未指定 batch_fn 时默认加载 MiniCPM-V），status 报告工作进程中模型的加载状态，取值与 LazyModel 相同。
+    提交前先按图像指纹查询 cache（默认使用共享的 image_description_cache），命中时不再发送给工作进程。
+    """
+    def __init__(self, batch_fn=None, load_fn=None, max_batch_size=4, max_wait=0.1, mp_context="spawn", cache=None):
+        self.batch_fn = batch_fn
+        self.load_fn = load_fn if load_fn is not None or batch_fn is not None else _default_load_fn
+        self.cache = cache if cache is not None else image_description_cache
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._context = multiprocessing.get_context(mp_context)
+        self._process = None
+        self._request_queue = None
+        self._response_queue = None
+        self._listener = None
+        self._pending = {}  # 请求编号 -> (Future, 图像指纹, 请求, 处理该请求的工作进程)
+        self._status = LazyModel.NOT_LOADED
+        self._error = None
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def is_alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    @property
+    def status(self):
+        """
+        工作进程中模型的加载状态，加载失败时附带错误信息。
+        """
+        if self._status == LazyModel.FAILED:
+            return f"{LazyModel.FAILED}: {self._error}"
+        return self._status
+
+    @property
+    def is_ready(self):
+        return self._status == LazyModel.READY
+
+    def start(self):
+        """
+        启动工作进程与响应监听线程，已在运行时直接返回。
+        """
+        with self._lock:
+            self._start_locked()
+
+    def _start_locked(self):
+        if self.is_alive:
+            return
+        self._request_queue = self._context.Queue()
+        self._response_queue = self._context.Queue()
+        self._process = self._context.Process(
+            target=_worker_main,
+            args=(self._request_queue, self._response_queue, self.batch_fn, self.load_fn,
+                  self.max_batch_size, self.max_wait),
+            name="image-description-worker",
+            daemon=True,
+        )
+        self._process.start()
+        self._status = LazyModel.LOADING
+        LOG.info(f"[图像理解] 工作进程已启动，pid={self._process.pid}")
+
+        self._listener = threading.Thread(
+            target=self._listen, args=(self._process, self._response_queue),
+            name="image-description-listener", daemon=True
+        )
+        self._listener.start()
+
+    def submit(self, image_file, question="描述下这幅图", sampling=None, temperature=0.7):
+        """
+        提交一张图像及问题，返回最终结果为回答文本的 Future。sampling 为 None 时使用模型的默认生成方式。
+        """
+        try:
+            fingerprint = image_fingerprint(image_file)
+        except OSError as e:
+            # 无法解码的图像不参与缓存，由工作进程报告具体错误
+            LOG.debug(f"[图像理解] 计算图像指纹失败 {image_file}: {e}")
+            fingerprint = None
+
+        if fingerprint is not None:
+            answer = self.cache.get(fingerprint, question, sampling, temperature)
+            if answer is not None:
+                LOG.debug(f"[图像理解] 缓存命中: {image_file}")
+                future = Future()
+                future.set_result(answer)
+                return future
+
+        return self._send(image_file, question, sampling, temperature, fingerprint)
+
+    def _send(self, image_file, question, sampling, temperature, fingerprint=None):
+        """
+        把请求发送给工作进程（必要时先启动进程），返回对应的 Future。
+        """
+        future = Future()
+        # 请求一经发送就不能取消：describe() 超时放弃等待时，结果仍会写入缓存
+        future.set_running_or_notify_cancel()
+        request = {
+            "image_file": image_file,
+            "question": question,
+            "sampling": sampling,
+            "temperature": temperature,
+        }
+        with self._lock:
+            self._start_locked()
+            request_id = next(self._ids)
+            self._pending[request_id] = (future, fingerprint, request, self._process)
+            self._request_queue.put((request_id, request))
+        return future
+
+    async def describe(self, image_file, question="描述下这幅图", sampling=None, temperature=0.7,
+                       timeout=DESCRIBE_TIMEOUT):
+        """
+        异步获取图像描述，等待期间不阻塞事件循环。超过 timeout 秒（包括首次请求时加载模型的时间）
+        未完成时抛出 TimeoutError，timeout 为 None 时一直等待。
+        """
+        # 图像指纹需要读取并解码图像，放到线程池中计算
+        future = await asyncio.to_thread(self.submit, image_file, question, sampling, temperature)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"图像理解超时（{timeout} 秒）: {image_file}") from None
+
+    def _listen(self, process, response_queue):
+        """
+        读取工作进程的响应并设置对应的 Future，进程退出后让剩余请求失败。
+        """
+        while True:
+            try:
+                request_ids, answers, error = response_queue.get(timeout=0.5)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                break
+
+            if request_ids is None:
+                # 工作进程报告模型加载结果
+                if self._process is process:
+                    self._error = error
+                    self._status = LazyModel.READY if error is None else LazyModel.FAILED
+                if error is None:
+                    LOG.info("[图像理解] 工作进程模型加载完成")
+                else:
+                    LOG.error(f"[图像理解] 工作进程模型加载失败: {error}")
+                continue
+            if error is None and self._process is process:
+                self._status = LazyModel.READY  # 加载失败后由 batch_fn 重试成功
+
+            with self._lock:
+                entries = [self._pending.pop(request_id, None) for request_id in request_ids]
+            for index, entry in enumerate(entries):
+                if entry is None:
+                    continue
+                future, fingerprint, request, _ = entry
+                if error is not None:
+                    future.set_exception(RuntimeError(f"图像理解失败: {error}"))
+                    continue
+                # 先写缓存再设置结果，调用方拿到结果时缓存已可用
+                if fingerprint is not None:
+                    self.cache.set(fingerprint, request["question"], request["sampling"],
+                                   request["temperature"], answers[index])
+                future.set_result(answers[index])
+
+        # 发给该进程的请求都不会再有响应；新进程的请求由新的监听线程处理
+        with self._lock:
+            orphaned = [request_id for request_id, entry in self._pending.items() if entry[3] is process]
+            failed = [self._pending.pop(request_id)[0] for request_id in orphaned]
+            if self._process is process:
+                self._process = None
+                self._status = LazyModel.NOT_LOADED
+        if failed:
+            LOG.error(f"[图像理解] 工作进程已退出（exitcode={process.exitcode}），{len(failed)} 个请求失败")
+        for future in failed:
+            future.set_exception(RuntimeError("图像理解工作进程已退出"))
+
+    def shutdown(self, timeout=5):
+        """
+        通知工作进程处理完已提交的请求后退出，并等待其结束。
+        """
+        with self._lock:
+            process, request_queue = self._process, self._request_queue
+        if process is None:
+            return
+        request_queue.put(None)
+        process.join(timeout)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+        if self._listener is not None:
+            self._listener.join(timeout)
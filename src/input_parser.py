@@ -1,7 +1,7 @@
 import re
-from typing import Optional
+from typing import List, Optional
 
-from data_structures import PowerPoint
+from data_structures import PowerPoint, Slide
 from slide_builder import SlideBuilder
 from layout_manager import LayoutManager
 from logger import LOG  # 引入日志模块
@@ -23,32 +23,79 @@ def parse_bullet_point_level(line: str) -> (int, str):
     return indent_level, bullet_text
 
 
-# 解析输入文本，生成 PowerPoint 数据结构
-def parse_input_text(input_text: str, layout_manager: LayoutManager) -> PowerPoint:
-    """
-    解析输入的文本并转换为 PowerPoint 数据结构。自动为每张幻灯片分配适当的布局。
-    """
-    lines = input_text.split('\n')  # 按行拆分文本
-    presentation_title = ""  # PowerPoint 的主标题
-    slides = []  # 存储所有幻灯片
-    slide_builder: Optional[SlideBuilder] = None  # 当前幻灯片的构建器
+# 正则表达式，用于匹配幻灯片标题、要点和图片
+slide_title_pattern = re.compile(r'^##\s+(.*)')
+bullet_pattern = re.compile(r'^(\s*)-\s+(.*)')
+image_pattern = re.compile(r'!\[.*?\]\((.*?)\)')
+
 
-    # 正则表达式，用于匹配幻灯片标题、要点和图片
-    slide_title_pattern = re.compile(r'^##\s+(.*)')
-    bullet_pattern = re.compile(r'^(\s*)-\s+(.*)')
-    image_pattern = re.compile(r'!\[.*?\]\((.*?)\)')
+# 增量解析器：逐块接收文本（例如 LLM 流式输出的 token），每当一个 "## " 章节结束就产出对应的 Slide
+class StreamingInputParser:
+    """
+    流式 markdown 解析器。
 
-    for line in lines:
+    feed() 接收任意切分的文本片段，只处理已经完整的行，返回本次新完成的幻灯片列表；
+    close() 处理剩余的不完整行并产出最后一张幻灯片。解析规则与 parse_input_text 完全一致。
+    """
+    def __init__(self, layout_manager: LayoutManager):
+        self.layout_manager = layout_manager
+        self.presentation_title = ""  # PowerPoint 的主标题
+        self.slides: List[Slide] = []  # 已产出的所有幻灯片
+        self._buffer = ""  # 尚未收到换行符的半行文本
+        self._slide_builder: Optional[SlideBuilder] = None  # 当前幻灯片的构建器
+        self._closed = False
+
+    def feed(self, chunk: str) -> List[Slide]:
+        """
+        输入一段文本，返回因此而完成的幻灯片（可能为空列表）。
+        """
+        if self._closed:
+            raise ValueError("解析器已关闭，不能继续输入文本。")
+
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split('\n')  # 最后一段可能是不完整的行，留待下次处理
+
+        ready = []
+        for line in lines:
+            ready.extend(self._parse_line(line))
+        return ready
+
+    def close(self) -> List[Slide]:
+        """
+        结束输入，处理缓冲区中的最后一行并产出最后一张幻灯片。
+        """
+        if self._closed:
+            return []
+        self._closed = True
+
+        ready = self._parse_line(self._buffer)
+        self._buffer = ""
+
+        # 为最后一张幻灯片分配布局并添加到列表中
+        if self._slide_builder:
+            ready.append(self._emit(self._slide_builder.finalize()))
+            self._slide_builder = None
+        return ready
+
+    def _emit(self, slide: Slide) -> Slide:
+        self.slides.append(slide)
+        return slide
+
+    def _parse_line(self, line: str) -> List[Slide]:
+        """
+        解析单行文本，返回该行导致完成的幻灯片。
+        """
+        ready = []
         if line.strip() == "":
-            continue  # 跳过空行
+            return ready  # 跳过空行
 
         # 主标题 (用作 PowerPoint 的标题和文件名)
         if line.startswith('# ') and not line.startswith('##'):
-            presentation_title = line[2:].strip()
+            self.presentation_title = line[2:].strip()
 
-            first_slide_builder = SlideBuilder(layout_manager)
-            first_slide_builder.set_title(presentation_title)
-            slides.append(first_slide_builder.finalize())
+            first_slide_builder = SlideBuilder(self.layout_manager)
+            first_slide_builder.set_title(self.presentation_title)
+            ready.append(self._emit(first_slide_builder.finalize()))
 
         # 幻灯片标题
         elif line.startswith('## '):
@@ -57,15 +104,15 @@ def parse_input_text(input_text: str, layout_manager: LayoutManager) -> PowerPoi
                 title = match.group(1).strip()
 
                 # 如果有当前幻灯片，生成并添加到幻灯片列表中
-                if slide_builder:
-                    slides.append(slide_builder.finalize())
+                if self._slide_builder:
+                    ready.append(self._emit(self._slide_builder.finalize()))
 
                 # 创建新的 SlideBuilder
-                slide_builder = SlideBuilder(layout_manager)
-                slide_builder.set_title(title)
+                self._slide_builder = SlideBuilder(self.layout_manager)
+                self._slide_builder.set_title(title)
 
         # 项目符号（要点）
-        elif bullet_pattern.match(line) and slide_builder:
+        elif bullet_pattern.match(line) and self._slide_builder:
             match = bullet_pattern.match(line)
             if match:
                 indent_spaces, bullet = match.groups()  # 获取缩进空格和项目符号内容
@@ -73,18 +120,91 @@ def parse_input_text(input_text: str, layout_manager: LayoutManager) -> PowerPoi
                 bullet_text = bullet.strip()  # 获取项目符号的文本内容
 
                 # 根据层级添加要点
-                slide_builder.add_bullet_point(bullet_text, level=indent_level)
+                self._slide_builder.add_bullet_point(bullet_text, level=indent_level)
 
         # 图片插入
-        elif line.startswith('![') and slide_builder:
+        elif line.startswith('![') and self._slide_builder:
             match = image_pattern.match(line)
             if match:
                 image_path = match.group(1).strip()
-                slide_builder.set_image(image_path)
+                self._slide_builder.set_image(image_path)
+
+        return ready
+
+    def to_powerpoint(self) -> PowerPoint:
+        """
+        以已产出的幻灯片构建 PowerPoint 数据结构。
+        """
+        return PowerPoint(title=self.presentation_title, slides=list(self.slides))
+
 
-    # 为最后一张幻灯片分配布局并添加到列表中
-    if slide_builder:
-        slides.append(slide_builder.finalize())
+# 解析输入文本，生成 PowerPoint 数据结构
+def parse_input_text(input_text: str, layout_manager: LayoutManager) -> PowerPoint:
+    """
+    解析输入的文本并转换为 PowerPoint 数据结构。自动为每张幻灯片分配适当的布局。
+    """
+    parser = StreamingInputParser(layout_manager)
+    parser.feed(input_text)
+    parser.close()
 
     # 返回 PowerPoint 数据结构以及演示文稿标题
-    return PowerPoint(title=presentation_title, slides=slides), presentation_title
+    return parser.to_powerpoint(), parser.presentation_title
+
+# 代码块围栏，LLM 有时会把整份输出包在 ``` 中
+code_fence_pattern = re.compile(r'^\s*```[\w-]*\s*$')
+
+def strip_code_fence(text: str) -> str:
+    """
+    去掉包裹整份内容的 ``` 代码块围栏，没有围栏时原样返回。
+    """
+    lines = text.strip().split('\n')
+    if len(lines) >= 2 and code_fence_pattern.match(lines[0]) and code_fence_pattern.match(lines[-1]):
+        return '\n'.join(lines[1:-1])
+    return text
+
+def validate_slides_markdown(text: str, image_paths: Optional[List[str]] = None) -> List[str]:
+    """
+    按 StreamingInputParser 的语法检查幻灯片 markdown，返回发现的问题列表（为空表示通过）。
+
+    检查项：第一行非空内容是唯一的 "# " 主标题；至少有一张 "## " 幻灯片；每一行都是标题、要点或图片；
+    要点与图片位于某张幻灯片之内；要点缩进为 2 个空格的整数倍；每张幻灯片最多一张图片；
+    给定 image_paths 时，图片路径必须来自原始文档。
+    """
+    problems = []
+    title_count = 0
+    slide_title = None
+    slide_images = 0
+    allowed_images = set(image_paths) if image_paths is not None else None
+
+    lines = [(number, line) for number, line in enumerate(text.split('\n'), 1) if line.strip()]
+    if not lines or not (lines[0][1].startswith('# ') and not lines[0][1].startswith('##')):
+        problems.append("第一行不是 '# ' 主标题")
+
+    for number, line in lines:
+        if line.startswith('# ') and not line.startswith('##'):
+            title_count += 1
+            if title_count > 1:
+                problems.append(f"第 {number} 行: 出现多个主标题")
+        elif line.startswith('## '):
+            slide_title = slide_title_pattern.match(line).group(1).strip()
+            slide_images = 0
+        elif bullet_pattern.match(line):
+            if slide_title is None:
+                problems.append(f"第 {number} 行: 要点不属于任何幻灯片")
+            if len(bullet_pattern.match(line).group(1)) % 2:
+                problems.append(f"第 {number} 行: 要点缩进不是 2 个空格的整数倍")
+        elif line.startswith('![') and image_pattern.match(line):
+            image_path = image_pattern.match(line).group(1).strip()
+            if slide_title is None:
+                problems.append(f"第 {number} 行: 图片不属于任何幻灯片")
+            slide_images += 1
+            if slide_images > 1:
+                problems.append(f"第 {number} 行: 幻灯片 '{slide_title}' 包含多张图片")
+            if allowed_images is not None and image_path not in allowed_images:
+                problems.append(f"第 {number} 行: 图片 {image_path} 不在原始文档中")
+        else:
+            problems.append(f"第 {number} 行: 无法解析 '{line.strip()[:30]}'")
+
+    if not any(line.startswith('## ') for _, line in lines):
+        problems.append("没有任何 '## ' 幻灯片")
+    return problems
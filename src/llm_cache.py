@@ -0,0 +1,136 @@
+import json
+import hashlib
+
+from logger import LOG  # 导入日志工具
+from disk_cache import DiskCache
+
+# LLM 响应的内容寻址磁盘缓存：键为 提示词内容 + 模型参数 + 输入 的哈希值
+class LLMResponseCache(DiskCache):
+    """
+    基于磁盘的 LLM 响应缓存，按总字节数做 LRU 淘汰，并统计命中与未命中次数。
+
+    存储、淘汰与统计由 DiskCache 实现，重启后仍能恢复 LRU 顺序。多个 LangChain 类共享同一个实例。
+    """
+    def __init__(self, cache_dir="cache/llm", max_bytes=100 * 1024 * 1024):
+        super().__init__(cache_dir, max_bytes)
+
+    @staticmethod
+    def make_key(prompt, model, input_text):
+        """
+        根据提示词内容、模型参数与输入文本计算缓存键。
+
+        参数:
+            prompt (str): 系统提示词内容
+            model (ChatOpenAI): 模型实例，读取其模型名、温度与最大 token 数
+            input_text (str): 输入文本
+        """
+        payload = json.dumps({
+            "prompt": prompt,
+            "model": model.model_name,
+            "temperature": model.temperature,
+            "max_tokens": model.max_tokens,
+            "input": input_text,
+        }, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _name(key):
+        # make_key 返回的已是 sha256 摘要，直接用作文件名
+        return key
+
+    def get(self, key):
+        """
+        读取缓存的回复内容，未命中时返回 None。
+        """
+        data = super().get(key)
+        return data.decode("utf-8") if data is not None else None
+
+    def set(self, key, content):
+        """
+        写入回复内容。
+        """
+        super().set(key, content.encode("utf-8"))
+
+    def cached_invoke(self, chain, model, prompt, input_text, inputs):
+        """
+        先查缓存，未命中时调用 chain.invoke(inputs) 并缓存回复内容。
+
+        参数:
+            chain (Runnable): 提示模板与模型组成的链
+            model (ChatOpenAI): 链中使用的模型实例
+            prompt (str): 系统提示词内容
+            input_text (str): 参与缓存键计算的输入文本
+            inputs (dict): 传给 chain.invoke 的参数
+
+        返回:
+            str: 模型回复内容
+        """
+        key = self.make_key(prompt, model, input_text)
+        content = self.get(key)
+        if content is not None:
+            LOG.debug(f"[LLM 缓存] 命中 {key[:12]}，{self.stats()}")
+            return content
+
+        response = chain.invoke(inputs)
+        self.set(key, response.content)
+        return response.content
+
+    async def acached_invoke(self, chain, model, prompt, input_text, inputs):
+        """
+        cached_invoke 的异步版本，未命中时调用 chain.ainvoke(inputs)。
+        """
+        key = self.make_key(prompt, model, input_text)
+        content = self.get(key)
+        if content is not None:
+            LOG.debug(f"[LLM 缓存] 命中 {key[:12]}，{self.stats()}")
+            return content
+
+        response = await chain.ainvoke(inputs)
+        self.set(key, response.content)
+        return response.content
+
+    def cached_batch(self, chain, model, prompt, input_texts, inputs_list, max_concurrency=None):
+        """
+        批量版本：先逐个查缓存，未命中的输入通过一次 chain.batch 并发调用，并缓存各自的回复内容。
+
+        参数:
+            input_texts (List[str]): 参与缓存键计算的输入文本，与 inputs_list 一一对应
+            inputs_list (List[dict]): 传给 chain.batch 的参数列表
+            max_concurrency (int, optional): 最大并发请求数
+
+        返回:
+            List[str]: 与输入顺序一致的回复内容
+        """
+        keys, contents, missing = self._lookup_batch(model, prompt, input_texts)
+        if missing:
+            responses = chain.batch([inputs_list[i] for i in missing], config={"max_concurrency": max_concurrency})
+            self._store_batch(keys, contents, missing, responses)
+        return contents
+
+    async def acached_batch(self, chain, model, prompt, input_texts, inputs_list, max_concurrency=None):
+        """
+        cached_batch 的异步版本，未命中的输入通过 chain.abatch 并发调用。
+        """
+        keys, contents, missing = self._lookup_batch(model, prompt, input_texts)
+        if missing:
+            responses = await chain.abatch([inputs_list[i] for i in missing], config={"max_concurrency": max_concurrency})
+            self._store_batch(keys, contents, missing, responses)
+        return contents
+
+    def _lookup_batch(self, model, prompt, input_texts):
+        """
+        返回 (缓存键列表, 已命中的回复内容列表, 未命中的下标列表)。
+        """
+        keys = [self.make_key(prompt, model, input_text) for input_text in input_texts]
+        contents = [self.get(key) for key in keys]
+        missing = [i for i, content in enumerate(contents) if content is None]
+        LOG.debug(f"[LLM 缓存] 批量请求 {len(keys)} 个，命中 {len(keys) - len(missing)} 个")
+        return keys, contents, missing
+
+    def _store_batch(self, keys, contents, missing, responses):
+        for i, response in zip(missing, responses):
+            self.set(keys[i], response.content)
+            contents[i] = response.content
+
+# 所有基于 LangChain 的类共享的缓存实例
+llm_cache = LLMResponseCache()
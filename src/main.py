@@ -1,5 +1,7 @@
 import os
+import time
 import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from input_parser import parse_input_text
 from ppt_generator import generate_presentation
 from template_manager import load_template, print_layouts, get_layout_mapping
@@ -8,38 +10,86 @@ from config import Config
 from logger import LOG  # 引入 LOG 模块
 from content_formatter import ContentFormatter
 from content_assistant import ContentAssistant
+from deck_builder import DeckBuilder
 
 # 新增导入 docx_parser 模块中的函数
-from docx_parser import generate_markdown_from_docx
+from docx_parser import iter_markdown_blocks
 
-# 定义主函数，处理输入并生成 PowerPoint 演示文稿
-def main(input_file):
-    config = Config()  # 加载配置文件
-    content_formatter = ContentFormatter()
-    content_assistant = ContentAssistant()
+# 支持的输入文件扩展名
+MARKDOWN_EXTENSIONS = ('.md', '.markdown')
+SUPPORTED_EXTENSIONS = MARKDOWN_EXTENSIONS + ('.docx',)
 
-    # 检查输入文件是否存在
-    if not os.path.exists(input_file):
-        LOG.error(f"{input_file} 不存在。")  # 如果文件不存在，记录错误日志
-        return
+def load_input_text(input_file, get_content_formatter, get_content_assistant, get_deck_builder=None):
+    """
+    读取输入文件并返回 ChatPPT markdown 文本。docx 文件会先经过 LLM 格式化与配图调整。
 
+    参数:
+        input_file (str): 输入文件路径
+        get_content_formatter (callable): 返回 ContentFormatter 实例的函数，仅在处理 docx 时调用
+        get_content_assistant (callable): 返回 ContentAssistant 实例的函数，仅在处理 docx 时调用
+        get_deck_builder (callable, optional): 返回 DeckBuilder 实例的函数。提供时 docx 使用融合模式一次生成，
+            校验失败再回退到格式化 + 配图调整两步流程
+    """
     # 根据输入文件的扩展名判断文件类型
     file_extension = os.path.splitext(input_file)[1].lower()
 
-    if file_extension in ['.md', '.markdown']:
+    if file_extension in MARKDOWN_EXTENSIONS:
         # 处理 markdown 文件
         with open(input_file, 'r', encoding='utf-8') as file:
-            input_text = file.read()
+            return file.read()
     elif file_extension == '.docx':
         # 处理 docx 文件
         LOG.info(f"正在解析 docx 文件: {input_file}")
-        # 调用 generate_markdown_from_docx 函数，获取 markdown 内容
-        raw_content = generate_markdown_from_docx(input_file)
-        markdown_content = content_formatter.format(raw_content)
-        input_text = content_assistant.adjust_single_picture(markdown_content)
+        def format_and_adjust(raw_content):
+            # 长文档逐块格式化、逐块调整后再拼接
+            title, chunks = get_content_formatter().format_chunks(raw_content)
+            return get_content_assistant().adjust_chunks(chunks, title)
+
+        # 逐段解析 docx，内容块直接交给格式化器拼接
+        if get_deck_builder is not None:
+            return get_deck_builder().build(iter_markdown_blocks(input_file), fallback=format_and_adjust)
+        return format_and_adjust(iter_markdown_blocks(input_file))
     else:
         # 不支持的文件类型
-        LOG.error(f"暂不支持的文件格式: {file_extension}")
+        raise ValueError(f"暂不支持的文件格式: {file_extension}")
+
+def render_input_text(input_text, layout_manager, template_path, output_pptx=None):
+    """
+    解析 markdown 文本并生成 PowerPoint 文件，返回输出文件路径。
+
+    参数:
+        output_pptx (str, optional): 输出文件路径，默认为 outputs/{演示文稿标题}.pptx
+    """
+    # 调用 parse_input_text 函数，解析输入文本，生成 PowerPoint 数据结构
+    powerpoint_data, presentation_title = parse_input_text(input_text, layout_manager)
+
+    LOG.info(f"解析转换后的 ChatPPT PowerPoint 数据结构:\n{powerpoint_data}")  # 记录信息日志，打印解析后的 PowerPoint 数据
+
+    # 定义输出 PowerPoint 文件的路径
+    if output_pptx is None:
+        output_pptx = f"outputs/{presentation_title}.pptx"
+
+    # 调用 generate_presentation 函数生成 PowerPoint 演示文稿
+    generate_presentation(powerpoint_data, template_path, output_pptx)
+    return output_pptx
+
+# 定义主函数，处理输入并生成 PowerPoint 演示文稿
+def main(input_file):
+    config = Config()  # 加载配置文件
+    content_formatter = ContentFormatter()
+    content_assistant = ContentAssistant()
+    get_deck_builder = ((lambda: DeckBuilder(config.deck_builder_prompt, content_formatter.max_chunk_tokens))
+                        if config.docx_fused_mode else None)
+
+    # 检查输入文件是否存在
+    if not os.path.exists(input_file):
+        LOG.error(f"{input_file} 不存在。")  # 如果文件不存在，记录错误日志
+        return
+
+    try:
+        input_text = load_input_text(input_file, lambda: content_formatter, lambda: content_assistant, get_deck_builder)
+    except ValueError as e:
+        LOG.error(str(e))
         return
 
     # 加载 PowerPoint 模板，并打印模板中的可用布局
@@ -50,16 +100,149 @@ def main(input_file):
     # 初始化 LayoutManager，使用配置文件中的 layout_mapping
     layout_manager = LayoutManager(get_layout_mapping(ppt_template))
 
-    # 调用 parse_input_text 函数，解析输入文本，生成 PowerPoint 数据结构
-    powerpoint_data, presentation_title = parse_input_text(input_text, layout_manager)
+    render_input_text(input_text, layout_manager, config.ppt_template)
 
-    LOG.info(f"解析转换后的 ChatPPT PowerPoint 数据结构:\n{powerpoint_data}")  # 记录信息日志，打印解析后的 PowerPoint 数据
+# 批处理工作进程的状态：每个进程只加载一次配置、模板与布局映射，LLM 客户端按需创建
+_worker_state = {}
 
-    # 定义输出 PowerPoint 文件的路径
-    output_pptx = f"outputs/{presentation_title}.pptx"
+def _init_batch_worker(config_file):
+    """
+    批处理工作进程的初始化函数。
+    """
+    config = Config(config_file)
+    ppt_template = load_template(config.ppt_template)  # 同时预热进程内的模板池
+    _worker_state["config"] = config
+    _worker_state["layout_manager"] = LayoutManager(get_layout_mapping(ppt_template))
 
-    # 调用 generate_presentation 函数生成 PowerPoint 演示文稿
-    generate_presentation(powerpoint_data, config.ppt_template, output_pptx)
+def _get_worker_content_formatter():
+    if "content_formatter" not in _worker_state:
+        _worker_state["content_formatter"] = ContentFormatter(_worker_state["config"].content_formatter_prompt)
+    return _worker_state["content_formatter"]
+
+def _get_worker_content_assistant():
+    if "content_assistant" not in _worker_state:
+        _worker_state["content_assistant"] = ContentAssistant(_worker_state["config"].content_assistant_prompt)
+    return _worker_state["content_assistant"]
+
+def _get_worker_deck_builder():
+    if "deck_builder" not in _worker_state:
+        _worker_state["deck_builder"] = DeckBuilder(_worker_state["config"].deck_builder_prompt,
+                                                    _get_worker_content_formatter().max_chunk_tokens)
+    return _worker_state["deck_builder"]
+
+def _process_batch_file(input_file, output_pptx):
+    """
+    在工作进程中处理单个输入文件并写入 output_pptx，返回包含耗时与错误信息的结果字典。
+    """
+    start = time.perf_counter()
+    result = {"input": input_file, "output": None, "seconds": 0.0, "error": None}
+    try:
+        get_deck_builder = _get_worker_deck_builder if _worker_state["config"].docx_fused_mode else None
+        input_text = load_input_text(
+            input_file, _get_worker_content_formatter, _get_worker_content_assistant, get_deck_builder
+        )
+        result["output"] = render_input_text(
+            input_text, _worker_state["layout_manager"], _worker_state["config"].ppt_template, output_pptx
+        )
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def collect_batch_inputs(source):
+    """
+    收集批处理的输入文件列表。
+
+    参数:
+        source (str): 目录（处理其中所有 .md/.markdown/.docx 文件）或清单文件（每行一个路径，# 开头为注释）。
+            清单中的相对路径相对于清单文件所在目录，与命令的执行目录无关
+    """
+    if os.path.isdir(source):
+        return [
+            os.path.join(source, name) for name in sorted(os.listdir(source))
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS
+        ]
+
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"批处理输入 '{source}' 不存在。")
+
+    manifest_dir = os.path.dirname(source)
+    with open(source, 'r', encoding='utf-8') as manifest:
+        lines = (line.strip() for line in manifest)
+        return [os.path.join(manifest_dir, line) for line in lines if line and not line.startswith('#')]
+
+def batch_output_paths(input_files, output_dir='outputs'):
+    """
+    为每个输入文件分配输出路径：以输入文件名（不含扩展名）命名，
+    不同目录下的同名输入依次加上 -2、-3 等后缀并记录警告，保证互不覆盖。
+
+    返回:
+        dict: 输入文件路径 -> 输出 pptx 路径
+    """
+    outputs, used = {}, set()
+    for input_file in input_files:
+        stem = os.path.splitext(os.path.basename(input_file))[0]
+        name, index = stem, 1
+        while name.lower() in used:
+            index += 1
+            name = f"{stem}-{index}"
+        if name != stem:
+            LOG.warning(f"[批处理] 输出文件名冲突: {input_file} 改为输出到 {name}.pptx")
+        used.add(name.lower())
+        outputs[input_file] = os.path.join(output_dir, f"{name}.pptx")
+    return outputs
+
+def run_batch(source, workers=None, config_file='config.json', output_dir='outputs'):
+    """
+    使用进程池批量生成 PowerPoint 演示文稿，并输出每个文件的耗时与失败汇总。
+
+    参数:
+        source (str): 输入目录或清单文件
+        workers (int, optional): 工作进程数量，默认为 CPU 核数
+        config_file (str): 配置文件路径
+        output_dir (str): 输出目录，每个输入生成 {输入文件名}.pptx
+
+    返回:
+        list: 每个输入文件的结果字典（input、output、seconds、error），按输入顺序排列
+    """
+    input_files = collect_batch_inputs(source)
+    if not input_files:
+        LOG.warning(f"'{source}' 中没有可处理的输入文件。")
+        return []
+
+    output_paths = batch_output_paths(input_files, output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    workers = workers or os.cpu_count() or 1
+    LOG.info(f"开始批处理 {len(input_files)} 个文件，工作进程数: {workers}")
+
+    batch_start = time.perf_counter()
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker, initargs=(config_file,)) as executor:
+        futures = {
+            executor.submit(_process_batch_file, input_file, output_paths[input_file]): input_file
+            for input_file in input_files
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            results[result["input"]] = result
+            if result["error"]:
+                LOG.error(f"[批处理失败] {result['input']} ({result['seconds']:.2f}s): {result['error']}")
+            else:
+                LOG.info(f"[批处理完成] {result['input']} -> {result['output']} ({result['seconds']:.2f}s)")
+
+    ordered_results = [results[input_file] for input_file in input_files]
+    failures = [result for result in ordered_results if result["error"]]
+
+    # 输出汇总信息
+    summary = [f"批处理完成: 共 {len(ordered_results)} 个文件，成功 {len(ordered_results) - len(failures)} 个，"
+               f"失败 {len(failures)} 个，总耗时 {time.perf_counter() - batch_start:.2f}s"]
+    for result in ordered_results:
+        status = f"失败: {result['error']}" if result["error"] else result["output"]
+        summary.append(f"  {result['seconds']:8.2f}s  {result['input']}  {status}")
+    LOG.info("\n".join(summary))
+
+    return ordered_results
 
 # 程序入口
 if __name__ == "__main__":
@@ -71,9 +254,26 @@ if __name__ == "__main__":
         default='inputs/markdown/test_input.md',  # 默认值
         help='输入 markdown 或 docx 文件的路径（默认: inputs/markdown/test_input.md）'
     )
+    parser.add_argument(
+        '--batch',
+        metavar='SOURCE',
+        help='批处理模式：输入目录，或每行一个文件路径的清单文件'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='批处理模式下的工作进程数量（默认: CPU 核数）'
+    )
 
     # 解析命令行参数
     args = parser.parse_args()
 
-    # 使用解析后的输入文件参数运行主函数
-    main(args.input_file)
+    if args.batch:
+        # 批处理模式，有文件失败时以非零状态码退出
+        batch_results = run_batch(args.batch, args.workers)
+        if any(result["error"] for result in batch_results):
+            raise SystemExit(1)
+    else:
+        # 使用解析后的输入文件参数运行主函数
+        main(args.input_file)
@@ -0,0 +1,106 @@
+import re
+
+from logger import LOG  # 导入日志工具
+
+# 分块边界：一到三级标题
+section_heading_pattern = re.compile(r'^#{1,3}\s+')
+# 中日韩字符，每个字符大约对应一个 token
+cjk_pattern = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+
+def estimate_tokens(text):
+    """
+    粗略估计文本的 token 数：中日韩字符按每字 1 个 token，其余字符按每 4 个字符 1 个 token 计算。
+    只用于分块预算，不需要与模型的分词器精确一致。
+    """
+    cjk_count = len(cjk_pattern.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+def extract_title(markdown):
+    """
+    返回文档中第一个一级标题（"# " 开头）的文本，不存在时返回 None。
+    """
+    for line in markdown.splitlines():
+        if line.startswith('# '):
+            return line[2:].strip()
+    return None
+
+def _split_sections(markdown):
+    """
+    在标题行之前切分，返回各章节的文本（保留原有换行）。
+    """
+    sections, current = [], []
+    for line in markdown.splitlines(keepends=True):
+        if section_heading_pattern.match(line) and current:
+            sections.append(''.join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append(''.join(current))
+    return sections
+
+def _split_paragraphs(section, max_tokens):
+    """
+    将超出预算的单个章节在空行处切分为若干段，单个过长的段落保持完整。
+    """
+    pieces, current, current_tokens = [], [], 0
+    for paragraph in re.split(r'(?<=\n\n)', section):
+        tokens = estimate_tokens(paragraph)
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append(''.join(current))
+            current, current_tokens = [], 0
+        current.append(paragraph)
+        current_tokens += tokens
+    if current:
+        pieces.append(''.join(current))
+    return pieces
+
+def split_markdown_sections(markdown, max_tokens):
+    """
+    按标题边界把 markdown 切分为不超过 max_tokens 的块。
+
+    相邻章节按顺序尽量合并到同一块中；单个章节超出预算时再在段落边界切分。
+    块的顺序与原文一致，拼接后等于原文。
+
+    参数:
+        markdown (str): 原始 markdown 内容
+        max_tokens (int): 每块的 token 预算（按 estimate_tokens 估计）
+
+    返回:
+        List[str]: markdown 块列表
+    """
+    chunks, current, current_tokens = [], [], 0
+    for section in _split_sections(markdown):
+        tokens = estimate_tokens(section)
+        pieces = [section] if tokens <= max_tokens else _split_paragraphs(section, max_tokens)
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append(''.join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        chunks.append(''.join(current))
+
+    LOG.debug(f"[分块] 共 {estimate_tokens(markdown)} tokens，切分为 {len(chunks)} 块")
+    return chunks
+
+def stitch_formatted_chunks(formatted_chunks, title=None):
+    """
+    将各块的格式化结果拼接为一份完整的幻灯片 markdown，并统一主标题。
+
+    每块的格式化结果都可能带有自己的 "# " 主标题，拼接时全部去掉，只在开头保留一个：
+    优先使用原文的标题 title，原文没有标题时使用第一块结果中的标题。
+    """
+    if title is None:
+        title = next((found for found in map(extract_title, formatted_chunks) if found), None)
+
+    slides = []
+    for chunk in formatted_chunks:
+        lines = [line for line in chunk.strip().splitlines() if not line.startswith('# ')]
+        body = '\n'.join(lines).strip()
+        if body:
+            slides.append(body)
+
+    parts = [f'# {title}'] if title else []
+    return '\n\n'.join(parts + slides) + '\n'
@@ -1,44 +1,103 @@
 from PIL import Image
-from transformers import AutoModel, AutoTokenizer
 from logger import LOG  # 引入日志模块，用于记录日志
+from model_loader import LazyModel
+from image_description_cache import image_description_cache
 
-# 加载模型和分词器
-# 这里我们使用 `AutoModel` 和 `AutoTokenizer` 加载模型 'openbmb/MiniCPM-V-2_6-int4'
-# 参数 `trust_remote_code=True` 表示信任远程代码（根据模型文档设置）
-model = AutoModel.from_pretrained('openbmb/MiniCPM-V-2_6-int4', trust_remote_code=True)
-tokenizer = AutoTokenizer.from_pretrained('openbmb/MiniCPM-V-2_6-int4', trust_remote_code=True)
-model.eval()  # 设置模型为评估模式，以确保不进行训练中的随机性操作
+MODEL_NAME = 'openbmb/MiniCPM-V-2_6-int4'
+# int4 量化权重依赖 bitsandbytes 的 CUDA 内核，没有 GPU 时改为在 CPU 上加载 bfloat16 的原始权重
+CPU_MODEL_NAME = 'openbmb/MiniCPM-V-2_6'
 
-def chat_with_image(image_file, question='描述下这幅图', sampling=False, temperature=0.7, stream=False):
+def load_model():
+    """
+    加载模型和分词器，transformers 在此处才导入，导入本模块不会加载任何权重。
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    # 参数 `trust_remote_code=True` 表示信任远程代码（根据模型文档设置）
+    if torch.cuda.is_available():
+        # 使用 `AutoModel` 和 `AutoTokenizer` 加载模型 'openbmb/MiniCPM-V-2_6-int4'
+        model_name = MODEL_NAME
+        model = AutoModel.from_pretrained(model_name, trust_remote_code=True)
+    else:
+        model_name = CPU_MODEL_NAME
+        model = AutoModel.from_pretrained(model_name, trust_remote_code=True, torch_dtype=torch.bfloat16)
+        model = model.to("cpu")
+    tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
+    model.eval()  # 设置模型为评估模式，以确保不进行训练中的随机性操作
+    LOG.info(f"已加载图像理解模型 {model_name}")
+    return model, tokenizer
+
+# 模型在首次使用或调用 minicpm_model.warm_up() 时加载
+minicpm_model = LazyModel(MODEL_NAME, load_model)
+
+def chat_with_image(image_file, question='描述下这幅图', sampling=None, temperature=0.7, stream=False):
     """
     使用模型的聊天功能生成对图像的回答。
     
     参数:
         image_file: 图像文件，用于处理的图像。
         question: 提问的问题，默认为 '描述下这幅图'。
-        sampling: 是否使用采样进行生成，默认为 False。
+        sampling: 是否使用采样进行生成，默认为 None：非流式调用使用模型的默认设置，流式调用不采样。
         temperature: 采样温度，用于控制生成文本的多样性，值越高生成越多样。
         stream: 是否流式返回响应，默认为 False。
         
     返回:
         生成的回答文本字符串。
     """
+    # 非流式调用先查图像描述缓存，相同或近似的图像不再重复推理
+    if not stream:
+        return image_description_cache.cached_describe(_describe_image, image_file, question, sampling, temperature)
+
+    model, tokenizer = minicpm_model.get()
+
     # 打开并转换图像为 RGB 模式
     image = Image.open(image_file).convert('RGB')
 
     # 创建消息列表，模拟用户和 AI 的对话
     msgs = [{'role': 'user', 'content': [image, question]}]
 
-    # 如果不启用流式输出，直接返回生成的完整响应
-    if not stream:
-        return model.chat(image=None, msgs=msgs, tokenizer=tokenizer, temperature=temperature)
-    else:
-        # 启用流式输出，则逐字生成并打印响应
-        generated_text = ""
-        for new_text in model.chat(image=None, msgs=msgs, tokenizer=tokenizer, sampling=sampling, temperature=temperature, stream=True):
-            generated_text += new_text
-            print(new_text, flush=True, end='')  # 实时输出每部分生成的文本
-        return generated_text  # 返回完整的生成文本
+    # 启用流式输出，则逐字生成并打印响应
+    generated_text = ""
+    for new_text in model.chat(image=None, msgs=msgs, tokenizer=tokenizer, sampling=bool(sampling), temperature=temperature, stream=True):
+        generated_text += new_text
+        print(new_text, flush=True, end='')  # 实时输出每部分生成的文本
+    return generated_text  # 返回完整的生成文本
+
+def _describe_image(image_file, question, sampling, temperature):
+    """
+    不经缓存直接调用模型，返回完整的回答文本。
+    """
+    return chat_with_images([{
+        'image_file': image_file,
+        'question': question,
+        'sampling': sampling,
+        'temperature': temperature,
+    }])[0]
+
+def chat_with_images(requests):
+    """
+    批量生成多张图像的回答，一次前向计算处理所有图像。
+
+    参数:
+        requests: 字典列表，每项包含 image_file、question、sampling 与 temperature。
+                  同一批次使用第一项的 sampling 与 temperature，sampling 为 None 时使用模型的默认设置。
+
+    返回:
+        与 requests 顺序一致的回答文本列表。
+    """
+    model, tokenizer = minicpm_model.get()
+
+    msgs = [
+        [{'role': 'user', 'content': [Image.open(request['image_file']).convert('RGB'), request['question']]}]
+        for request in requests
+    ]
+    generate_kwargs = {'temperature': requests[0].get('temperature', 0.7)}
+    if requests[0].get('sampling') is not None:
+        generate_kwargs['sampling'] = requests[0]['sampling']
+    answers = model.chat(image=None, msgs=msgs, tokenizer=tokenizer, **generate_kwargs)
+    # 只有一条消息时模型返回字符串，批量时返回列表
+    return [answers] if isinstance(answers, str) else list(answers)
 
 # 主程序入口
 if __name__ == "__main__":
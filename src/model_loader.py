@@ -0,0 +1,74 @@
+import threading
+
+from logger import LOG  # 引入日志模块
+
+# 延迟加载的模型容器：首次使用时才加载权重，也可以在后台线程中提前预热
+class LazyModel:
+    """
+    延迟加载的模型。
+
+    loader 是一个无参函数，返回加载完成的模型对象（可以是元组，例如 (model, tokenizer)）。
+    get() 在首次调用时加载并缓存结果，并发调用会等待同一次加载完成；warm_up() 在后台线程中加载，
+    不阻塞调用方。status 供界面展示当前的加载状态。
+    """
+    NOT_LOADED = "未加载"
+    LOADING = "加载中"
+    READY = "就绪"
+    FAILED = "加载失败"
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._model = None
+        self._status = self.NOT_LOADED
+        self._error = None
+        self._lock = threading.Lock()
+
+    @property
+    def status(self):
+        """
+        当前加载状态，加载失败时附带错误信息。
+        """
+        if self._status == self.FAILED:
+            return f"{self.FAILED}: {self._error}"
+        return self._status
+
+    @property
+    def is_ready(self):
+        return self._status == self.READY
+
+    def get(self):
+        """
+        返回已加载的模型，尚未加载时在当前线程中加载。加载失败时抛出 RuntimeError，下次调用会重试。
+        """
+        if self._model is not None:
+            return self._model
+
+        with self._lock:
+            if self._model is None:
+                self._status = self.LOADING
+                LOG.info(f"[模型加载] 开始加载 {self.name}")
+                try:
+                    self._model = self._loader()
+                except Exception as e:
+                    self._status = self.FAILED
+                    self._error = e
+                    LOG.error(f"[模型加载] {self.name} 加载失败: {e}")
+                    raise RuntimeError(f"{self.name} 加载失败: {e}") from e
+                self._status = self.READY
+                LOG.info(f"[模型加载] {self.name} 加载完成")
+        return self._model
+
+    def warm_up(self):
+        """
+        在后台守护线程中加载模型，立即返回该线程。
+        """
+        def _load():
+            try:
+                self.get()
+            except RuntimeError:
+                pass  # 错误已记录在 status 中
+
+        thread = threading.Thread(target=_load, name=f"warm-up-{self.name}", daemon=True)
+        thread.start()
+        return thread
@@ -1,60 +1,81 @@
-from transformers import pipeline
 import gradio as gr
-import torch
-import tempfile
 import os
 import subprocess
 
 from logger import LOG
+from model_loader import LazyModel
+from audio_utils import load_audio, pcm_digest, SAMPLE_RATE
+from streaming_asr import StreamingTranscriber
+from asr_scheduler import AsrBatchScheduler
+from disk_cache import DiskCache
 
 # 模型名称和参数配置
 MODEL_NAME = "openai/whisper-large-v3"  # Whisper 模型名称
 BATCH_SIZE = 8  # 处理批次大小
 
-# 检查是否可以使用 GPU，否则使用 CPU
-device = "cuda:0" if torch.cuda.is_available() else "cpu"
+def load_pipeline():
+    """
+    加载语音识别管道。torch 与 transformers 在此处才导入，导入本模块不会加载任何权重。
+    """
+    import torch
+    from transformers import pipeline
+
+    # 检查是否可以使用 GPU，否则使用 CPU
+    device = "cuda:0" if torch.cuda.is_available() else "cpu"
+
+    # 初始化语音识别管道
+    return pipeline(
+        task="automatic-speech-recognition",  # 自动语音识别任务
+        model=MODEL_NAME,  # 指定模型
+        chunk_length_s=60,  # 每个音频片段的长度（秒）
+        device=device,  # 指定设备
+    )
 
-# 初始化语音识别管道
-pipe = pipeline(
-    task="automatic-speech-recognition",  # 自动语音识别任务
-    model=MODEL_NAME,  # 指定模型
-    chunk_length_s=60,  # 每个音频片段的长度（秒）
-    device=device,  # 指定设备
-)
+# 语音识别管道在首次使用或调用 whisper_model.warm_up() 时加载
+whisper_model = LazyModel(MODEL_NAME, load_pipeline)
+
+def batch_transcribe(audios, task):
+    """
+    对多段完整音频做批量识别，返回同样顺序的文本列表。
+
+    管道按 chunk_length_s 把长音频切成带重叠的窗口并按 stride 合并结果，
+    所有请求的窗口一起按 BATCH_SIZE 批量前向计算。
+    """
+    pipe = whisper_model.get()
+    results = pipe(
+        [{"raw": audio, "sampling_rate": SAMPLE_RATE} for audio in audios],
+        batch_size=BATCH_SIZE,
+        generate_kwargs={"task": task},
+        return_timestamps=True,
+    )
+    return [result["text"] for result in results]
+
+# 识别结果缓存：键为 模型名称 + 任务类型 + 解码后 PCM 的哈希值，重试或重复上传同一录音时直接返回
+asr_cache = DiskCache("cache/asr", max_bytes=50 * 1024 * 1024)
+
+def asr_cache_key(audio, task):
+    return f"{MODEL_NAME}:{task}:{pcm_digest(audio)}"
+
+# 进程内共享的动态批处理调度器：并发用户的音频合并为一次批量推理，最多等待 50 毫秒凑批
+asr_scheduler = AsrBatchScheduler(batch_transcribe, max_batch_size=BATCH_SIZE, max_wait=0.05)
 
-def convert_to_wav(input_path):
+def decode_audio(input_path):
     """
-    将音频文件转换为 WAV 格式并返回新文件路径。
+    将音频文件解码为 16 kHz 单声道 float32 数组，不写临时文件。
 
     参数:
     - input_path: 输入的音频文件路径
 
     返回:
-    - output_path: 转换后的 WAV 文件路径
+    - audio: 解码后的音频数组
     """
-    # 创建临时 WAV 文件，用于存储转换结果
-    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_wav_file:
-        output_path = temp_wav_file.name
-
     try:
-        # 使用 ffmpeg 将音频文件转换为指定格式
-        subprocess.run(
-            ["ffmpeg", "-y", "-i", input_path, "-ar", "16000", "-ac", "1", output_path],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        return output_path
+        return load_audio(input_path)
     except subprocess.CalledProcessError as e:
         LOG.error(f"音频文件转换失败: {e}")
-        # 如果转换失败，删除临时文件并抛出错误
-        if os.path.exists(output_path):
-            os.remove(output_path)
         raise gr.Error("音频文件转换失败。请上传有效的音频文件。")
     except FileNotFoundError:
         LOG.error("未找到 ffmpeg 可执行文件。请确保已安装 ffmpeg。")
-        if os.path.exists(output_path):
-            os.remove(output_path)
         raise gr.Error("服务器配置错误，缺少 ffmpeg。请联系管理员。")
 
 def asr(audio_file, task="transcribe"):
@@ -68,28 +89,26 @@ def asr(audio_file, task="transcribe"):
     返回:
     - text: 识别或翻译后的文本内容
     """
-    # 转换音频文件为 WAV 格式
-    wav_file = convert_to_wav(audio_file)
+    # 将音频直接解码到内存，避免写入临时 WAV 文件后再由管道二次解码
+    audio = decode_audio(audio_file)
+
+    cache_key = asr_cache_key(audio, task)
+    cached = asr_cache.get(cache_key)
+    if cached is not None:
+        text = cached.decode("utf-8")
+        LOG.info(f"[识别结果（缓存）]：{text}")
+        return text
 
     try:
-        # 使用管道进行转录或翻译
-        result = pipe(
-            wav_file,
-            batch_size=BATCH_SIZE,
-            generate_kwargs={"task": task},
-            return_timestamps=True
-        )
-        text = result["text"]
+        # 交给调度器与其他并发请求一起批量转录或翻译，模型尚未加载时在此等待加载完成
+        text = asr_scheduler.transcribe(audio, task)
         LOG.info(f"[识别结果]：{text}")
+        asr_cache.set(cache_key, text.encode("utf-8"))
 
         return text
     except Exception as e:
         LOG.error(f"处理音频文件时出错: {e}")
         raise gr.Error(f"处理音频文件时出错：{str(e)}")
-    finally:
-        # 删除临时转换后的 WAV 文件
-        if os.path.exists(wav_file):
-            os.remove(wav_file)
 
 def transcribe(inputs, task):
     """
@@ -117,6 +136,60 @@ def transcribe(inputs, task):
     # 调用语音识别或翻译函数
     return asr(inputs, task)
 
+def transcribe_segment(audio, task="transcribe"):
+    """
+    对一段已解码的语音（SAMPLE_RATE 采样率的 float32 数组）进行识别，供流式识别逐段调用。
+    """
+    return asr_scheduler.transcribe(audio, task)
+
+def stream_transcribe(transcriber, audio_chunk, task):
+    """
+    麦克风流式输入的回调：将片段交给 StreamingTranscriber，返回已识别的部分文本。
+
+    参数:
+    - transcriber: 当前会话的 StreamingTranscriber，首个片段到达时创建
+    - audio_chunk: Gradio 传入的 (采样率, 数据) 元组
+    - task: 任务类型（"transcribe" 表示转录，"translate" 表示翻译）
+    """
+    if transcriber is None:
+        transcriber = StreamingTranscriber(lambda segment: transcribe_segment(segment, task))
+    if audio_chunk is None:
+        return transcriber, transcriber.partial_text()
+
+    sample_rate, data = audio_chunk
+    return transcriber, transcriber.feed(sample_rate, data)
+
+def finish_stream_transcribe(transcriber):
+    """
+    录音停止时的回调：等待剩余语音段识别完成，返回完整文本并重置会话状态。
+    """
+    if transcriber is None:
+        return None, ""
+    text = transcriber.finish()
+    LOG.info(f"[流式识别结果]：{text}")
+    return None, text
+
+# 定义麦克风流式输入的界面：边说边识别，录音停止后很快得到完整文本
+with gr.Blocks() as mf_stream_transcribe:
+    gr.Markdown("## Whisper Large V3: 实时语音识别")
+    gr.Markdown("使用麦克风录音，说话停顿时即开始识别已说完的语句，录音结束后输出完整文本。")
+    stream_task = gr.Radio(["transcribe", "translate"], label="任务类型", value="transcribe")
+    stream_audio = gr.Audio(sources="microphone", type="numpy", streaming=True, label="麦克风输入")
+    stream_text = gr.Textbox(label="识别结果")
+    stream_state = gr.State(None)
+
+    stream_audio.stream(
+        fn=stream_transcribe,
+        inputs=[stream_state, stream_audio, stream_task],
+        outputs=[stream_state, stream_text],
+        stream_every=0.5,
+    )
+    stream_audio.stop_recording(
+        fn=finish_stream_transcribe,
+        inputs=[stream_state],
+        outputs=[stream_state, stream_text],
+    )
+
 # 定义麦克风输入的接口实例，可供外部模块调用
 mf_transcribe = gr.Interface(
     fn=transcribe,  # 执行转录的函数
@@ -147,10 +220,10 @@ file_transcribe = gr.Interface(
 if __name__ == "__main__":
     # 创建一个 Gradio Blocks 实例，用于包含多个接口
     with gr.Blocks() as demo:
-        # 使用 TabbedInterface 将 mf_transcribe 和 file_transcribe 接口分别放置在 "麦克风" 和 "音频文件" 选项卡中
+        # 使用 TabbedInterface 将 mf_stream_transcribe、mf_transcribe 和 file_transcribe 接口分别放置在各选项卡中
         gr.TabbedInterface(
-            [mf_transcribe, file_transcribe],
-            ["麦克风", "音频文件"]
+            [mf_stream_transcribe, mf_transcribe, file_transcribe],
+            ["实时麦克风", "麦克风", "音频文件"]
         )
 
     # 启动Gradio应用，允许队列功能，并通过 HTTPS 访问
@@ -1,8 +1,8 @@
 import os
-from pptx import Presentation
 from pptx.util import Inches
 from PIL import Image
-from utils import remove_all_slides
+from template_manager import template_pool
+from input_parser import StreamingInputParser
 from logger import LOG  # 引入日志模块
 
 def format_text(paragraph, text):
@@ -88,56 +88,128 @@ def insert_image_centered_in_placeholder(new_slide, image_path):
             LOG.debug("已删除图片的 placeholder")
             break
 
-# 生成 PowerPoint 演示文稿
-def generate_presentation(powerpoint_data, template_path: str, output_path: str):
+def render_slide(prs, slide):
+    """
+    将一张 Slide 数据渲染到已打开的演示文稿末尾。
+    """
+    # 确保布局索引不超出范围，超出则使用默认布局
+    if slide.layout_id >= len(prs.slide_layouts):
+        slide_layout = prs.slide_layouts[0]
+    else:
+        slide_layout = prs.slide_layouts[slide.layout_id]
+
+    new_slide = prs.slides.add_slide(slide_layout)  # 添加新的幻灯片
+
+    # 设置幻灯片标题
+    if new_slide.shapes.title:
+        new_slide.shapes.title.text = slide.content.title
+        LOG.debug(f"设置幻灯片标题: {slide.content.title}")
+
+    # 添加文本内容
+    for shape in new_slide.shapes:
+        # 只处理非标题的文本框
+        if shape.has_text_frame and not shape == new_slide.shapes.title:
+            text_frame = shape.text_frame
+            text_frame.clear()  # 清除原有内容
+
+            # 直接使用第一个段落，不添加新的段落，避免额外空行
+            first_paragraph = text_frame.paragraphs[0]
+            
+            # 将要点内容作为项目符号列表添加到文本框中
+            for point in slide.content.bullet_points:
+                # 第一个要点覆盖初始段落，其他要点添加新段落
+                paragraph = first_paragraph if point == slide.content.bullet_points[0] else text_frame.add_paragraph()
+                paragraph.level = point["level"]  # 设置项目符号的级别
+                format_text(paragraph, point["text"])  # 调用 format_text 方法来处理加粗文本
+                LOG.debug(f"添加列表项: {paragraph.text}，级别: {paragraph.level}")
+
+            break
+
+    # 插入图片
+    if slide.content.image_path:
+        insert_image_centered_in_placeholder(new_slide, slide.content.image_path)
+
+def open_presentation(template_path: str):
+    """
+    从模板池获取已清空幻灯片的模板副本，模板不存在时抛出 FileNotFoundError。
+    """
     # 检查模板文件是否存在
     if not os.path.exists(template_path):
         LOG.error(f"模板文件 '{template_path}' 不存在。")  # 记录错误日志
         raise FileNotFoundError(f"模板文件 '{template_path}' 不存在。")
 
-    prs = Presentation(template_path)  # 加载 PowerPoint 模板
-    remove_all_slides(prs)  # 清除模板中的所有幻灯片
+    return template_pool.acquire(template_path)
+
+# 生成 PowerPoint 演示文稿
+def generate_presentation(powerpoint_data, template_path: str, output_path: str):
+    prs = open_presentation(template_path)  # 从模板池获取已清空幻灯片的模板副本
     prs.core_properties.title = powerpoint_data.title  # 设置 PowerPoint 的核心标题
 
     # 遍历所有幻灯片数据，生成对应的 PowerPoint 幻灯片
     for slide in powerpoint_data.slides:
-        # 确保布局索引不超出范围，超出则使用默认布局
-        if slide.layout_id >= len(prs.slide_layouts):
-            slide_layout = prs.slide_layouts[0]
-        else:
-            slide_layout = prs.slide_layouts[slide.layout_id]
-
-        new_slide = prs.slides.add_slide(slide_layout)  # 添加新的幻灯片
-
-        # 设置幻灯片标题
-        if new_slide.shapes.title:
-            new_slide.shapes.title.text = slide.content.title
-            LOG.debug(f"设置幻灯片标题: {slide.content.title}")
-
-        # 添加文本内容
-        for shape in new_slide.shapes:
-            # 只处理非标题的文本框
-            if shape.has_text_frame and not shape == new_slide.shapes.title:
-                text_frame = shape.text_frame
-                text_frame.clear()  # 清除原有内容
-
-                # 直接使用第一个段落，不添加新的段落，避免额外空行
-                first_paragraph = text_frame.paragraphs[0]
-                
-                # 将要点内容作为项目符号列表添加到文本框中
-                for point in slide.content.bullet_points:
-                    # 第一个要点覆盖初始段落，其他要点添加新段落
-                    paragraph = first_paragraph if point == slide.content.bullet_points[0] else text_frame.add_paragraph()
-                    paragraph.level = point["level"]  # 设置项目符号的级别
-                    format_text(paragraph, point["text"])  # 调用 format_text 方法来处理加粗文本
-                    LOG.debug(f"添加列表项: {paragraph.text}，级别: {paragraph.level}")
-
-                break
-
-        # 插入图片
-        if slide.content.image_path:
-            insert_image_centered_in_placeholder(new_slide, slide.content.image_path)
+        render_slide(prs, slide)
 
     # 保存生成的 PowerPoint 文件
     prs.save(output_path)
     LOG.info(f"演示文稿已保存到 '{output_path}'")
+
+# 边接收 markdown 片段边解析、边渲染幻灯片的演示文稿
+class StreamingPresentation:
+    """
+    流式构建的演示文稿。feed(chunk) 接收任意文本片段（如 LLM 流式输出的 token），每个 "## " 章节一结束，
+    对应的幻灯片就被追加到已打开的演示文稿中；save() 渲染剩余的幻灯片并保存。
+    """
+    def __init__(self, layout_manager, template_path: str):
+        self.prs = open_presentation(template_path)
+        self.parser = StreamingInputParser(layout_manager)
+
+    def feed(self, chunk: str) -> int:
+        """
+        输入一段文本，渲染本段结束的幻灯片，返回渲染的幻灯片数。
+        """
+        slides = self.parser.feed(chunk)
+        for slide in slides:
+            render_slide(self.prs, slide)
+        return len(slides)
+
+    def save(self, output_path: str = None):
+        """
+        渲染最后一张幻灯片并保存。
+
+        参数:
+            output_path (str, optional): 输出路径，默认为 outputs/<演示文稿标题>.pptx
+
+        返回:
+            (str, PowerPoint): 输出文件路径及解析得到的 PowerPoint 数据结构
+        """
+        for slide in self.parser.close():
+            render_slide(self.prs, slide)
+
+        powerpoint_data = self.parser.to_powerpoint()
+        self.prs.core_properties.title = powerpoint_data.title  # 设置 PowerPoint 的核心标题
+
+        if output_path is None:
+            output_path = f"outputs/{powerpoint_data.title}.pptx"
+        self.prs.save(output_path)
+        LOG.info(f"演示文稿已保存到 '{output_path}'")
+        return output_path, powerpoint_data
+
+# 流式生成 PowerPoint 演示文稿：边接收 markdown 片段边解析、边渲染幻灯片
+def generate_presentation_from_stream(text_chunks, layout_manager, template_path: str, output_path: str = None):
+    """
+    text_chunks 为任意文本片段的可迭代对象（如 LLM 流式输出）。每个 "## " 章节一结束，
+    对应的幻灯片就被追加到已打开的演示文稿中；最后一个片段到达后只需渲染最后一张并保存。
+
+    参数:
+        text_chunks (Iterable[str]): markdown 文本片段
+        layout_manager (LayoutManager): 布局管理器
+        template_path (str): 模板路径
+        output_path (str, optional): 输出路径，默认为 outputs/<演示文稿标题>.pptx
+
+    返回:
+        (str, PowerPoint): 输出文件路径及解析得到的 PowerPoint 数据结构
+    """
+    presentation = StreamingPresentation(layout_manager, template_path)
+    for chunk in text_chunks:
+        presentation.feed(chunk)
+    return presentation.save(output_path)
@@ -0,0 +1,337 @@
+import os
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import threading
+from typing import List, Optional, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory  # 基础聊天消息历史类
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+from logger import LOG  # 导入日志工具
+from chat_history import trim_to_budget
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    message TEXT NOT NULL,
+    uid TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id);
+CREATE TABLE IF NOT EXISTS session_clears (
+    session_id TEXT PRIMARY KEY,
+    cleared_at REAL NOT NULL
+);
+"""
+
+# 基于 SQLite（WAL 模式）的会话存储：多个进程共享同一个数据库文件，写入在后台线程中批量提交
+class SQLiteChatStore:
+    """
+    SQLite 会话消息存储。
+
+    读取在调用线程各自的连接上执行，按 (session_id, id) 索引只取最近 read_limit 条消息；
+    写入先进入本进程的待写缓冲区并立即对本进程可见，由后台线程每 flush_interval 秒合并为一个事务提交，
+    提交后其他进程才能读到。进程内的锁只保护待写缓冲区，SQL 语句都在锁外执行，
+    某个进程的写入等待数据库锁时不会阻塞本进程其他会话的读取。
+
+    每条消息记录加入缓冲区的时间 created_at。clear() 在 session_clears 表中记录清空时间，
+    读取时忽略不晚于该时间的消息，因此其他进程在清空之前排队、之后才提交的写入同样被丢弃。
+    后台线程每 compact_interval 秒执行一次压缩：删除已清空的消息与空闲超过 ttl 秒的会话、
+    只保留每个会话最近 max_messages_per_session 条消息，并截断 WAL 文件。
+    """
+    def __init__(self, db_path="cache/chat_history.db", flush_interval=0.05, read_limit=200,
+                 max_messages_per_session=1000, ttl=7 * 24 * 3600, compact_interval=600):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.read_limit = read_limit
+        self.max_messages_per_session = max_messages_per_session
+        self.ttl = ttl
+        self.compact_interval = compact_interval
+        self.flushed_batches = 0
+        self.compactions = 0
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = {}  # 会话 ID -> 尚未提交的消息 [(uid, created_at, 序列化后的字典)]
+        self._queue = queue.Queue()
+        self._closed = False
+
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(messages)")}
+        if "uid" not in columns:
+            conn.execute("ALTER TABLE messages ADD COLUMN uid TEXT")  # 兼容旧版本创建的数据库
+        conn.commit()
+
+        self._writer = threading.Thread(target=self._run_writer, name="sqlite-chat-writer", daemon=True)
+        self._writer.start()
+
+    def _connection(self):
+        """
+        返回当前线程的数据库连接，首次使用时创建并开启 WAL 模式。
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_messages(self, session_id: str) -> List[BaseMessage]:
+        """
+        读取会话最近的消息（已提交的消息加上本进程尚未提交的消息），按时间顺序返回。
+        """
+        # 先取缓冲区快照再查询：快照之后才提交的消息会同时出现在两边，按 uid 去重
+        with self._lock:
+            pending = list(self._pending.get(session_id, ()))
+
+        conn = self._connection()
+        cleared_at = self._cleared_at(conn, session_id)
+        rows = conn.execute(
+            "SELECT uid, message FROM messages WHERE session_id = ? AND created_at > ? ORDER BY id DESC LIMIT ?",
+            (session_id, cleared_at, self.read_limit),
+        ).fetchall()
+        seen = {uid for uid, _ in rows}
+        pending = [entry for entry in pending if entry[0] not in seen and entry[1] > cleared_at]
+        if pending:
+            placeholders = ",".join("?" * len(pending))
+            committed = {row[0] for row in conn.execute(
+                f"SELECT uid FROM messages WHERE session_id = ? AND uid IN ({placeholders})",
+                [session_id] + [uid for uid, _, _ in pending],
+            )}
+            pending = [entry for entry in pending if entry[0] not in committed]
+
+        dicts = [json.loads(message) for _, message in reversed(rows)] + [data for _, _, data in pending]
+        return messages_from_dict(dicts[-self.read_limit:])
+
+    @staticmethod
+    def _cleared_at(conn, session_id):
+        row = conn.execute("SELECT cleared_at FROM session_clears WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else 0.0
+
+    def add_messages(self, session_id: str, messages: Sequence[BaseMessage]) -> None:
+        """
+        追加消息。消息立即对本进程可见，由后台线程批量写入数据库。
+        """
+        if self._closed:
+            raise RuntimeError("会话存储已关闭")
+        now = time.time()
+        entries = [(uuid.uuid4().hex, now, message_to_dict(message)) for message in messages]
+        with self._lock:
+            self._pending.setdefault(session_id, []).extend(entries)
+        self._queue.put(("add", session_id, entries))
+
+    def clear(self, session_id: str) -> None:
+        """
+        删除会话的全部消息，包括本进程与其他进程在此之前排队、尚未提交的消息。
+        """
+        with self._lock:
+            cleared_at = time.time()
+            remaining = [entry for entry in self._pending.pop(session_id, ()) if entry[1] > cleared_at]
+            if remaining:
+                self._pending[session_id] = remaining
+
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO session_clears (session_id, cleared_at) VALUES (?, ?) "
+            "ON CONFLICT (session_id) DO UPDATE SET cleared_at = MAX(cleared_at, excluded.cleared_at)",
+            (session_id, cleared_at),
+        )
+        conn.execute("DELETE FROM messages WHERE session_id = ? AND created_at <= ?", (session_id, cleared_at))
+        conn.commit()
+
+    def has_session(self, session_id: str) -> bool:
+        """
+        会话是否有未清空的消息（已提交或本进程尚未提交）。
+        """
+        with self._lock:
+            if self._pending.get(session_id):
+                return True
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT 1 FROM messages WHERE session_id = ? AND created_at > ? LIMIT 1",
+            (session_id, self._cleared_at(conn, session_id)),
+        ).fetchone()
+        return row is not None
+
+    def flush(self, timeout=None) -> bool:
+        """
+        等待此前排队的写入全部提交。
+        """
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def compact(self, timeout=None) -> bool:
+        """
+        立即执行一次压缩并等待完成。
+        """
+        done = threading.Event()
+        self._queue.put(("compact", done))
+        return done.wait(timeout)
+
+    def close(self):
+        """
+        提交剩余写入并停止后台线程。
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(("stop", None))
+        self._writer.join()
+
+    def session_count(self) -> int:
+        with self._lock:
+            pending = {session_id for session_id, entries in self._pending.items() if entries}
+        committed = {row[0] for row in self._connection().execute(
+            "SELECT DISTINCT m.session_id FROM messages m LEFT JOIN session_clears c ON m.session_id = c.session_id"
+            " WHERE m.created_at > COALESCE(c.cleared_at, 0)"
+        )}
+        return len(committed | pending)
+
+    def _run_writer(self):
+        last_compaction = time.monotonic()
+        while True:
+            timeout = max(0.0, last_compaction + self.compact_interval - time.monotonic())
+            try:
+                ops = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                ops = []
+
+            # 在 flush_interval 时间窗口内收集更多写入，合并为一个事务
+            deadline = time.monotonic() + self.flush_interval
+            while ops and ops[-1][0] == "add":
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    ops.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            adds = [op for op in ops if op[0] == "add"]
+            if adds:
+                self._commit(adds)
+
+            compact_requested = [op[1] for op in ops if op[0] == "compact"]
+            if compact_requested or time.monotonic() - last_compaction >= self.compact_interval:
+                self._compact()
+                last_compaction = time.monotonic()
+
+            for op in ops:
+                if op[0] in ("flush", "compact"):
+                    op[1].set()
+            if any(op[0] == "stop" for op in ops):
+                return
+
+    def _commit(self, adds):
+        """
+        在一个事务中写入一批消息，提交后从待写缓冲区中移除。
+        """
+        rows = [(session_id, created_at, json.dumps(data, ensure_ascii=False), uid)
+                for _, session_id, entries in adds for uid, created_at, data in entries]
+        try:
+            conn = self._connection()
+            conn.executemany("INSERT INTO messages (session_id, created_at, message, uid) VALUES (?, ?, ?, ?)", rows)
+            conn.commit()
+        except sqlite3.Error as e:
+            LOG.error(f"[会话存储] 批量写入失败，{len(rows)} 条消息仍保留在内存中: {e}")
+            return
+
+        committed = {}
+        for _, session_id, entries in adds:
+            committed.setdefault(session_id, set()).update(uid for uid, _, _ in entries)
+        with self._lock:
+            for session_id, uids in committed.items():
+                pending = self._pending.get(session_id)
+                if pending is None:
+                    continue
+                pending[:] = [entry for entry in pending if entry[0] not in uids]
+                if not pending:
+                    del self._pending[session_id]
+        self.flushed_batches += 1
+
+    def _compact(self):
+        """
+        删除已清空的消息、过期会话与超出条数上限的旧消息，并截断 WAL 文件。
+        """
+        conn = self._connection()
+        try:
+            conn.execute(
+                "DELETE FROM messages WHERE id IN ("
+                " SELECT m.id FROM messages m JOIN session_clears c ON m.session_id = c.session_id"
+                " WHERE m.created_at <= c.cleared_at)"
+            )
+            if self.ttl is not None:
+                conn.execute("DELETE FROM session_clears WHERE cleared_at < ?", (time.time() - self.ttl,))
+                conn.execute(
+                    "DELETE FROM messages WHERE session_id IN ("
+                    " SELECT session_id FROM messages GROUP BY session_id HAVING MAX(created_at) < ?)",
+                    (time.time() - self.ttl,),
+                )
+            if self.max_messages_per_session is not None:
+                conn.execute(
+                    "DELETE FROM messages WHERE id IN ("
+                    " SELECT id FROM (SELECT id, ROW_NUMBER() OVER ("
+                    "  PARTITION BY session_id ORDER BY id DESC) AS position FROM messages)"
+                    " WHERE position > ?)",
+                    (self.max_messages_per_session,),
+                )
+            conn.commit()
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            LOG.error(f"[会话存储] 压缩失败: {e}")
+            return
+        self.compactions += 1
+
+# 基于 SQLiteChatStore 的会话历史，读取时按 token 预算只保留最近的完整对话轮次
+class SQLiteChatMessageHistory(BaseChatMessageHistory):
+    """
+    持久化的聊天历史。完整消息保存在数据库中，发送给模型的 messages 不超过 max_tokens。
+    """
+    def __init__(self, session_id: str, store: SQLiteChatStore, max_tokens: int = 3000):
+        self.session_id = session_id
+        self.store = store
+        self.max_tokens = max_tokens
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        return trim_to_budget(self.store.get_messages(self.session_id), self.max_tokens)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.store.add_messages(self.session_id, messages)
+
+    def clear(self) -> None:
+        self.store.clear(self.session_id)
+
+class SQLiteHistoryManager:
+    """
+    与 ChatHistoryManager 接口一致的会话历史管理器，所有会话保存在共享的 SQLite 数据库中。
+    """
+    def __init__(self, store: Optional[SQLiteChatStore] = None, max_tokens_per_session: int = 3000):
+        self.store = store if store is not None else SQLiteChatStore()
+        self.max_tokens_per_session = max_tokens_per_session
+
+    def get_session_history(self, session_id: str) -> BaseChatMessageHistory:
+        return SQLiteChatMessageHistory(session_id, self.store, self.max_tokens_per_session)
+
+    def has_session(self, session_id: str) -> bool:
+        return self.store.has_session(session_id)
+
+    def stats(self):
+        """
+        返回存储的统计信息。
+        """
+        return {
+            "sessions": self.store.session_count(),
+            "flushed_batches": self.store.flushed_batches,
+            "compactions": self.store.compactions,
+        }
@@ -0,0 +1,157 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from logger import LOG
+from audio_utils import SAMPLE_RATE
+
+def to_mono_float32(sample_rate, data):
+    """
+    将麦克风片段转换为 SAMPLE_RATE 采样率的单声道 float32 数组。
+
+    参数:
+    - sample_rate: 片段的采样率
+    - data: 片段数据，整数 PCM 或浮点，形状为 (采样数,) 或 (采样数, 声道数)
+
+    返回:
+    - audio: 一维 float32 数组
+    """
+    audio = np.asarray(data)
+    if np.issubdtype(audio.dtype, np.integer):
+        audio = audio.astype(np.float32) / np.iinfo(audio.dtype).max
+    else:
+        audio = audio.astype(np.float32)
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1)
+
+    if sample_rate != SAMPLE_RATE and len(audio):
+        # 线性插值重采样，足以满足语音识别的需要
+        target_length = int(round(len(audio) * SAMPLE_RATE / sample_rate))
+        positions = np.linspace(0, len(audio) - 1, target_length)
+        audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+    return audio
+
+# 基于短时能量的语音活动检测（VAD），把连续的麦克风音频切分为语音段
+class VoiceActivitySegmenter:
+    """
+    以 frame_ms 为帧长计算均方根能量，超过 threshold 的帧视为语音。
+    语音之后出现连续 min_silence_s 秒的静音，或语音段长度达到 max_segment_s 秒时，产出一个语音段。
+    """
+    def __init__(self, threshold=0.01, frame_ms=30, min_silence_s=0.6, max_segment_s=30, min_speech_s=0.3):
+        self.threshold = threshold
+        self.frame_size = SAMPLE_RATE * frame_ms // 1000
+        self.min_silence_frames = int(min_silence_s * 1000 / frame_ms)
+        self.max_segment_frames = int(max_segment_s * 1000 / frame_ms)
+        self.min_speech_frames = int(min_speech_s * 1000 / frame_ms)
+        self._pending = np.zeros(0, dtype=np.float32)  # 不足一帧的剩余采样
+        self._frames = []  # 当前语音段的帧
+        self._speech_frames = 0  # 当前语音段中的语音帧数
+        self._silence_run = 0  # 当前连续静音帧数
+
+    def feed(self, audio):
+        """
+        输入 SAMPLE_RATE 采样率的单声道 float32 音频，返回本次完成的语音段列表。
+        """
+        audio = np.concatenate([self._pending, audio])
+        frame_count = len(audio) // self.frame_size
+        self._pending = audio[frame_count * self.frame_size:]
+
+        segments = []
+        for i in range(frame_count):
+            frame = audio[i * self.frame_size:(i + 1) * self.frame_size]
+            is_speech = np.sqrt(np.mean(frame ** 2)) >= self.threshold
+
+            if is_speech:
+                self._speech_frames += 1
+                self._silence_run = 0
+                self._frames.append(frame)
+            elif self._speech_frames:
+                self._silence_run += 1
+                self._frames.append(frame)
+            # 语音开始之前的静音直接丢弃
+
+            if self._speech_frames and (self._silence_run >= self.min_silence_frames
+                                        or len(self._frames) >= self.max_segment_frames):
+                segment = self._close_segment()
+                if segment is not None:
+                    segments.append(segment)
+        return segments
+
+    def flush(self):
+        """
+        结束输入，返回剩余的语音段（可能为空列表）。
+        """
+        if len(self._pending) and self._speech_frames:
+            self._frames.append(self._pending)
+        self._pending = np.zeros(0, dtype=np.float32)
+        segment = self._close_segment()
+        return [segment] if segment is not None else []
+
+    def _close_segment(self):
+        frames, speech_frames = self._frames, self._speech_frames
+        self._frames, self._speech_frames, self._silence_run = [], 0, 0
+        if speech_frames < self.min_speech_frames:
+            return None  # 过短的噪声不送入模型
+        return np.concatenate(frames)
+
+# 流式转录：边录音边按语音段转录，随时返回已完成部分的文本
+class StreamingTranscriber:
+    """
+    接收麦克风片段，用 VoiceActivitySegmenter 切分语音段，并在后台线程中逐段转录。
+
+    transcribe_segment 是一个函数，接收 SAMPLE_RATE 采样率的 float32 数组并返回识别文本。
+    后台只使用一个线程，保证各语音段按顺序转录，录音回调本身不会被模型推理阻塞。
+    """
+    def __init__(self, transcribe_segment, segmenter=None):
+        self.transcribe_segment = transcribe_segment
+        self.segmenter = segmenter or VoiceActivitySegmenter()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def feed(self, sample_rate, data):
+        """
+        输入一个麦克风片段，返回目前已转录完成的文本。
+        """
+        for segment in self.segmenter.feed(to_mono_float32(sample_rate, data)):
+            self._submit(segment)
+        return self.partial_text()
+
+    def _submit(self, segment):
+        LOG.debug(f"[流式识别] 提交语音段，时长 {len(segment) / SAMPLE_RATE:.2f}s")
+        with self._lock:
+            self._futures.append(self._executor.submit(self.transcribe_segment, segment))
+
+    def partial_text(self):
+        """
+        按顺序拼接已完成的语音段文本，遇到尚未完成的语音段即停止。
+        """
+        texts = []
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            if not future.done():
+                break
+            texts.append(self._result_text(future))
+        return "".join(texts).strip()
+
+    def finish(self):
+        """
+        录音结束：转录剩余语音并等待所有语音段完成，返回完整文本。
+        """
+        for segment in self.segmenter.flush():
+            self._submit(segment)
+        with self._lock:
+            futures = list(self._futures)
+        text = "".join(self._result_text(future) for future in futures).strip()
+        self._executor.shutdown(wait=False)
+        return text
+
+    @staticmethod
+    def _result_text(future):
+        try:
+            return future.result()
+        except Exception as e:
+            LOG.error(f"[流式识别] 语音段识别失败: {e}")
+            return ""
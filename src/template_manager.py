@@ -1,8 +1,66 @@
+import os
+import copy
+import threading
+
 from pptx import Presentation
+from logger import LOG
+
+# 模板池：每个模板只解析一次，常驻一份去除幻灯片的母版，每次渲染返回其深拷贝
+class TemplatePool:
+    """
+    PowerPoint 模板池。
+
+    以 (模板绝对路径, 修改时间) 为键缓存已解析并清空幻灯片的母版 Presentation，
+    acquire() 返回母版的深拷贝，避免每次生成演示文稿都重新解压、解析模板的 XML。
+    模板文件被修改后，修改时间变化会触发重新加载。
+    """
+    def __init__(self):
+        self._masters = {}  # 键为 (绝对路径, mtime)，值为母版 Presentation
+        self._lock = threading.Lock()  # 保护母版字典与深拷贝过程
+
+    def _load_master(self, template_path: str) -> Presentation:
+        """
+        解析模板文件，并彻底移除其中的幻灯片（包括幻灯片的关系），得到干净的母版。
+        """
+        prs = Presentation(template_path)
+        # 直接操作 XML，不触发 prs.slides 的惰性缓存：缓存的子元素在深拷贝后会与新文档脱节
+        xml_slides = prs.part._element.get_or_add_sldIdLst()
+        for sld_id in list(xml_slides):
+            xml_slides.remove(sld_id)
+            prs.part.drop_rel(sld_id.rId)  # 丢弃关系，避免克隆时携带无用的幻灯片部件
+        LOG.debug(f"模板 '{template_path}' 已解析并加入模板池。")
+        return prs
+
+    def acquire(self, template_path: str) -> Presentation:
+        """
+        获取指定模板的一个独立副本，可直接在其上添加幻灯片并保存。
+        """
+        abs_path = os.path.abspath(template_path)
+        key = (abs_path, os.path.getmtime(abs_path))
+
+        with self._lock:
+            master = self._masters.get(key)
+            if master is None:
+                # 清除同一路径下旧版本的母版，再加载新母版
+                for stale_key in [k for k in self._masters if k[0] == abs_path]:
+                    del self._masters[stale_key]
+                master = self._load_master(abs_path)
+                self._masters[key] = master
+            return copy.deepcopy(master)
+
+    def clear(self):
+        """
+        清空模板池。
+        """
+        with self._lock:
+            self._masters.clear()
+
+# 进程内共享的模板池
+template_pool = TemplatePool()
 
-# 加载 PowerPoint 模板
+# 加载 PowerPoint 模板（经由模板池，模板只解析一次）
 def load_template(template_path: str) -> Presentation:
-    prs = Presentation(template_path)
+    prs = template_pool.acquire(template_path)
     return prs
 
 # 获取布局映射，返回模板中的布局名称与其索引的字典
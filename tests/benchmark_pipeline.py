@@ -0,0 +1,174 @@
+"""
+解析、布局与渲染阶段的微基准测试。
+
+生成不同规模与特征的合成 markdown 演示文稿，分别计时 parse_input_text、LayoutManager.assign_layout、
+幻灯片渲染（generate_presentation 中除保存以外的部分）与 Presentation.save，并将结果保存为 JSON 基线，
+用于在不同提交之间比较性能回归。
+
+用法（在仓库根目录运行）:
+    python tests/benchmark_pipeline.py --save tests/benchmarks/baseline.json
+    python tests/benchmark_pipeline.py --compare tests/benchmarks/baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+from io import BytesIO
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from logger import LOG
+from input_parser import parse_input_text
+from layout_manager import LayoutManager
+from ppt_generator import open_presentation, render_slide
+from template_manager import load_template, get_layout_mapping
+
+TEMPLATE_PATH = "templates/SimpleTemplate.pptx"
+SAMPLE_IMAGES = ["images/performance_chart.png", "images/forecast.png"]
+SLIDE_COUNTS = [10, 100, 1000]
+STAGES = ["parse", "layout", "render", "save"]
+
+def _bullet_lines(kind, slide_idx):
+    """
+    根据演示文稿类型生成一张幻灯片的要点行。
+    """
+    if kind == "deep":
+        # 深层嵌套：0~5 级缩进来回往复
+        return [f"{'  ' * level}- 第 {slide_idx} 页 第 {level} 级要点" for level in list(range(6)) + list(range(4, -1, -1))]
+    if kind == "bold":
+        # 大量加粗片段
+        return [f"- " + " ".join(f"**重点{i}-{j}** 说明文字" for j in range(8)) for i in range(5)]
+    return [f"- 第 {slide_idx} 页要点 {i}：普通说明文字" for i in range(5)]
+
+def generate_synthetic_markdown(num_slides, kind="plain"):
+    """
+    生成合成的 ChatPPT markdown 文本。
+
+    参数:
+        num_slides (int): 除标题页外的幻灯片数量
+        kind (str): plain（普通要点）、deep（深层嵌套）、bold（大量加粗）或 images（每页带图片）
+    """
+    lines = [f"# 基准测试 {kind} {num_slides}", ""]
+    for slide_idx in range(num_slides):
+        lines.append(f"## 第 {slide_idx + 1} 页")
+        lines.extend(_bullet_lines("plain" if kind == "images" else kind, slide_idx))
+        if kind == "images":
+            image_path = SAMPLE_IMAGES[slide_idx % len(SAMPLE_IMAGES)]
+            lines.append(f"![配图]({image_path})")
+        lines.append("")
+    return "\n".join(lines)
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def benchmark_deck(markdown, layout_manager, repeat):
+    """
+    对一份 markdown 演示文稿分阶段计时，每个阶段重复 repeat 次，返回各阶段的最小值与中位数（秒）。
+    """
+    samples = {stage: [] for stage in STAGES}
+    for _ in range(repeat):
+        # 解析阶段
+        elapsed, (powerpoint_data, _) = _timed(parse_input_text, markdown, layout_manager)
+        samples["parse"].append(elapsed)
+
+        # 布局阶段：对所有幻灯片内容重新分配布局
+        contents = [slide.content for slide in powerpoint_data.slides]
+        elapsed, _ = _timed(lambda: [layout_manager.assign_layout(content) for content in contents])
+        samples["layout"].append(elapsed)
+
+        # 渲染阶段
+        def render():
+            prs = open_presentation(TEMPLATE_PATH)
+            prs.core_properties.title = powerpoint_data.title
+            for slide in powerpoint_data.slides:
+                render_slide(prs, slide)
+            return prs
+        elapsed, prs = _timed(render)
+        samples["render"].append(elapsed)
+
+        # 保存阶段（写入内存，排除磁盘抖动）
+        elapsed, _ = _timed(prs.save, BytesIO())
+        samples["save"].append(elapsed)
+
+    return {
+        stage: {"min": min(values), "median": statistics.median(values)}
+        for stage, values in samples.items()
+    }
+
+def run_benchmarks(slide_counts=SLIDE_COUNTS, kinds=("plain", "deep", "bold", "images"), repeat=3):
+    """
+    运行全部基准测试，返回可直接序列化为 JSON 的结果字典。
+    """
+    random.seed(0)  # 布局选择包含随机性，固定种子以便结果可比
+    layout_manager = LayoutManager(get_layout_mapping(load_template(TEMPLATE_PATH)))
+
+    results = {}
+    for kind in kinds:
+        for num_slides in slide_counts:
+            name = f"{kind}-{num_slides}"
+            markdown = generate_synthetic_markdown(num_slides, kind)
+            results[name] = benchmark_deck(markdown, layout_manager, repeat)
+            stages = ", ".join(f"{stage} {timing['median'] * 1000:.1f}ms" for stage, timing in results[name].items())
+            print(f"{name:>12}: {stages}")
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+def compare_with_baseline(current, baseline, threshold=1.2):
+    """
+    将当前结果与基线比较，返回所有中位数耗时超过基线 threshold 倍的 (名称, 阶段, 基线, 当前) 列表。
+    """
+    regressions = []
+    for name, stages in current["results"].items():
+        for stage, timing in stages.items():
+            base = baseline["results"].get(name, {}).get(stage)
+            if not base:
+                continue
+            ratio = timing["median"] / base["median"] if base["median"] else float("inf")
+            marker = "  <-- 回归" if ratio > threshold else ""
+            print(f"{name:>12} {stage:>6}: {base['median'] * 1000:9.1f}ms -> {timing['median'] * 1000:9.1f}ms ({ratio:5.2f}x){marker}")
+            if ratio > threshold:
+                regressions.append((name, stage, base["median"], timing["median"]))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='ChatPPT 解析、布局与渲染阶段的微基准测试。')
+    parser.add_argument('--repeat', type=int, default=3, help='每个阶段的重复次数（默认: 3）')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SLIDE_COUNTS, help='幻灯片数量（默认: 10 100 1000）')
+    parser.add_argument('--save', metavar='JSON', help='将结果保存为 JSON 基线')
+    parser.add_argument('--compare', metavar='JSON', help='与指定的 JSON 基线比较')
+    parser.add_argument('--threshold', type=float, default=1.2, help='判定为回归的耗时倍数（默认: 1.2）')
+    args = parser.parse_args()
+
+    # 基准测试期间只保留警告及以上的日志，避免日志输出主导计时
+    LOG.remove()
+    LOG.add(sys.stderr, level="WARNING")
+
+    current = run_benchmarks(args.sizes, repeat=args.repeat)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存到 {args.save}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(current, baseline, args.threshold)
+        if regressions:
+            print(f"发现 {len(regressions)} 项性能回归。")
+            sys.exit(1)
+        print("未发现性能回归。")
@@ -0,0 +1,59 @@
+import unittest
+import os
+import sys
+import threading
+
+import numpy as np
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from audio_utils import SAMPLE_RATE
+from asr_scheduler import AsrBatchScheduler
+
+class TestAsrBatchScheduler(unittest.TestCase):
+    """
+    测试 AsrBatchScheduler 合并并发请求的片段，并把结果路由回对应的调用方。
+    """
+
+    def setUp(self):
+        self.batches = []
+        self.lengths = []
+
+        def fake_batch_fn(audios, task):
+            self.batches.append((len(audios), task))
+            self.lengths.extend(len(audio) for audio in audios)
+            # 每段音频以其首个采样值作为“识别结果”
+            return [f"{task}:{int(audio[0])};" for audio in audios]
+
+        self.scheduler = AsrBatchScheduler(fake_batch_fn, max_batch_size=8, max_wait=0.2)
+
+    def test_concurrent_requests_share_one_batch(self):
+        results = {}
+
+        def worker(value):
+            audio = np.full(SAMPLE_RATE, value, dtype=np.float32)
+            results[value] = self.scheduler.transcribe(audio)
+
+        threads = [threading.Thread(target=worker, args=(value,)) for value in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {value: f"transcribe:{value};" for value in range(4)})
+        self.assertEqual(self.batches, [(4, "transcribe")])
+
+    def test_long_audio_kept_whole_and_tasks_grouped(self):
+        # 长音频整段交给 batch_fn，由识别管道按带重叠的窗口切分
+        long_audio = np.full(95 * SAMPLE_RATE, 1, dtype=np.float32)
+        transcribe_future = self.scheduler.submit(long_audio, "transcribe")
+        translate_future = self.scheduler.submit(np.full(SAMPLE_RATE, 3, dtype=np.float32), "translate")
+
+        self.assertEqual(transcribe_future.result(), "transcribe:1;")
+        self.assertEqual(translate_future.result(), "translate:3;")
+        self.assertEqual(sorted(self.batches), [(1, "transcribe"), (1, "translate")])
+        self.assertEqual(sorted(self.lengths), [SAMPLE_RATE, 95 * SAMPLE_RATE])
+
+if __name__ == "__main__":
+    unittest.main()
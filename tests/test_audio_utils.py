@@ -0,0 +1,108 @@
+import unittest
+import os
+import sys
+import wave
+import struct
+import tempfile
+from unittest import mock
+
+import numpy as np
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import audio_utils
+from audio_utils import load_audio, pcm_digest, SAMPLE_RATE
+
+def write_wav(path, samples, sample_rate, channels=1):
+    with wave.open(path, "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(np.asarray(samples, dtype="<i2").tobytes())
+
+class TestLoadAudio(unittest.TestCase):
+    """
+    测试 load_audio 在内存中解码音频，以及 16 kHz 单声道 WAV 跳过 ffmpeg 转换。
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_16k_mono_wav_skips_ffmpeg(self):
+        path = os.path.join(self.tmp_dir.name, "speech.wav")
+        write_wav(path, [0, 16384, -32768, 32767], SAMPLE_RATE)
+
+        with mock.patch.object(audio_utils.subprocess, "run") as run:
+            audio = load_audio(path)
+
+        run.assert_not_called()
+        self.assertEqual(audio.dtype, np.float32)
+        np.testing.assert_allclose(audio, [0.0, 0.5, -1.0, 32767 / 32768], rtol=1e-6)
+
+    def test_streamed_wav_with_placeholder_data_size(self):
+        path = os.path.join(self.tmp_dir.name, "streamed.wav")
+        write_wav(path, [0, 16384, -32768], SAMPLE_RATE)
+        # 流式写入的 WAV 在录制结束前不知道数据长度，数据块大小为 0xFFFFFFFF
+        with open(path, "r+b") as f:
+            content = f.read()
+            f.seek(content.index(b"data") + 4)
+            f.write(struct.pack("<I", 0xFFFFFFFF))
+
+        with mock.patch.object(audio_utils.subprocess, "run") as run:
+            audio = load_audio(path)
+
+        run.assert_not_called()
+        np.testing.assert_allclose(audio, [0.0, 0.5, -1.0], rtol=1e-6)
+
+    def test_corrupt_header_falls_back_to_ffmpeg(self):
+        path = os.path.join(self.tmp_dir.name, "broken.wav")
+        # fmt 块只有 4 个字节，无法解析出声道数与采样率
+        with open(path, "wb") as f:
+            f.write(b"RIFF" + struct.pack("<I", 24) + b"WAVE" + b"fmt " + struct.pack("<I", 4) + b"\x01\x00\x01\x00")
+        decoded = np.array([0.5], dtype=np.float32)
+
+        with mock.patch.object(audio_utils.subprocess, "run") as run:
+            run.return_value = mock.Mock(stdout=decoded.tobytes())
+            audio = load_audio(path)
+
+        run.assert_called_once()
+        np.testing.assert_array_equal(audio, decoded)
+
+    def test_undecodable_flac_falls_back_to_ffmpeg(self):
+        soundfile = mock.Mock()
+        soundfile.info.side_effect = RuntimeError("Error opening 'broken.flac': Format not recognised.")
+        decoded = np.array([0.5], dtype=np.float32)
+
+        with mock.patch.dict(sys.modules, {"soundfile": soundfile}), \
+                mock.patch.object(audio_utils.subprocess, "run") as run:
+            run.return_value = mock.Mock(stdout=decoded.tobytes())
+            audio = load_audio(os.path.join(self.tmp_dir.name, "broken.flac"))
+
+        run.assert_called_once()
+        np.testing.assert_array_equal(audio, decoded)
+
+    def test_other_formats_decoded_from_ffmpeg_pipe(self):
+        path = os.path.join(self.tmp_dir.name, "speech.wav")
+        write_wav(path, [0] * 8, 44100, channels=2)
+        decoded = np.array([0.25, -0.25], dtype=np.float32)
+
+        with mock.patch.object(audio_utils.subprocess, "run") as run:
+            run.return_value = mock.Mock(stdout=decoded.tobytes())
+            audio = load_audio(path)
+
+        command = run.call_args[0][0]
+        self.assertEqual(command[-1], "-")  # 输出到标准输出管道，而不是临时文件
+        self.assertIn(str(SAMPLE_RATE), command)
+        np.testing.assert_array_equal(audio, decoded)
+
+    def test_pcm_digest_depends_on_decoded_samples(self):
+        audio = np.linspace(-1, 1, SAMPLE_RATE, dtype=np.float32)
+        self.assertEqual(pcm_digest(audio), pcm_digest(audio.astype(np.float64)))
+        self.assertNotEqual(pcm_digest(audio), pcm_digest(audio[::-1]))
+
+if __name__ == "__main__":
+    unittest.main()
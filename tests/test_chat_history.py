@@ -0,0 +1,142 @@
+import unittest
+import os
+import sys
+import time
+import threading
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import chat_history
+from chat_history import BoundedChatMessageHistory, ChatHistoryManager, count_message_tokens, set_history_manager
+from logger import LOG
+
+def add_turn(history, index, length=100):
+    history.add_messages([HumanMessage(content=f"问题{index}" + "问" * length),
+                          AIMessage(content=f"回答{index}" + "答" * length)])
+
+class TestBoundedChatMessageHistory(unittest.TestCase):
+    """
+    测试按 token 预算整轮丢弃最早的对话。
+    """
+
+    def test_drops_oldest_turns_within_budget(self):
+        history = BoundedChatMessageHistory(max_tokens=500)
+        for i in range(10):
+            add_turn(history, i)
+
+        self.assertLessEqual(history.token_count, 500)
+        self.assertIsInstance(history.messages[0], HumanMessage)
+        self.assertTrue(history.messages[-1].content.startswith("回答9"))
+        self.assertEqual(len(history.messages) + history.dropped_messages, 20)
+        self.assertEqual(history.token_count, sum(count_message_tokens(m) for m in history.messages))
+
+    def test_latest_turn_is_always_kept(self):
+        history = BoundedChatMessageHistory(max_tokens=10)
+        add_turn(history, 0)
+        self.assertEqual(len(history.messages), 2)
+
+    def test_summarizer_receives_dropped_turns(self):
+        def summarizer(previous, dropped):
+            return previous + "".join(m.content[:3] for m in dropped if isinstance(m, HumanMessage))
+
+        history = BoundedChatMessageHistory(max_tokens=300, summarizer=summarizer)
+        for i in range(3):
+            add_turn(history, i)
+
+        first = history.messages[0]
+        self.assertIsInstance(first, SystemMessage)
+        self.assertIn("问题0", first.content)
+
+    def test_clear_discards_summary_in_progress(self):
+        started, release = threading.Event(), threading.Event()
+
+        def summarizer(previous, dropped):
+            started.set()
+            release.wait(5)
+            return "过期的摘要"
+
+        history = BoundedChatMessageHistory(max_tokens=300, summarizer=summarizer)
+        add_turn(history, 0)
+        thread = threading.Thread(target=add_turn, args=(history, 1))
+        thread.start()
+        started.wait(5)
+
+        # 摘要生成期间读取不被阻塞，清空后生成完成的摘要被丢弃
+        self.assertEqual(len(history.messages), 2)
+        history.clear()
+        release.set()
+        thread.join()
+        self.assertEqual(history.messages, [])
+
+class TestChatHistoryManager(unittest.TestCase):
+    """
+    测试空闲会话淘汰、全局 token 上限与统计信息。
+    """
+
+    def test_same_session_returns_same_history(self):
+        manager = ChatHistoryManager()
+        self.assertIs(manager.get_session_history("a"), manager.get_session_history("a"))
+        self.assertIsNot(manager.get_session_history("a"), manager.get_session_history("b"))
+
+    def test_idle_sessions_expire(self):
+        manager = ChatHistoryManager(ttl=0.05)
+        add_turn(manager.get_session_history("idle"), 0)
+        time.sleep(0.1)
+        manager.get_session_history("active")
+
+        stats = manager.stats()
+        self.assertEqual(list(stats["per_session"]), ["active"])
+        self.assertEqual(stats["expired_sessions"], 1)
+
+    def test_global_cap_evicts_least_recently_used(self):
+        manager = ChatHistoryManager(max_tokens_per_session=1000, max_total_tokens=500, ttl=None)
+        for session_id in ("a", "b", "c"):
+            add_turn(manager.get_session_history(session_id), 0)
+        manager.get_session_history("a")
+
+        stats = manager.stats()
+        self.assertLessEqual(stats["total_tokens"], 500)
+        self.assertIn("a", stats["per_session"])
+        self.assertNotIn("b", stats["per_session"])
+        self.assertGreater(stats["evicted_sessions"], 0)
+        self.assertEqual(stats["per_session"]["a"]["messages"], 2)
+
+    def test_summary_generated_in_background(self):
+        release = threading.Event()
+
+        def summarizer(previous, dropped):
+            release.wait(5)
+            return "早期对话的摘要"
+
+        manager = ChatHistoryManager(max_tokens_per_session=300, summarizer=summarizer)
+        history = manager.get_session_history("a")
+        for i in range(3):
+            add_turn(history, i)  # 摘要生成期间 add_messages 不被阻塞
+
+        self.assertNotIsInstance(history.messages[0], SystemMessage)
+        release.set()
+        history.pending_summary.result(timeout=5)
+        self.assertIn("早期对话的摘要", history.messages[0].content)
+
+    def test_log_history_stats(self):
+        original = chat_history.history_manager
+        manager = ChatHistoryManager()
+        add_turn(manager.get_session_history("a"), 0)
+        set_history_manager(manager)
+        records = []
+        sink = LOG.add(records.append, level="INFO", format="{message}")
+        try:
+            chat_history.log_history_stats()
+        finally:
+            LOG.remove(sink)
+            set_history_manager(original)
+
+        self.assertEqual(len(records), 1)
+        self.assertIn("'sessions': 1", records[0])
+        self.assertNotIn("per_session", records[0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import unittest
+import os
+import sys
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables.history import RunnableWithMessageHistory
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import chat_history
+from chat_history import ChatHistoryManager, set_history_manager
+from chatbot import ChatBot
+
+class FakeChatBot(ChatBot):
+    """
+    用本地函数代替 ChatOpenAI 的 ChatBot，记录每次请求的提示消息数。
+    """
+    def create_chatbot(self):
+        self.prompt_sizes = []
+
+        async def fake_model(prompt_value):
+            messages = prompt_value.to_messages()
+            self.prompt_sizes.append(len(messages))
+            await asyncio.sleep(0.01)
+            return AIMessage(content=f"回复: {messages[-1].content}")
+
+        system_prompt = ChatPromptTemplate.from_messages([
+            ("system", self.prompt),
+            MessagesPlaceholder(variable_name="messages"),
+        ])
+        self.chatbot = system_prompt | RunnableLambda(fake_model)
+        self.chatbot_with_history = RunnableWithMessageHistory(self.chatbot, chat_history.get_session_history)
+
+class TestChatBotSessions(unittest.TestCase):
+    """
+    测试不同会话的历史相互独立，且同一会话的并发请求按轮次依次追加。
+    """
+
+    def setUp(self):
+        self.original_manager = chat_history.history_manager
+        self.manager = ChatHistoryManager()
+        set_history_manager(self.manager)
+        self.chatbot = FakeChatBot()
+
+    def tearDown(self):
+        set_history_manager(self.original_manager)
+
+    def test_sessions_are_isolated(self):
+        async def run():
+            await asyncio.gather(*(
+                self.chatbot.achat_with_history(f"用户{user}第{turn}轮", session_id=f"user-{user}")
+                for user in range(5) for turn in range(3)
+            ))
+        asyncio.run(run())
+
+        stats = self.manager.stats()
+        self.assertEqual(stats["sessions"], 5)
+        for user in range(5):
+            history = self.manager.get_session_history(f"user-{user}").messages
+            self.assertEqual(len(history), 6)
+            # 用户消息与回复交替出现，且都属于该用户
+            for human, ai in zip(history[::2], history[1::2]):
+                self.assertIn(f"用户{user}", human.content)
+                self.assertEqual(ai.content, f"回复: {human.content}")
+
+        # 每次请求的提示只包含系统提示与本会话之前的消息：最多 1 + 2 * 2 + 1 条
+        self.assertLessEqual(max(self.chatbot.prompt_sizes), 6)
+
+    def test_clear_session(self):
+        asyncio.run(self.chatbot.achat_with_history("你好", session_id="closing"))
+        self.chatbot.clear_session("closing")
+        self.assertEqual(self.manager.get_session_history("closing").messages, [])
+
+    def test_async_request_waits_for_sync_lock(self):
+        async def run():
+            # 模拟同一会话正在执行的同步请求
+            lock = self.chatbot._session_lock("shared")
+            lock.acquire()
+            task = asyncio.create_task(self.chatbot.achat_with_history("你好", session_id="shared"))
+            await asyncio.sleep(0.05)
+            waiting = not task.done()
+            lock.release()
+            await task
+            return waiting
+
+        self.assertTrue(asyncio.run(run()))
+        self.assertEqual(len(self.manager.get_session_history("shared").messages), 2)
+
+    def test_clear_unknown_session_does_not_create_it(self):
+        self.chatbot.clear_session("never-used")
+        self.assertFalse(self.manager.has_session("never-used"))
+        self.assertEqual(self.manager.stats()["sessions"], 0)
+
+class StreamingFakeChatBot(ChatBot):
+    """
+    使用按空格逐段输出的假模型的 ChatBot。
+    """
+    def create_chatbot(self):
+        replies = iter(["第一张 幻灯片 的 内容", "第二次 回复"] * 2)
+        system_prompt = ChatPromptTemplate.from_messages([
+            ("system", self.prompt),
+            MessagesPlaceholder(variable_name="messages"),
+        ])
+        self.chatbot = system_prompt | GenericFakeChatModel(messages=replies)
+        self.chatbot_with_history = RunnableWithMessageHistory(self.chatbot, chat_history.get_session_history)
+
+class TestChatBotStreaming(unittest.TestCase):
+    """
+    测试流式接口逐段产出回复，并在结束后把完整回复写入历史。
+    """
+
+    def setUp(self):
+        self.original_manager = chat_history.history_manager
+        self.manager = ChatHistoryManager()
+        set_history_manager(self.manager)
+        self.chatbot = StreamingFakeChatBot()
+
+    def tearDown(self):
+        set_history_manager(self.original_manager)
+
+    def test_stream_records_full_reply(self):
+        chunks = list(self.chatbot.stream_with_history("生成大纲", session_id="sync"))
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), "第一张 幻灯片 的 内容")
+        messages = self.manager.get_session_history("sync").messages
+        self.assertEqual([m.content for m in messages], ["生成大纲", "第一张 幻灯片 的 内容"])
+
+    def test_astream_records_full_reply(self):
+        async def run():
+            first = [chunk async for chunk in self.chatbot.astream_with_history("第一轮", session_id="async")]
+            second = [chunk async for chunk in self.chatbot.astream_with_history("第二轮", session_id="async")]
+            return first, second
+
+        first, second = asyncio.run(run())
+        self.assertEqual("".join(first), "第一张 幻灯片 的 内容")
+        self.assertEqual("".join(second), "第二次 回复")
+        messages = self.manager.get_session_history("async").messages
+        self.assertEqual([m.content for m in messages], ["第一轮", "第一张 幻灯片 的 内容", "第二轮", "第二次 回复"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")  # 仅用于构造模型客户端，测试中不会调用 LLM
+
+import content_assistant
+import content_formatter
+from content_assistant import ContentAssistant
+from content_formatter import ContentFormatter
+from llm_cache import LLMResponseCache
+
+PROMPTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../prompts'))
+
+class FakeChain:
+    """
+    模拟 LangChain 链：在输入前加上前缀作为回复，并记录每次 batch 的大小。
+    """
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.calls = 0
+        self.batches = []
+
+    def invoke(self, inputs):
+        self.calls += 1
+        return SimpleNamespace(content=f"{self.prefix}{inputs['input']}")
+
+    def batch(self, inputs_list, config=None):
+        self.batches.append(len(inputs_list))
+        return [self.invoke(inputs) for inputs in inputs_list]
+
+def long_document(sections=6):
+    body = "".join(f"## 第{i}章\n\n" + "内容" * 300 + "\n\n" for i in range(sections))
+    return "# 长文档\n\n" + body
+
+class TestChunkedFormatAndAdjust(unittest.TestCase):
+    """
+    测试长文档逐块格式化、逐块调整后再拼接。
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.original_caches = content_formatter.llm_cache, content_assistant.llm_cache
+        content_formatter.llm_cache = content_assistant.llm_cache = LLMResponseCache(self.tmp_dir.name)
+        self.formatter = ContentFormatter(os.path.join(PROMPTS_DIR, "content_formatter.txt"), max_chunk_tokens=1000)
+        self.assistant = ContentAssistant(os.path.join(PROMPTS_DIR, "content_assistant.txt"))
+        self.formatter.formatter = FakeChain("")
+        self.assistant.assistant = FakeChain("")
+
+    def tearDown(self):
+        content_formatter.llm_cache, content_assistant.llm_cache = self.original_caches
+        self.tmp_dir.cleanup()
+
+    def test_short_document_uses_single_calls(self):
+        title, chunks = self.formatter.format_chunks("# 短文档\n\n## 章节\n内容\n")
+        self.assertIsNone(title)
+        self.assertEqual(len(chunks), 1)
+
+        content = self.assistant.adjust_chunks(chunks, title)
+        self.assertEqual(content, "# 短文档\n\n## 章节\n内容\n")
+        self.assertEqual((self.formatter.formatter.calls, self.assistant.assistant.calls), (1, 1))
+        self.assertEqual(self.assistant.assistant.batches, [])
+
+    def test_long_document_adjusted_per_chunk(self):
+        title, chunks = self.formatter.format_chunks(long_document())
+        self.assertEqual(title, "长文档")
+        self.assertGreater(len(chunks), 1)
+
+        content = self.assistant.adjust_chunks(chunks, title)
+        # 每块单独调整，拼接后只有一个主标题，所有章节按原顺序保留
+        self.assertEqual(self.assistant.assistant.batches, [len(chunks)])
+        self.assertEqual(content.count("# 长文档"), 1)
+        positions = [content.index(f"## 第{i}章") for i in range(6)]
+        self.assertEqual(positions, sorted(positions))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")  # 仅用于构造模型客户端，测试中不会调用 LLM
+
+import deck_builder
+from deck_builder import DeckBuilder
+from llm_cache import LLMResponseCache
+
+RAW_CONTENT = """# 多模态大模型概述
+
+## 模型架构
+
+![图片1](images/overview/1.png)
+
+![图片2](images/overview/2.png)
+"""
+
+VALID_DECK = """```markdown
+# 多模态大模型概述
+
+## 模型架构
+- 典型架构
+  - 特征提取与模态融合
+![图片1](images/overview/1.png)
+
+## TransFormer 架构
+![图片2](images/overview/2.png)
+```"""
+
+class FakeChain:
+    """
+    模拟 LangChain 链，返回预设的回复。
+    """
+    def __init__(self, content, finish_reason="stop"):
+        self.content = content
+        self.finish_reason = finish_reason
+        self.calls = 0
+
+    def invoke(self, inputs):
+        self.calls += 1
+        return SimpleNamespace(content=self.content, response_metadata={"finish_reason": self.finish_reason})
+
+class TestDeckBuilder(unittest.TestCase):
+    """
+    测试融合模式的输出校验、缓存与回退。
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.original_cache = deck_builder.llm_cache
+        deck_builder.llm_cache = LLMResponseCache(self.tmp_dir.name)
+        self.builder = DeckBuilder()
+        self.fallback_inputs = []
+
+    def tearDown(self):
+        deck_builder.llm_cache = self.original_cache
+        self.tmp_dir.cleanup()
+
+    def fallback(self, raw_content):
+        self.fallback_inputs.append(raw_content)
+        return "两步流程的结果"
+
+    def test_valid_output_is_returned_and_cached(self):
+        self.builder.builder = FakeChain(VALID_DECK)
+
+        content = self.builder.build([RAW_CONTENT], fallback=self.fallback)
+        self.assertTrue(content.startswith("# 多模态大模型概述"))
+        self.assertNotIn("```", content)
+        self.assertEqual(self.builder.build(RAW_CONTENT, fallback=self.fallback), content)
+        self.assertEqual(self.builder.builder.calls, 1)
+        self.assertEqual(self.fallback_inputs, [])
+
+    def test_invalid_output_falls_back(self):
+        # 一张幻灯片包含两张图片，且引用了原文中不存在的图片
+        invalid = "# 标题\n\n## 架构\n![图片1](images/overview/1.png)\n![图片3](images/overview/3.png)\n"
+        self.builder.builder = FakeChain(invalid)
+
+        self.assertEqual(self.builder.build(RAW_CONTENT, fallback=self.fallback), "两步流程的结果")
+        self.assertEqual(self.fallback_inputs, [RAW_CONTENT])
+        # 缓存的是回退结果而不是未通过校验的输出，同一文档不会再次调用融合模式
+        self.assertEqual(self.builder.build(RAW_CONTENT, fallback=self.fallback), "两步流程的结果")
+        self.assertEqual((self.builder.builder.calls, len(self.fallback_inputs)), (1, 1))
+
+    def test_long_input_skips_fused_call(self):
+        self.builder.builder = FakeChain(VALID_DECK)
+        self.builder.max_input_tokens = 10
+
+        self.assertEqual(self.builder.build(RAW_CONTENT, fallback=self.fallback), "两步流程的结果")
+        self.assertEqual(self.builder.builder.calls, 0)
+        self.assertEqual(self.fallback_inputs, [RAW_CONTENT])
+
+    def test_truncated_output_without_fallback_raises(self):
+        self.builder.builder = FakeChain(VALID_DECK, finish_reason="length")
+        with self.assertRaises(ValueError):
+            self.builder.build(RAW_CONTENT)
+
+if __name__ == "__main__":
+    unittest.main()
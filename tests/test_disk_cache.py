@@ -0,0 +1,117 @@
+import unittest
+import os
+import sys
+import time
+import tempfile
+from unittest import mock
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from disk_cache import DiskCache, ORPHAN_GRACE_SECONDS
+
+class TestDiskCache(unittest.TestCase):
+    """
+    测试 DiskCache 的元数据、TTL 过期与持久化。
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_set_and_get_with_meta(self):
+        cache = DiskCache(self.tmp_dir.name)
+        cache.set("image:http://example.com/a.png", b"\x89PNG", width=640, height=480)
+
+        data, meta = DiskCache(self.tmp_dir.name).get_with_meta("image:http://example.com/a.png")
+        self.assertEqual(data, b"\x89PNG")
+        self.assertEqual((meta["width"], meta["height"]), (640, 480))
+
+    def test_expired_entries_are_removed(self):
+        cache = DiskCache(self.tmp_dir.name, ttl=60)
+        cache.set("search:query", b"[]")
+        self.assertEqual(cache.get("search:query"), b"[]")
+
+        # 模拟时间流逝超过 TTL
+        with mock.patch("disk_cache.time.time", return_value=cache.get_with_meta("search:query")[1]["created_at"] + 61):
+            self.assertIsNone(cache.get("search:query"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_entries_written_by_other_process_are_visible(self):
+        # 两个实例模拟共享缓存目录的两个进程
+        first = DiskCache(self.tmp_dir.name)
+        second = DiskCache(self.tmp_dir.name)
+        first.set("search:query", b"[1, 2]")
+
+        self.assertEqual(second.get("search:query"), b"[1, 2]")
+        self.assertEqual(second.stats()["hits"], 1)
+
+    def test_quota_enforced_across_processes(self):
+        # rescan_interval=0：每次写入都按目录的实际大小执行配额
+        first = DiskCache(self.tmp_dir.name, max_bytes=1000, rescan_interval=0)
+        second = DiskCache(self.tmp_dir.name, max_bytes=1000, rescan_interval=0)
+        for i in range(4):
+            first.set(f"first:{i}", b"x" * 200)
+            second.set(f"second:{i}", b"y" * 200)
+
+        data_bytes = sum(os.path.getsize(os.path.join(self.tmp_dir.name, name))
+                         for name in os.listdir(self.tmp_dir.name) if name.endswith(".bin"))
+        self.assertLessEqual(data_bytes, 1000)
+        self.assertIsNotNone(second.get("second:3"))
+
+    def test_full_cache_not_rescanned_on_every_set(self):
+        cache = DiskCache(self.tmp_dir.name, max_bytes=1000, rescan_interval=60)
+        with mock.patch.object(cache, "_scan", wraps=cache._scan) as scan:
+            for i in range(20):
+                cache.set(f"key:{i}", b"x" * 200)
+        # 超出配额时按本进程的索引淘汰，不在每次写入时扫描目录
+        self.assertEqual(scan.call_count, 0)
+        self.assertLessEqual(cache.stats()["bytes"], 1000)
+        self.assertIsNotNone(cache.get("key:19"))
+
+    def test_file_io_does_not_hold_lock(self):
+        cache = DiskCache(self.tmp_dir.name)
+        cache.set("key", b"value")
+        lock_held = []
+        original_open = open
+
+        def checking_open(*args, **kwargs):
+            lock_held.append(cache._lock.locked())
+            return original_open(*args, **kwargs)
+
+        with mock.patch("builtins.open", checking_open):
+            cache.set("other", b"data")
+            self.assertEqual(cache.get("key"), b"value")
+        self.assertTrue(lock_held)
+        self.assertFalse(any(lock_held))
+
+    def test_metadata_counts_toward_quota(self):
+        # 探测结果只有元数据、没有数据字节，同样受配额限制
+        cache = DiskCache(self.tmp_dir.name, max_bytes=2000)
+        for i in range(100):
+            cache.set(f"probe:http://example.com/{i}.png", b"", width=640, height=480)
+
+        self.assertLessEqual(cache.stats()["bytes"], 2000)
+        self.assertGreater(cache.evictions, 0)
+        total = sum(os.path.getsize(os.path.join(self.tmp_dir.name, name)) for name in os.listdir(self.tmp_dir.name))
+        self.assertLessEqual(total, 2000)
+
+    def test_recent_orphan_metadata_is_kept(self):
+        # 其他进程写入中的条目：元数据已存在、数据文件尚未出现（或相反）
+        fresh = os.path.join(self.tmp_dir.name, "fresh.json")
+        stale = os.path.join(self.tmp_dir.name, "stale.json")
+        for path in (fresh, stale):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write('{"created_at": 0}')
+        old = time.time() - ORPHAN_GRACE_SECONDS - 1
+        os.utime(stale, (old, old))
+
+        DiskCache(self.tmp_dir.name)
+        self.assertTrue(os.path.exists(fresh))
+        self.assertFalse(os.path.exists(stale))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,19 @@
 import unittest
 import os
 import sys
+import types
+import shutil
+import tempfile
+from io import StringIO
+
+from docx import Document
+from PIL import Image
 
 # 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
-from docx_parser import generate_markdown_from_docx
+from docx_parser import generate_markdown_from_docx, iter_markdown_blocks, write_markdown_from_docx
+from docx_parser import _ImageExtractor, _paragraph_blocks, _resolve_pending_images
 
 class TestGenerateMarkdownFromDocx(unittest.TestCase):
     """
@@ -70,6 +78,19 @@ TransFormer 架构图：
         # 比较生成的 Markdown 内容与预期内容
         self.assertEqual(self.generated_markdown.strip(), expected_markdown.strip(), "生成的 Markdown 内容与预期不匹配")
 
+    def test_streaming_emitter_matches_full_document(self):
+        """
+        测试逐块产出与写入文件的结果与完整字符串一致。
+        """
+        blocks = iter_markdown_blocks(self.test_docx_filename)
+        self.assertIsInstance(blocks, types.GeneratorType)
+        self.assertEqual(''.join(blocks), self.generated_markdown)
+
+        output = StringIO()
+        written = write_markdown_from_docx(self.test_docx_filename, output)
+        self.assertEqual(output.getvalue(), self.generated_markdown)
+        self.assertEqual(written, len(self.generated_markdown))
+
     def tearDown(self):
         """
         在每个测试方法执行后运行。用于清理测试产生的文件和目录。
@@ -84,5 +105,116 @@ TransFormer 架构图：
                     os.unlink(file_path)  # 删除文件
             os.rmdir(images_dir)  # 删除目录
 
+class TestStreamingDocxReader(unittest.TestCase):
+    """
+    测试基于 iterparse 的流式解析与 python-docx 解析的输出一致。
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        image_path = os.path.join(self.temp_dir, 'chart.png')
+        Image.new('RGB', (40, 30), 'green').save(image_path)
+
+        document = Document()
+        document.add_heading('流式解析', level=0)
+        document.add_heading('第一章', level=1)
+        paragraph = document.add_paragraph('第一行')
+        paragraph.add_run().add_break()
+        paragraph.add_run('第二行\t结尾')
+        document.add_paragraph('')
+        document.add_paragraph('要点一', style='List Bullet')
+        document.add_paragraph('要点二', style='List Bullet 2')
+        document.add_paragraph('步骤一', style='List Number')
+        table = document.add_table(rows=1, cols=1)
+        table.cell(0, 0).text = '表格中的段落不输出'
+        document.add_picture(image_path)
+        document.add_heading('第二节', level=2)
+        document.add_paragraph('结束。')
+        self.docx_filename = os.path.join(self.temp_dir, 'streaming_reader.docx')
+        document.save(self.docx_filename)
+        self.images_dir = 'images/streaming_reader'
+
+    def test_streaming_matches_document_model(self):
+        streaming = ''.join(iter_markdown_blocks(self.docx_filename, streaming=True))
+        document_model = ''.join(iter_markdown_blocks(self.docx_filename, streaming=False))
+
+        self.assertEqual(streaming, document_model)
+        self.assertIn('# 流式解析\n\n## 第一章\n\n第一行\n第二行\t结尾\n\n', streaming)
+        self.assertIn('- 要点一\n  - 要点二\n- 步骤一\n', streaming)
+        self.assertNotIn('表格中的段落不输出', streaming)
+        self.assertIn(f'![图片1]({self.images_dir}/1.png)', streaming)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        shutil.rmtree(self.images_dir, ignore_errors=True)
+
+class TestDocxImageExtraction(unittest.TestCase):
+    """
+    测试 docx 图像提取：重复引用的图像只保存一次，PNG/JPEG 原样写出，其他格式重新编码为 PNG。
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        png_path = os.path.join(self.temp_dir, 'chart.png')
+        tiff_path = os.path.join(self.temp_dir, 'scan.tiff')
+        Image.new('RGB', (40, 30), 'red').save(png_path)
+        Image.new('RGB', (40, 30), 'blue').save(tiff_path)
+        with open(png_path, 'rb') as f:
+            self.png_bytes = f.read()
+
+        document = Document()
+        document.add_heading('图像测试', level=1)
+        document.add_picture(png_path)
+        document.add_picture(tiff_path)
+        document.add_picture(png_path)  # 重复引用同一图像
+        self.docx_filename = os.path.join(self.temp_dir, 'image_dedupe.docx')
+        document.save(self.docx_filename)
+        self.images_dir = 'images/image_dedupe'
+
+    def test_dedupe_and_passthrough(self):
+        markdown = generate_markdown_from_docx(self.docx_filename)
+
+        self.assertEqual(sorted(os.listdir(self.images_dir)), ['1.png', '2.png'])
+        self.assertEqual(markdown.count(f'![图片1]({self.images_dir}/1.png)'), 2)
+        self.assertEqual(markdown.count(f'![图片2]({self.images_dir}/2.png)'), 1)
+
+        # PNG 原样写出，TIFF 重新编码为 PNG
+        with open(os.path.join(self.images_dir, '1.png'), 'rb') as f:
+            self.assertEqual(f.read(), self.png_bytes)
+        with Image.open(os.path.join(self.images_dir, '2.png')) as image:
+            self.assertEqual(image.format, 'PNG')
+
+    def test_failed_reencode_drops_link(self):
+        images_dir = os.path.join(self.temp_dir, 'images')
+        os.makedirs(images_dir)
+        with open(os.path.join(self.temp_dir, 'scan.tiff'), 'rb') as f:
+            tiff_bytes = f.read()
+
+        def part(name, blob):
+            return types.SimpleNamespace(partname=name, blob=blob, content_type='image/tiff')
+
+        # inline_bytes=0：所有图像都提交到本文档的进程池，链接在编码完成后按原顺序输出
+        extractor = _ImageExtractor(images_dir, inline_bytes=0)
+        images = [extractor.save(part('/word/media/broken.tiff', b'not an image')),
+                  extractor.save(part('/word/media/scan.tiff', tiff_bytes))]
+        blocks = list(_resolve_pending_images(_paragraph_blocks('Normal', '正文', None, images)))
+        # 进程池最多为两张等待中的图像启动两个进程，关闭后子进程全部退出
+        processes = list(extractor._pool._processes.values())
+        self.assertLessEqual(len(processes), 2)
+        extractor.close()
+        self.assertFalse(any(process.is_alive() for process in processes))
+
+        self.assertEqual(blocks, [f'![图片2]({images_dir}/2.png)\n\n', '正文\n\n'])
+        self.assertEqual(os.listdir(images_dir), ['2.png'])
+
+        # 在当前线程中编码失败的图像同样不产生链接，重复引用也被忽略
+        inline = _ImageExtractor(images_dir)
+        self.assertIsNone(inline.save(part('/word/media/broken.tiff', b'not an image')))
+        self.assertIsNone(inline.save(part('/word/media/copy.tiff', b'not an image')))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        shutil.rmtree(self.images_dir, ignore_errors=True)
+
 if __name__ == '__main__':
     unittest.main()
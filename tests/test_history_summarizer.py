@@ -0,0 +1,64 @@
+import unittest
+import os
+import sys
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from chat_history import BoundedChatMessageHistory
+from history_summarizer import HistorySummarizer
+
+PROMPT_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '../prompts/history_summarizer.txt'))
+
+class FakeHistorySummarizer(HistorySummarizer):
+    """
+    用假模型代替 ChatOpenAI 的 HistorySummarizer，记录模型收到的输入。
+    """
+    def __init__(self, replies):
+        self.replies = replies
+        self.inputs = []
+        super().__init__(PROMPT_FILE)
+
+    def create_summarizer(self):
+        def record(prompt_value):
+            self.inputs.append(prompt_value.to_messages()[-1].content)
+            return prompt_value
+
+        system_prompt = ChatPromptTemplate.from_messages([
+            ("system", self.prompt),
+            ("human", "{input}"),
+        ])
+        self.summarizer = system_prompt | record | GenericFakeChatModel(messages=iter(self.replies))
+
+class TestHistorySummarizer(unittest.TestCase):
+    """
+    测试 HistorySummarizer 合并已有摘要与被裁剪的轮次，并作为会话历史的 summarizer 使用。
+    """
+
+    def test_merges_previous_summary_and_dropped_turns(self):
+        summarizer = FakeHistorySummarizer(["新的摘要"])
+        summary = summarizer("已有摘要", [HumanMessage(content="介绍量子计算"), AIMessage(content="## 量子比特")])
+
+        self.assertEqual(summary, "新的摘要")
+        self.assertIn("已有摘要", summarizer.inputs[0])
+        self.assertIn("用户: 介绍量子计算", summarizer.inputs[0])
+        self.assertIn("助手: ## 量子比特", summarizer.inputs[0])
+
+    def test_failure_keeps_previous_summary(self):
+        summarizer = FakeHistorySummarizer([])  # 假模型没有可用回复，调用时抛出异常
+        self.assertEqual(summarizer("已有摘要", [HumanMessage(content="问题")]), "已有摘要")
+
+    def test_used_by_bounded_history(self):
+        history = BoundedChatMessageHistory(max_tokens=300, summarizer=FakeHistorySummarizer(["用户在准备量子计算的演示"] * 3))
+        for i in range(3):
+            history.add_messages([HumanMessage(content=f"问题{i}" + "问" * 100),
+                                  AIMessage(content=f"回答{i}" + "答" * 100)])
+
+        self.assertIn("用户在准备量子计算的演示", history.messages[0].content)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import unittest
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+from io import BytesIO
+from html import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from PIL import Image
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")  # 仅用于构造模型客户端，测试中不会调用 LLM
+
+from image_advisor import ImageAdvisor
+from disk_cache import DiskCache
+
+# 候选图像的尺寸，按请求路径区分
+IMAGE_SIZES = {"small": (40, 30), "large": (200, 150), "medium": (100, 80)}
+
+def make_png(size):
+    buffer = BytesIO()
+    Image.new("RGB", size, (255, 0, 0)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+class FakeBingHandler(BaseHTTPRequestHandler):
+    """
+    模拟 Bing 图像搜索页面与图像下载的本地 HTTP 服务。
+    """
+    def do_GET(self):
+        self.server.request_count += 1
+        url = urlparse(self.path)
+        if url.path == "/images/search":
+            query = parse_qs(url.query)["q"][0]
+            if query == "slow":
+                time.sleep(2)
+            host = f"http://127.0.0.1:{self.server.server_port}"
+            links = "".join(
+                f'<a class="iusc" m="{escape(json.dumps({"murl": f"{host}/img/{name}.png"}))}"></a>'
+                for name in IMAGE_SIZES
+            )
+            body = f"<html><body>{links}</body></html>".encode("utf-8")
+            content_type = "text/html"
+        elif url.path.startswith("/img/"):
+            name = url.path[len("/img/"):-len(".png")]
+            body = make_png(IMAGE_SIZES[name])
+            content_type = "image/png"
+            if self.headers.get("Range"):
+                # 记录文件头探测请求，返回前若干字节
+                self.server.range_requests.append(name)
+                end = int(self.headers["Range"].split("-")[1])
+                body = body[:end + 1]
+                self.send_response(206)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            self.server.full_downloads.append(name)
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestImageAdvisor(unittest.TestCase):
+    """
+    使用本地 HTTP 服务测试 ImageAdvisor 的并发图像检索。
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBingHandler)
+        cls.server.request_count = 0
+        cls.server.range_requests = []
+        cls.server.full_downloads = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.advisor = ImageAdvisor(deadline=1, cache=DiskCache(self.cache_dir.name))
+        self.advisor.search_url = f"http://127.0.0.1:{self.server.server_port}/images/search"
+        self.image_directory = "test_image_advisor"
+
+    def tearDown(self):
+        self.cache_dir.cleanup()
+        images_dir = f"images/{self.image_directory}"
+        if os.path.exists(images_dir):
+            for filename in os.listdir(images_dir):
+                os.unlink(os.path.join(images_dir, filename))
+            os.rmdir(images_dir)
+
+    def test_get_bing_images_sorted_by_resolution(self):
+        images = self.advisor.get_bing_images("标题", "query", num_images=3)
+        self.assertEqual([(image["width"], image["height"]) for image in images], [(200, 150), (100, 80), (40, 30)])
+
+    def test_only_best_candidate_fully_downloaded(self):
+        self.server.range_requests.clear()
+        self.server.full_downloads.clear()
+
+        image = self.advisor.find_best_image("标题", "best", num_images=3)
+
+        self.assertEqual((image["width"], image["height"]), (200, 150))
+        self.assertEqual(image["obj"].size, (200, 150))
+        self.assertEqual(sorted(self.server.range_requests), sorted(IMAGE_SIZES))
+        self.assertEqual(self.server.full_downloads, ["large"])
+
+    def test_repeated_search_skips_network(self):
+        first = self.advisor.get_bing_images("标题", "cached", num_images=3)
+        request_count = self.server.request_count
+
+        second = self.advisor.get_bing_images("标题", "cached", num_images=3)
+        self.assertEqual(self.server.request_count, request_count)
+        self.assertEqual([image["resolution"] for image in first], [image["resolution"] for image in second])
+        self.assertGreaterEqual(self.advisor.cache.hits, 4)
+
+    def test_collect_images_respects_deadline(self):
+        advice = "[业绩图表]: chart\n[新产品发布]: product\n[慢速页面]: slow"
+        markdown = "# Demo\n## 业绩图表\n- a\n## 新产品发布\n- b\n## 慢速页面\n- c"
+
+        start = time.monotonic()
+        content, image_pair = self.advisor.collect_images(markdown, advice, self.image_directory)
+
+        # 超时的幻灯片被跳过，其余幻灯片正常配图
+        self.assertLess(time.monotonic() - start, 1.8)
+        self.assertEqual(set(image_pair), {"业绩图表", "新产品发布"})
+        self.assertIn(f"![业绩图表]({image_pair['业绩图表']})", content)
+
+if __name__ == "__main__":
+    unittest.main()
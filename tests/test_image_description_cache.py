@@ -0,0 +1,101 @@
+import unittest
+import os
+import sys
+import tempfile
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from image_description_cache import ImageDescriptionCache, image_fingerprint, perceptual_hash, hamming_distance
+
+def make_image(path, size=(320, 240), seed=0, **save_kwargs):
+    """
+    生成带有随机色块的测试图像，同一 seed 生成的内容相同。
+    """
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 256, size=(6, 8, 3), dtype=np.uint8)
+    Image.fromarray(blocks).resize(size, Image.NEAREST).save(path, **save_kwargs)
+    return path
+
+class TestImageDescriptionCache(unittest.TestCase):
+    """
+    测试感知哈希对重新编码、缩放的图像保持稳定，以及缓存的精确匹配、近似匹配与 LRU 淘汰。
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original = make_image(os.path.join(self.temp_dir.name, "chart.png"))
+        self.calls = []
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def describe(self, image_file, question, sampling, temperature):
+        self.calls.append(image_file)
+        return f"描述:{os.path.basename(image_file)}"
+
+    def test_reencoded_and_resized_image_hashes_match(self):
+        resized = make_image(os.path.join(self.temp_dir.name, "chart.jpg"), size=(640, 480), quality=70)
+        other = make_image(os.path.join(self.temp_dir.name, "other.png"), seed=1)
+
+        self.assertLessEqual(hamming_distance(perceptual_hash(self.original), perceptual_hash(resized)), 6)
+        self.assertGreater(hamming_distance(perceptual_hash(self.original), perceptual_hash(other)), 40)
+
+    def test_near_identical_upload_hits_cache(self):
+        cache = ImageDescriptionCache()
+        resized = make_image(os.path.join(self.temp_dir.name, "chart.jpg"), size=(160, 120), quality=80)
+
+        first = cache.cached_describe(self.describe, self.original, "描述下这幅图", False, 0.7)
+        second = cache.cached_describe(self.describe, resized, "描述下这幅图", False, 0.7)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_low_entropy_images_only_match_exactly(self):
+        cache = ImageDescriptionCache()
+        blank = os.path.join(self.temp_dir.name, "blank.png")
+        Image.new("RGB", (800, 600), "white").save(blank)
+        text = os.path.join(self.temp_dir.name, "text.png")
+        screenshot = Image.new("RGB", (800, 600), "white")
+        draw = ImageDraw.Draw(screenshot)
+        draw.text((10, 100), "Hello world this is text line one", fill="black")
+        draw.text((10, 400), "second line of text here", fill="black")
+        screenshot.save(text)
+
+        cache.cached_describe(self.describe, blank, "描述下这幅图", False, 0.7)
+        self.assertEqual(cache.cached_describe(self.describe, text, "描述下这幅图", False, 0.7), "描述:text.png")
+        self.assertEqual(cache.cached_describe(self.describe, blank, "描述下这幅图", False, 0.7), "描述:blank.png")
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(cache.stats()["near_hits"], 0)
+
+    def test_question_and_sampling_params_are_part_of_key(self):
+        cache = ImageDescriptionCache()
+        cache.cached_describe(self.describe, self.original, "描述下这幅图", False, 0.7)
+        cache.cached_describe(self.describe, self.original, "图中有几条曲线", False, 0.7)
+        cache.cached_describe(self.describe, self.original, "描述下这幅图", True, 0.7)
+        cache.cached_describe(self.describe, self.original, "描述下这幅图", True, 0.2)
+        self.assertEqual(len(self.calls), 4)
+
+    def test_lru_eviction(self):
+        cache = ImageDescriptionCache(max_entries=2, max_distance=0)
+        cache.set(("a", 1), "q", False, 0.7, "a")
+        cache.set(("b", 2), "q", False, 0.7, "b")
+        self.assertEqual(cache.get(("a", 1), "q", False, 0.7), "a")  # a 变为最近使用
+        cache.set(("c", 3), "q", False, 0.7, "c")
+
+        self.assertEqual(cache.get(("a", 1), "q", False, 0.7), "a")
+        self.assertIsNone(cache.get(("b", 2), "q", False, 0.7))
+        self.assertEqual(cache.get(("c", 3), "q", False, 0.7), "c")
+
+    def test_fingerprint_of_identical_bytes(self):
+        copy = os.path.join(self.temp_dir.name, "copy.png")
+        with open(self.original, "rb") as source, open(copy, "wb") as target:
+            target.write(source.read())
+        self.assertEqual(image_fingerprint(self.original), image_fingerprint(copy))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+from PIL import Image
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from image_worker import ImageDescriptionWorker
+from image_description_cache import ImageDescriptionCache
+from model_loader import LazyModel
+
+def describe_batch(requests):
+    # 在工作进程中运行：回答中带上批大小和进程号，便于验证批处理与进程隔离
+    if any(request["image_file"] == "broken.png" for request in requests):
+        raise ValueError("无法打开图像")
+    if any(request["image_file"] == "slow.png" for request in requests):
+        time.sleep(30)
+    return [f"{request['image_file']}|{request['question']}|{len(requests)}|{os.getpid()}" for request in requests]
+
+def report_sampling(requests):
+    return [repr(request["sampling"]) for request in requests]
+
+def failing_load():
+    raise OSError("weights not found")
+
+class TestImageDescriptionWorker(unittest.TestCase):
+    """
+    测试 ImageDescriptionWorker 在独立进程中批量处理请求，并把结果路由回对应的调用方。
+    """
+
+    def setUp(self):
+        self.worker = ImageDescriptionWorker(batch_fn=describe_batch, max_batch_size=4, max_wait=0.5,
+                                             mp_context="fork", cache=ImageDescriptionCache())
+
+    def tearDown(self):
+        self.worker.shutdown()
+
+    def test_batches_requests_in_worker_process(self):
+        futures = [self.worker.submit(f"{i}.png", "这是什么") for i in range(4)]
+        answers = [future.result(timeout=10) for future in futures]
+
+        for i, answer in enumerate(answers):
+            image_file, question, batch_size, pid = answer.split("|")
+            self.assertEqual(image_file, f"{i}.png")
+            self.assertEqual(question, "这是什么")
+            self.assertEqual(batch_size, "4")
+            self.assertNotEqual(int(pid), os.getpid())
+
+    def test_groups_by_sampling_params(self):
+        first = self.worker.submit("a.png", sampling=False)
+        second = self.worker.submit("b.png", sampling=True)
+        self.assertEqual(first.result(timeout=10).split("|")[2], "1")
+        self.assertEqual(second.result(timeout=10).split("|")[2], "1")
+
+    def test_default_sampling_left_to_model(self):
+        worker = ImageDescriptionWorker(batch_fn=report_sampling, mp_context="fork", cache=ImageDescriptionCache())
+        try:
+            # 未指定 sampling 时不覆盖模型的默认生成方式
+            self.assertEqual(worker.submit("a.png").result(timeout=10), "None")
+        finally:
+            worker.shutdown()
+
+    def test_status_reports_model_loading(self):
+        self.assertEqual(self.worker.status, LazyModel.NOT_LOADED)
+        self.worker.start()
+        self._wait_for(lambda: self.worker.is_ready)
+        self.assertEqual(self.worker.status, LazyModel.READY)
+
+        worker = ImageDescriptionWorker(batch_fn=describe_batch, load_fn=failing_load, mp_context="fork",
+                                        cache=ImageDescriptionCache())
+        try:
+            worker.start()
+            self._wait_for(lambda: worker.status != LazyModel.LOADING)
+            self.assertTrue(worker.status.startswith(LazyModel.FAILED))
+            # 加载失败后请求仍由工作进程处理，处理成功即视为就绪
+            worker.submit("ok.png").result(timeout=10)
+            self.assertTrue(worker.is_ready)
+        finally:
+            worker.shutdown()
+
+    def _wait_for(self, condition, timeout=10):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_batch_error_fails_only_that_batch(self):
+        with self.assertRaises(RuntimeError):
+            self.worker.submit("broken.png").result(timeout=10)
+        self.assertTrue(self.worker.submit("ok.png").result(timeout=10).startswith("ok.png|"))
+
+    def test_describe_async(self):
+        answer = asyncio.run(self.worker.describe("cat.png"))
+        self.assertTrue(answer.startswith("cat.png|描述下这幅图|"))
+
+    def test_cached_description_skips_worker(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            image_file = os.path.join(temp_dir, "chart.png")
+            Image.new("RGB", (64, 48), "white").save(image_file)
+
+            first = self.worker.submit(image_file).result(timeout=10)
+            # 命中缓存的请求直接返回已完成的 Future，不会发送给工作进程
+            self.worker._process.kill()
+            second = self.worker.submit(image_file)
+            self.assertTrue(second.done())
+            self.assertEqual(second.result(), first)
+
+    def test_pending_requests_fail_when_process_dies(self):
+        future = self.worker.submit("slow.png")
+        time.sleep(1)  # 等待请求进入推理
+        self.worker._process.kill()
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=10)
+        # 下一次提交会重新启动工作进程
+        self.assertTrue(self.worker.submit("again.png").result(timeout=10).startswith("again.png|"))
+
+    def test_pending_requests_fail_when_restarted_before_listener_notices(self):
+        future = self.worker.submit("slow.png")
+        time.sleep(1)
+        self.worker._process.kill()
+        self.worker._process.join()
+        # 旧监听线程发现进程退出之前，新的提交已重新启动工作进程
+        restarted = self.worker.submit("again.png")
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=10)
+        self.assertTrue(restarted.result(timeout=10).startswith("again.png|"))
+
+    def test_describe_timeout(self):
+        with self.assertRaises(TimeoutError):
+            asyncio.run(self.worker.describe("slow.png", timeout=0.5))
+        self.worker._process.kill()  # 不等待 30 秒的慢请求
+
+if __name__ == "__main__":
+    unittest.main()
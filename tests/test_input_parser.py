@@ -7,7 +7,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../s
 
 from layout_manager import LayoutManager
 from data_structures import PowerPoint
-from input_parser import parse_input_text
+from input_parser import parse_input_text, StreamingInputParser, validate_slides_markdown, strip_code_fence
 
 class TestInputParser(unittest.TestCase):
     """
@@ -106,5 +106,52 @@ class TestInputParser(unittest.TestCase):
             # 检查图片路径是否符合预期
             self.assertEqual(slide.content.image_path, expected["image_path"])
 
+    def test_streaming_parser_matches_full_parse(self):
+        """
+        测试 StreamingInputParser 逐字符输入时，产出的幻灯片与 parse_input_text 一致，且章节结束即产出。
+        """
+        presentation, presentation_title = parse_input_text(self.input_text, self.layout_manager)
+
+        parser = StreamingInputParser(self.layout_manager)
+        # 主标题行完整后立即产出标题页
+        self.assertEqual(len(parser.feed("# ChatPPT Demo")), 0)
+        self.assertEqual(len(parser.feed("\n\n## 2024 业绩概述\n- 总收入增长15%\n")), 1)
+        # 下一个 "## " 行完整到达时，上一张幻灯片才结束
+        self.assertEqual(len(parser.feed("## 业绩")), 0)
+        self.assertEqual(len(parser.feed("图表\n")), 1)
+
+        parser = StreamingInputParser(self.layout_manager)
+        streamed = []
+        for char in self.input_text:
+            streamed.extend(parser.feed(char))
+        streamed.extend(parser.close())
+
+        self.assertEqual(parser.presentation_title, presentation_title)
+        self.assertEqual(streamed, presentation.slides)
+
+class TestValidateSlidesMarkdown(unittest.TestCase):
+    """
+    测试按解析器语法校验幻灯片 markdown。
+    """
+
+    def test_sample_input_is_valid(self):
+        with open('inputs/markdown/test_input.md', 'r', encoding='utf-8') as f:
+            self.assertEqual(validate_slides_markdown(f.read()), [])
+
+    def test_reports_grammar_problems(self):
+        text = "## 没有主标题\n普通段落\n- 要点\n   - 三个空格\n![a](1.png)\n![b](2.png)\n# 标题\n### 三级标题"
+        problems = validate_slides_markdown(text, image_paths=["1.png"])
+
+        self.assertTrue(any("主标题" in problem for problem in problems))
+        self.assertTrue(any("普通段落" in problem for problem in problems))
+        self.assertTrue(any("缩进" in problem for problem in problems))
+        self.assertTrue(any("多张图片" in problem for problem in problems))
+        self.assertTrue(any("2.png" in problem for problem in problems))
+        self.assertTrue(any("三级标题" in problem for problem in problems))
+
+    def test_strip_code_fence(self):
+        self.assertEqual(strip_code_fence("```markdown\n# 标题\n```"), "# 标题")
+        self.assertEqual(strip_code_fence("# 标题\n"), "# 标题\n")
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
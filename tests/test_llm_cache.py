@@ -0,0 +1,95 @@
+import unittest
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from llm_cache import LLMResponseCache
+
+class FakeChain:
+    """
+    模拟 LangChain 链，记录被调用的次数。
+    """
+    def __init__(self):
+        self.calls = 0
+        self.batches = []
+
+    def invoke(self, inputs):
+        self.calls += 1
+        return SimpleNamespace(content=f"formatted: {inputs['input']}")
+
+    def batch(self, inputs_list, config=None):
+        self.batches.append(len(inputs_list))
+        return [self.invoke(inputs) for inputs in inputs_list]
+
+class TestLLMResponseCache(unittest.TestCase):
+    """
+    测试 LLMResponseCache 的命中统计、持久化与 LRU 淘汰。
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.model = SimpleNamespace(model_name="gpt-4o-mini", temperature=0.5, max_tokens=4096)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_cached_invoke_hits_after_first_call(self):
+        cache = LLMResponseCache(self.tmp_dir.name)
+        chain = FakeChain()
+
+        first = cache.cached_invoke(chain, self.model, "prompt", "raw", {"input": "raw"})
+        second = cache.cached_invoke(chain, self.model, "prompt", "raw", {"input": "raw"})
+        self.assertEqual(first, second)
+        self.assertEqual(chain.calls, 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # 提示词或模型参数变化时不命中
+        cache.cached_invoke(chain, self.model, "new prompt", "raw", {"input": "raw"})
+        cache.cached_invoke(chain, SimpleNamespace(model_name="gpt-4o-mini", temperature=0.0, max_tokens=4096),
+                            "prompt", "raw", {"input": "raw"})
+        self.assertEqual(chain.calls, 3)
+
+        # 新实例从磁盘恢复缓存
+        reopened = LLMResponseCache(self.tmp_dir.name)
+        self.assertEqual(reopened.cached_invoke(chain, self.model, "prompt", "raw", {"input": "raw"}), first)
+        self.assertEqual(chain.calls, 3)
+
+    def test_key_used_as_file_name(self):
+        cache = LLMResponseCache(self.tmp_dir.name)
+        key = cache.make_key("prompt", self.model, "raw")
+        cache.set(key, "content")
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir.name, f"{key}.bin")))
+
+    def test_cached_batch_only_sends_misses(self):
+        cache = LLMResponseCache(self.tmp_dir.name)
+        chain = FakeChain()
+        cache.cached_invoke(chain, self.model, "prompt", "b", {"input": "b"})
+
+        contents = cache.cached_batch(chain, self.model, "prompt", ["a", "b", "c"],
+                                      [{"input": text} for text in "abc"], max_concurrency=4)
+        self.assertEqual(contents, ["formatted: a", "formatted: b", "formatted: c"])
+        self.assertEqual(chain.batches, [2])
+
+        # 再次调用全部命中，不再发送请求
+        cache.cached_batch(chain, self.model, "prompt", ["a", "c"], [{"input": "a"}, {"input": "c"}])
+        self.assertEqual(chain.batches, [2])
+
+    def test_lru_eviction_by_size(self):
+        # 每个条目约 80 字节数据 + 30 余字节元数据，最多容纳 3 个
+        cache = LLMResponseCache(self.tmp_dir.name, max_bytes=400)
+        for key in ("a", "b", "c"):
+            cache.set(key, key * 80)
+        cache.get("a")  # 访问 a，使 b 成为最久未使用的条目
+        cache.set("d", "d" * 80)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertLessEqual(cache.stats()["bytes"], 400)
+        self.assertGreater(cache.evictions, 0)
+
+if __name__ == "__main__":
+    unittest.main()
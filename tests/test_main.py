@@ -0,0 +1,104 @@
+import unittest
+import os
+import sys
+import tempfile
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from main import batch_output_paths, collect_batch_inputs, run_batch
+
+CONFIG_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '../config.json'))
+
+SLIDES = """# 同名演示文稿
+
+## 第一页 [Title and Content]
+- {point}
+"""
+
+class TestBatchMode(unittest.TestCase):
+    """
+    测试批处理的输入收集、输出命名与失败汇总。
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_dir = os.path.join(self.temp_dir.name, "inputs")
+        self.output_dir = os.path.join(self.temp_dir.name, "outputs")
+        os.makedirs(self.input_dir)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(content)
+        return path
+
+    def test_collect_from_directory_and_manifest(self):
+        first = self.write(os.path.join(self.input_dir, "b.md"), SLIDES.format(point="b"))
+        second = self.write(os.path.join(self.input_dir, "a.markdown"), SLIDES.format(point="a"))
+        self.write(os.path.join(self.input_dir, "notes.txt"), "ignored")
+        manifest = self.write(os.path.join(self.temp_dir.name, "batch.txt"), f"# 注释\n\n{first}\n  {second}  \n")
+
+        self.assertEqual(collect_batch_inputs(self.input_dir), [second, first])
+        self.assertEqual(collect_batch_inputs(manifest), [first, second])
+        with self.assertRaises(FileNotFoundError):
+            collect_batch_inputs(os.path.join(self.temp_dir.name, "missing.txt"))
+
+    def test_manifest_paths_relative_to_manifest(self):
+        target = self.write(os.path.join(self.input_dir, "c.md"), SLIDES.format(point="c"))
+        relative = os.path.relpath(target, self.temp_dir.name)
+        manifest = self.write(os.path.join(self.temp_dir.name, "batch.txt"), f"{relative}\n")
+
+        # 结果与命令的执行目录无关
+        self.assertEqual(collect_batch_inputs(manifest), [target])
+        cwd = os.getcwd()
+        os.chdir(self.input_dir)
+        try:
+            self.assertEqual(collect_batch_inputs(manifest), [target])
+        finally:
+            os.chdir(cwd)
+
+    def test_output_paths_are_unique(self):
+        paths = batch_output_paths(["x/intro.md", "y/intro.md", "z/Intro.docx", "report.md"], "out")
+        self.assertEqual(paths, {
+            "x/intro.md": os.path.join("out", "intro.pptx"),
+            "y/intro.md": os.path.join("out", "intro-2.pptx"),
+            "z/Intro.docx": os.path.join("out", "Intro-3.pptx"),
+            "report.md": os.path.join("out", "report.pptx"),
+        })
+
+    def test_same_title_inputs_do_not_overwrite_each_other(self):
+        inputs = [
+            self.write(os.path.join(self.input_dir, "first.md"), SLIDES.format(point="一")),
+            self.write(os.path.join(self.input_dir, "second.md"), SLIDES.format(point="二")),
+        ]
+
+        results = run_batch(self.input_dir, workers=2, config_file=CONFIG_FILE, output_dir=self.output_dir)
+
+        self.assertEqual([result["input"] for result in results], inputs)
+        self.assertEqual([result["error"] for result in results], [None, None])
+        outputs = [result["output"] for result in results]
+        self.assertEqual(len(set(outputs)), 2)
+        for output in outputs:
+            self.assertTrue(os.path.exists(output))
+
+    def test_failures_are_reported_per_file(self):
+        good = self.write(os.path.join(self.input_dir, "good.md"), SLIDES.format(point="ok"))
+        missing = os.path.join(self.input_dir, "missing.md")
+        unsupported = self.write(os.path.join(self.input_dir, "notes.txt"), "plain text")
+        manifest = self.write(os.path.join(self.temp_dir.name, "batch.txt"), "\n".join([good, missing, unsupported]))
+
+        results = run_batch(manifest, workers=2, config_file=CONFIG_FILE, output_dir=self.output_dir)
+
+        self.assertIsNone(results[0]["error"])
+        self.assertTrue(os.path.exists(results[0]["output"]))
+        self.assertIn("FileNotFoundError", results[1]["error"])
+        self.assertIn("ValueError", results[2]["error"])
+        self.assertIsNone(results[1]["output"])
+        self.assertIsNone(results[2]["output"])
+
+if __name__ == "__main__":
+    unittest.main()
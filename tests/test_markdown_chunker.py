@@ -0,0 +1,63 @@
+import unittest
+import os
+import sys
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from markdown_chunker import estimate_tokens, extract_title, split_markdown_sections, stitch_formatted_chunks
+
+def make_document(section_count, paragraph_count=3):
+    lines = ["# 长文档\n\n"]
+    for i in range(section_count):
+        lines.append(f"## 第 {i} 章\n\n")
+        for j in range(paragraph_count):
+            lines.append(f"第 {i} 章第 {j} 段的内容。" * 5 + "\n\n")
+    return "".join(lines)
+
+class TestMarkdownChunker(unittest.TestCase):
+    """
+    测试按标题边界切分 markdown，以及拼接格式化结果时统一主标题。
+    """
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens("多模态"), 3)
+        self.assertEqual(estimate_tokens("abcdefgh"), 2)
+
+    def test_split_respects_budget_and_heading_boundaries(self):
+        document = make_document(20)
+        chunks = split_markdown_sections(document, max_tokens=400)
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), document)
+        for chunk in chunks:
+            self.assertLessEqual(estimate_tokens(chunk), 400)
+            self.assertTrue(chunk.startswith("#"), "每块都应从标题开始")
+
+    def test_oversized_section_split_at_paragraphs(self):
+        document = make_document(1, paragraph_count=30)
+        chunks = split_markdown_sections(document, max_tokens=200)
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), document)
+        for chunk in chunks:
+            self.assertTrue(chunk.endswith("\n\n"))
+
+    def test_short_document_is_single_chunk(self):
+        document = make_document(2)
+        self.assertEqual(split_markdown_sections(document, max_tokens=10000), [document])
+
+    def test_stitch_keeps_single_title(self):
+        formatted = [
+            "# 长文档\n\n## 第 0 章\n- 要点",
+            "# 模型生成的标题\n\n## 第 1 章\n- 要点\n![图片1](images/1.png)",
+        ]
+        stitched = stitch_formatted_chunks(formatted, title="长文档")
+
+        self.assertEqual(stitched.count("\n# "), 0)
+        self.assertTrue(stitched.startswith("# 长文档\n"))
+        self.assertIn("## 第 0 章\n- 要点\n\n## 第 1 章", stitched)
+        self.assertEqual(extract_title(stitch_formatted_chunks(formatted)), "长文档")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import os
+import sys
+import time
+import threading
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from model_loader import LazyModel
+
+class TestLazyModel(unittest.TestCase):
+    """
+    测试 LazyModel 的延迟加载、后台预热与加载状态。
+    """
+
+    def test_warm_up_loads_once_in_background(self):
+        calls = []
+        release = threading.Event()
+
+        def loader():
+            calls.append(1)
+            release.wait(1)
+            return "model"
+
+        lazy = LazyModel("fake", loader)
+        self.assertEqual(lazy.status, LazyModel.NOT_LOADED)
+
+        thread = lazy.warm_up()
+        time.sleep(0.05)
+        self.assertEqual(lazy.status, LazyModel.LOADING)  # warm_up 立即返回，加载在后台进行
+
+        release.set()
+        thread.join()
+        self.assertTrue(lazy.is_ready)
+        self.assertEqual(lazy.get(), "model")
+        self.assertEqual(len(calls), 1)
+
+    def test_failed_load_reports_status_and_retries(self):
+        attempts = []
+
+        def loader():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OSError("weights not found")
+            return "model"
+
+        lazy = LazyModel("fake", loader)
+        with self.assertRaises(RuntimeError):
+            lazy.get()
+        self.assertTrue(lazy.status.startswith(LazyModel.FAILED))
+        self.assertEqual(lazy.get(), "model")
+
+if __name__ == "__main__":
+    unittest.main()
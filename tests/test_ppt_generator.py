@@ -7,7 +7,8 @@ from pptx import Presentation
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
 from data_structures import PowerPoint, Slide, SlideContent
-from ppt_generator import generate_presentation
+from ppt_generator import generate_presentation, generate_presentation_from_stream, StreamingPresentation
+from layout_manager import LayoutManager
 
 class TestPPTGenerator(unittest.TestCase):
     """
@@ -106,6 +107,41 @@ class TestPPTGenerator(unittest.TestCase):
                 images = [shape for shape in slide.shapes if shape.shape_type == 13]  # 13 为图片形状类型
                 self.assertGreater(len(images), 0, f"幻灯片 {idx + 1} 应该包含图片，但未找到。")
 
+    def test_generate_presentation_from_stream(self):
+        """
+        测试 generate_presentation_from_stream 按片段输入 markdown 时生成的演示文稿内容。
+        """
+        layout_manager = LayoutManager({"Title 1": 1, "Title, Content 0": 2, "Title, Content, Picture 2": 8})
+        with open('inputs/markdown/test_input.md', 'r', encoding='utf-8') as f:
+            input_text = f.read()
+        chunks = [input_text[i:i + 7] for i in range(0, len(input_text), 7)]
+
+        output_path, powerpoint_data = generate_presentation_from_stream(
+            chunks, layout_manager, self.template_path, self.output_path
+        )
+
+        self.assertEqual(output_path, self.output_path)
+        prs = Presentation(self.output_path)
+        self.assertEqual(prs.core_properties.title, "ChatPPT Demo")
+        self.assertEqual(len(prs.slides), len(powerpoint_data.slides))
+        self.assertEqual([slide.shapes.title.text for slide in prs.slides],
+                         [slide.content.title for slide in powerpoint_data.slides])
+
+    def test_streaming_presentation_renders_before_save(self):
+        """
+        测试 StreamingPresentation 在章节结束时即渲染幻灯片，不等待全部文本。
+        """
+        layout_manager = LayoutManager({"Title 1": 1, "Title, Content 0": 2, "Title, Content, Picture 2": 8})
+        presentation = StreamingPresentation(layout_manager, self.template_path)
+
+        self.assertEqual(presentation.feed("# 标题\n## 第一页\n- 要点\n"), 1)  # 标题页
+        self.assertEqual(presentation.feed("## 第二页\n- 要点"), 1)  # 第一页在下一章节开始时完成
+        self.assertEqual(len(presentation.prs.slides), 2)
+
+        output_path, powerpoint_data = presentation.save(self.output_path)
+        self.assertEqual(len(Presentation(output_path).slides), 3)
+        self.assertEqual(powerpoint_data.title, "标题")
+
     def tearDown(self):
         """
         清理生成的文件。
@@ -0,0 +1,143 @@
+import unittest
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import threading
+import multiprocessing
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from sqlite_chat_history import SQLiteChatStore, SQLiteHistoryManager
+
+def write_from_other_process(db_path, session_id):
+    store = SQLiteChatStore(db_path)
+    store.add_messages(session_id, [HumanMessage(content="来自另一个进程")])
+    store.close()
+
+class TestSQLiteChatStore(unittest.TestCase):
+    """
+    测试 SQLite 会话存储的写后读、跨进程共享、清空与压缩。
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "history.db")
+        self.store = SQLiteChatStore(self.db_path, flush_interval=0.01)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+    def test_pending_writes_are_visible_and_flushed_in_batches(self):
+        history = SQLiteHistoryManager(self.store).get_session_history("user-a")
+        for i in range(20):
+            history.add_messages([HumanMessage(content=f"问题{i}"), AIMessage(content=f"回答{i}")])
+
+        # 尚未提交的消息对本进程立即可见
+        self.assertEqual(len(history.messages), 40)
+        self.store.flush()
+        self.assertEqual([m.content for m in history.messages][-2:], ["问题19", "回答19"])
+        self.assertLess(self.store.flushed_batches, 20)
+
+        # 新的存储实例（模拟重启）读取到同样的内容
+        reopened = SQLiteChatStore(self.db_path)
+        self.assertEqual(len(reopened.get_messages("user-a")), 40)
+        reopened.close()
+
+    def test_sessions_shared_across_processes(self):
+        process = multiprocessing.get_context("spawn").Process(
+            target=write_from_other_process, args=(self.db_path, "shared")
+        )
+        process.start()
+        process.join(30)
+        self.assertEqual([m.content for m in self.store.get_messages("shared")], ["来自另一个进程"])
+
+    def test_clear_discards_queued_writes(self):
+        self.store.add_messages("user-b", [HumanMessage(content="将被清空")])
+        self.store.clear("user-b")
+        self.store.flush()
+        self.assertEqual(self.store.get_messages("user-b"), [])
+
+    def test_has_session(self):
+        self.assertFalse(self.store.has_session("user-d"))
+        self.store.add_messages("user-d", [HumanMessage(content="排队中")])
+        self.assertTrue(self.store.has_session("user-d"))
+        self.store.flush()
+        self.assertTrue(self.store.has_session("user-d"))
+        self.store.clear("user-d")
+        self.assertFalse(self.store.has_session("user-d"))
+
+    def test_clear_discards_writes_queued_by_other_process(self):
+        # 另一个存储实例模拟另一个进程：写入在清空之前排队，在清空之后才提交
+        other = SQLiteChatStore(self.db_path, flush_interval=5)
+        try:
+            other.add_messages("user-c", [HumanMessage(content="清空前排队")])
+            self.store.clear("user-c")
+            other.flush()
+            self.assertEqual(self.store.get_messages("user-c"), [])
+            self.assertEqual(other.get_messages("user-c"), [])
+
+            # 清空之后的新消息正常可见
+            other.add_messages("user-c", [HumanMessage(content="清空后写入")])
+            other.flush()
+            self.assertEqual([m.content for m in self.store.get_messages("user-c")], ["清空后写入"])
+        finally:
+            other.close()
+
+    def test_reads_not_blocked_by_waiting_writer(self):
+        self.store.add_messages("reader", [HumanMessage(content="已提交")])
+        self.store.flush()
+
+        # 另一个连接持有写锁，后台线程的提交需要等待
+        blocker = sqlite3.connect(self.db_path)
+        blocker.execute("BEGIN IMMEDIATE")
+        self.store.add_messages("writer", [HumanMessage(content="等待提交")])
+        flushed = threading.Event()
+        threading.Thread(target=lambda: (self.store.flush(), flushed.set()), daemon=True).start()
+        time.sleep(0.2)
+
+        start = time.perf_counter()
+        self.assertEqual([m.content for m in self.store.get_messages("reader")], ["已提交"])
+        self.assertEqual([m.content for m in self.store.get_messages("writer")], ["等待提交"])
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertFalse(flushed.is_set())
+
+        blocker.rollback()
+        blocker.close()
+        self.assertTrue(flushed.wait(10))
+        self.assertEqual([m.content for m in self.store.get_messages("writer")], ["等待提交"])
+
+    def test_messages_trimmed_to_token_budget(self):
+        history = SQLiteHistoryManager(self.store, max_tokens_per_session=300).get_session_history("long")
+        for i in range(10):
+            history.add_messages([HumanMessage(content="问" * 100), AIMessage(content="答" * 100)])
+
+        messages = history.messages
+        self.assertIsInstance(messages[0], HumanMessage)
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(len(self.store.get_messages("long")), 20)
+
+    def test_compaction_limits_messages_per_session(self):
+        self.store.max_messages_per_session = 3
+        self.store.add_messages("c", [HumanMessage(content=str(i)) for i in range(10)])
+        self.store.flush()
+        self.store.compact()
+        self.assertEqual([m.content for m in self.store.get_messages("c")], ["7", "8", "9"])
+
+    def test_lookup_is_fast(self):
+        for session in range(200):
+            self.store.add_messages(f"s{session}", [HumanMessage(content="x"), AIMessage(content="y")])
+        self.store.flush()
+
+        start = time.perf_counter()
+        for session in range(200):
+            self.store.get_messages(f"s{session}")
+        self.assertLess((time.perf_counter() - start) / 200, 0.005)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import os
+import sys
+import threading
+
+import numpy as np
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from audio_utils import SAMPLE_RATE
+from streaming_asr import VoiceActivitySegmenter, StreamingTranscriber, to_mono_float32
+
+def tone(seconds, amplitude=0.3):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+def silence(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+class TestStreamingASR(unittest.TestCase):
+    """
+    测试语音活动检测切分与流式转录。
+    """
+
+    def test_segmenter_splits_on_silence(self):
+        segmenter = VoiceActivitySegmenter()
+        audio = np.concatenate([silence(0.5), tone(1.0), silence(1.0), tone(0.5), silence(0.2)])
+
+        # 以 0.1 秒为单位分块输入，模拟麦克风流
+        segments = []
+        step = SAMPLE_RATE // 10
+        for start in range(0, len(audio), step):
+            segments.extend(segmenter.feed(audio[start:start + step]))
+        self.assertEqual(len(segments), 1)  # 第一段语音之后的静音足够长，已经产出
+        segments.extend(segmenter.flush())
+
+        self.assertEqual(len(segments), 2)
+        self.assertAlmostEqual(len(segments[0]) / SAMPLE_RATE, 1.6, delta=0.1)
+
+    def test_transcriber_yields_partial_text(self):
+        release = threading.Event()
+        calls = []
+
+        def fake_transcribe(segment):
+            calls.append(len(segment))
+            if len(calls) == 2:
+                release.wait(1)  # 第二段识别较慢
+            return f" 第{len(calls)}句"
+
+        transcriber = StreamingTranscriber(fake_transcribe)
+        pcm = (np.concatenate([tone(1.0), silence(1.0), tone(0.5)]) * 32767).astype(np.int16)
+        stereo_48k = np.repeat(np.repeat(pcm, 3)[:, None], 2, axis=1)  # 48 kHz 双声道输入
+
+        for start in range(0, len(stereo_48k), 4800):
+            transcriber.feed(48000, stereo_48k[start:start + 4800])
+        transcriber._futures[0].result()
+        self.assertEqual(transcriber.partial_text(), "第1句")
+
+        release.set()
+        self.assertEqual(transcriber.finish(), "第1句 第2句")
+
+    def test_to_mono_float32_resamples(self):
+        audio = to_mono_float32(8000, np.zeros((800, 2), dtype=np.int16))
+        self.assertEqual(audio.dtype, np.float32)
+        self.assertEqual(len(audio), 1600)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+import os
+import sys
+
+# 添加 src 目录到模块搜索路径，以便可以导入 src 目录中的模块
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from template_manager import TemplatePool, get_layout_mapping
+
+class TestTemplatePool(unittest.TestCase):
+    """
+    测试 TemplatePool 类，验证模板只解析一次且每次返回互不影响的副本。
+    """
+
+    def setUp(self):
+        self.template_path = "templates/SimpleTemplate.pptx"
+        self.pool = TemplatePool()
+
+    def test_acquire_returns_empty_independent_copies(self):
+        prs_a = self.pool.acquire(self.template_path)
+        prs_b = self.pool.acquire(self.template_path)
+
+        # 母版只解析一次
+        self.assertEqual(len(self.pool._masters), 1)
+
+        # 副本中不包含任何幻灯片，且布局与模板一致
+        self.assertEqual(len(prs_a.slides), 0)
+        self.assertEqual(get_layout_mapping(prs_a), get_layout_mapping(prs_b))
+
+        # 在一个副本上添加幻灯片不影响另一个副本
+        prs_a.slides.add_slide(prs_a.slide_layouts[0])
+        self.assertEqual(len(prs_a.slides), 1)
+        self.assertEqual(len(prs_b.slides), 0)
+        self.assertEqual(len(self.pool.acquire(self.template_path).slides), 0)
+
+if __name__ == "__main__":
+    unittest.main()